@@ -6,3 +6,11 @@ os.environ['NLTK_DATA'] = os.path.join(
     pathlib.Path(__file__).parent, 'nltk_data')
 
 VERSION = '2022-01-17-1'
+
+
+def warm(path=None, verify=True):
+    """ Load every runtime dataset from the snapshot written by generate.py
+    (see `ghgi.snapshot`) in one read, rather than on first use.
+    """
+    from .snapshot import warm, MASTER_SNAPSHOT
+    return warm(path or MASTER_SNAPSHOT, verify)
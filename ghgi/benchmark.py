@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+""" Benchmarks for the ghgi runtime.
+
+Each benchmark runs its measurements in fresh interpreters, so that load times
+and memory use aren't skewed by anything already loaded by this process. Run
+them with e.g. `python -m ghgi.benchmark indexes`.
+"""
+import os
+import sys
+import json
+import time
+import pathlib
+import subprocess
+
+NYT_INGREDIENTS = os.path.join(
+    pathlib.Path(__file__).parent, 'nyt-data', 'nyt-ingredients-count.json')
+
+# prepended to all benchmark snippets; `memory()` returns the current process'
+# resident set size in KiB, split into anonymous (private) and file-backed
+# (shareable) pages where the platform reports them.
+PROBE = '''
+import json, time, resource
+def memory():
+    try:
+        with open('/proc/self/status') as status:
+            fields = dict(line.split(':', 1) for line in status)
+        return {k: int(fields[k].split()[0]) for k in ['VmRSS', 'RssAnon', 'RssFile', 'RssShmem']}
+    except (OSError, KeyError):
+        return {'VmRSS': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+'''
+
+
+def measure(snippet):
+    """ Run `snippet` after PROBE in a new interpreter and return the json
+    object it prints on its last line of output.
+    """
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE + snippet],
+        capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+INDEX_LOADERS = {
+    'json': '''
+GIN.index(); GIN.aka_index()
+Trigram.product_index(); Trigram.aka_index()
+''',
+    'compact': '''
+GIN.load_compact(); Trigram.load_compact()
+''',
+    'shared': '''
+index = CompactIndex.attach({shm_name!r})
+GIN.load_compact(index=index); Trigram.load_compact(index=index)
+''',
+    'sqlite': '''
+GIN.load_sqlite(); Trigram.load_sqlite()
+''',
+}
+
+INDEX_SNIPPET = '''
+from ghgi.gin import GIN
+from ghgi.trigram import Trigram
+from ghgi.compact import CompactIndex
+before = memory()
+start = time.perf_counter()
+{loader}
+loaded = time.perf_counter() - start
+for term in ['olive oil', 'parmesan', 'chicken stock', 'tomatoes']:
+    Trigram.match(term)
+queried = time.perf_counter() - start
+after = memory()
+print(json.dumps({{
+    'load_ms': loaded * 1000,
+    'load_and_query_ms': queried * 1000,
+    'rss_kib': {{k: after[k] - before[k] for k in after}},
+}}))
+'''
+
+
+def indexes():
+    """ Compare loading the aka, GIN, and trigram indexes from their json files
+    with memory-mapping the compact index, attaching it from shared memory, and
+    querying the SQLite database.
+    """
+    from ghgi.compact import CompactIndex
+    shm = CompactIndex.open().share()
+    try:
+        results = {}
+        for mode, loader in INDEX_LOADERS.items():
+            snippet = INDEX_SNIPPET.format(
+                loader=loader.format(shm_name=shm.name))
+            results[mode] = measure(snippet)
+    finally:
+        shm.close()
+        shm.unlink()
+
+    print('{:<10}{:>12}{:>18}  {}'.format(
+        'mode', 'load (ms)', 'load+query (ms)', 'rss delta (KiB)'))
+    for mode, result in results.items():
+        print('{:<10}{:>12.2f}{:>18.2f}  {}'.format(
+            mode, result['load_ms'], result['load_and_query_ms'],
+            result['rss_kib']))
+    return results
+
+
+def recipes(count=400, size=10):
+    """ Return `count` synthetic recipes of `size` distinct ingredient lines,
+    made from the NYT ingredient names.
+    """
+    with open(NYT_INGREDIENTS) as f:
+        names = list(json.load(f))
+    units = ['cups', 'tablespoons', 'grams', 'ounces', 'pounds']
+    lines = ['{} {} {}'.format(i % 4 + 1, units[i % len(units)], name)
+             for i, name in enumerate(names[:count * size])]
+    return [lines[i:i + size] for i in range(0, len(lines), size)]
+
+
+POOL_WORKERS = [1, 2, 4, 8, 16]
+
+
+def pool(workers=POOL_WORKERS):
+    """ Measure the recipe scoring throughput of a ScoringPool as its number
+    of workers grows.
+    """
+    from ghgi.pool import ScoringPool
+    batch = recipes()
+    results = {}
+    for n in workers:
+        start = time.perf_counter()
+        with ScoringPool(n) as scoring_pool:
+            started = time.perf_counter()
+            scoring_pool.score_recipes(batch)
+            scored = time.perf_counter()
+        results[n] = {'start_ms': (started - start) * 1000,
+                      'recipes_per_s': len(batch) / (scored - started)}
+
+    print('{:<10}{:>12}{:>14}{:>10}'.format(
+        'workers', 'start (ms)', 'recipes/s', 'speedup'))
+    for n, result in results.items():
+        print('{:<10}{:>12.1f}{:>14.1f}{:>10.2f}'.format(
+            n, result['start_ms'], result['recipes_per_s'],
+            result['recipes_per_s'] / results[workers[0]]['recipes_per_s']))
+    return results
+
+
+def import_time(module='ghgi.parser'):
+    """ Return the `python -X importtime` report of importing `module` in a new
+    interpreter, as a dict of {'total_us': total microseconds, 'modules':
+    [(self microseconds, module), ...] from slowest to fastest}.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import {}'.format(module)],
+        capture_output=True, text=True, check=True)
+    total = 0
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        modules += [(int(own), name.strip())]
+        # the top level imports of the statement, e.g. ghgi then ghgi.parser
+        if name.startswith(' ghgi') and not name.startswith('  '):
+            total += int(cumulative)
+    modules.sort(reverse=True)
+    return {'total_us': total, 'modules': modules}
+
+
+STARTUP_SNIPPET = '''
+start = time.perf_counter()
+import sys
+from ghgi.parser import Parser
+from ghgi.product import Product
+imported = time.perf_counter()
+nltk_imported = 'nltk' in sys.modules
+ingredient, _ = Parser.parse('2 cups chopped fresh basil')
+Product.lookup(ingredient)
+queried = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'first_query_ms': (queried - imported) * 1000,
+    'nltk_on_import': nltk_imported,
+}))
+'''
+
+
+def startup(runs=5):
+    """ Measure the cold start of a new process: the `-X importtime` total of
+    `import ghgi.parser`, and the latency of its first parse and lookup
+    (which loads the tokenizer, tagger, indexes, and products database).
+    """
+    imports = [import_time() for _ in range(runs)]
+    best = min(imports, key=lambda i: i['total_us'])
+    print('import ghgi.parser: {:.1f} ms (best of {}), slowest modules:'.format(
+        best['total_us'] / 1000, runs))
+    for own, name in best['modules'][:10]:
+        print('  {:>8.1f} ms  {}'.format(own / 1000, name))
+
+    first = [measure(STARTUP_SNIPPET) for _ in range(runs)]
+    print('{:<12}{:>18}{:>14}'.format('import (ms)', 'first query (ms)', 'nltk loaded'))
+    for result in first:
+        print('{:<12.1f}{:>18.1f}{:>14}'.format(
+            result['import_ms'], result['first_query_ms'],
+            str(result['nltk_on_import'])))
+    return {'import_time': best, 'first_query': first}
+
+
+def fuzzy(count=10000, k=5):
+    """ Measure matching `count` NYT ingredient names to the aliases one at a
+    time (`Trigram.match`) and all at once (`Trigram.match_many`).
+    """
+    from ghgi.trigram import Trigram
+    with open(NYT_INGREDIENTS) as f:
+        terms = list(json.load(f))[:count]
+    Trigram.index().matrix()
+    start = time.perf_counter()
+    single = [Trigram.match(term, k) for term in terms]
+    matched = time.perf_counter()
+    batch = Trigram.match_many(terms, k)
+    batched = time.perf_counter()
+    results = {'terms': len(terms), 'match_s': matched - start,
+               'match_many_s': batched - matched, 'identical': single == batch}
+    print('{:<8}{:>12}{:>16}{:>10}{:>12}'.format(
+        'terms', 'match (s)', 'match_many (s)', 'speedup', 'identical'))
+    print('{:<8}{:>12.2f}{:>16.2f}{:>10.2f}{:>12}'.format(
+        results['terms'], results['match_s'], results['match_many_s'],
+        results['match_s'] / results['match_many_s'], str(results['identical'])))
+    return results
+
+
+def scanner(count=3000):
+    """ Compare the GIN index and Aho-Corasick scanner matching engines (see
+    `ghgi.scanner`): their agreement with the GIN test fixtures and with each
+    other over the names parsed from `count` NYT ingredient lines, and their
+    throughput and number of lines tagged matching those names.
+    """
+    from ghgi.gin import GIN, ENGINES
+    from ghgi.parser import Parser
+    from ghgi.product import Product
+    from ghgi.tests.fixtures.gin import QUERIES
+    with open(NYT_INGREDIENTS) as f:
+        lines = list(json.load(f))[:count]
+    names = []
+    for ingredient, _ in map(Parser.parse, lines):
+        if ingredient and Product.NAMES in ingredient:
+            names += [name.replace('-', ' ') for name in ingredient[Product.NAMES]]
+    engine, pos_tag = GIN.engine(), GIN.pos_tag
+    tagged = []
+
+    def counted(tokens):
+        tagged.append(1)
+        return pos_tag(tokens)
+
+    results = {}
+    GIN.pos_tag = counted
+    try:
+        for name in ENGINES:
+            GIN.use_engine(name)
+            GIN.scanner()
+            fixtures = sum(GIN.frozen(GIN.match(q)) == GIN.frozen(r) for q, r in QUERIES)
+            tagged.clear()
+            start = time.perf_counter()
+            matches = [GIN.match(name) for name in names]
+            results[name] = {'fixtures': fixtures, 'matches': matches,
+                             'names_per_s': len(names) / (time.perf_counter() - start),
+                             'tagged': len(tagged)}
+    finally:
+        GIN.pos_tag = pos_tag
+        GIN.use_engine(engine)
+
+    print('{:<10}{:>10}{:>12}{:>10}'.format('engine', 'fixtures', 'names/s', 'tagged'))
+    for name, result in results.items():
+        print('{:<10}{:>10}{:>12.1f}{:>10}'.format(
+            name, '{}/{}'.format(result['fixtures'], len(QUERIES)),
+            result['names_per_s'], result['tagged']))
+    pairs = list(zip(*(result['matches'] for result in results.values())))
+    print('{} names; same alias: {:.1%}, same product: {:.1%}'.format(
+        len(names),
+        sum(a[0] == b[0] for a, b in pairs) / len(pairs),
+        sum((a[1] or [None])[0] == (b[1] or [None])[0] for a, b in pairs) / len(pairs)))
+    return results
+
+
+BENCHMARKS = {
+    'fuzzy': fuzzy,
+    'indexes': indexes,
+    'pool': pool,
+    'scanner': scanner,
+    'startup': startup,
+}
+
+
+if __name__ == '__main__':
+    for name in sys.argv[1:] or BENCHMARKS:
+        print('# {}'.format(name))
+        BENCHMARKS[name]()
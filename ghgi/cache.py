@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+""" A size-bounded result cache with LRU or LFU eviction, which clears itself
+when the data its results were computed from is replaced.
+"""
+import threading
+import collections
+try:
+    from .lazy import replaced
+except:
+    from lazy import replaced
+
+LRU = 'lru'
+LFU = 'lfu'
+STALE = object()  # `Cache.check`'s stamp for contexts that bypass the cache
+
+
+def same(stamp, other) -> bool:
+    """ Whether two stamps are of the same objects """
+    return other is not None and len(stamp) == len(other) and \
+        all(a is b for a, b in zip(stamp, other))
+
+
+class Cache:
+    """ Cache up to `maxsize` results, evicting the least recently (LRU) or
+    least frequently (LFU, least recently among equals) used ones first.
+
+    `stamp`, if provided, is called on every access and returns a tuple of the
+    objects the cached results were computed from, e.g. the indexes; whenever
+    any of them is replaced by a different object, the cache is cleared. A
+    context pinned to replaced stores (see `ghgi.generation`) rather bypasses
+    the cache, so it neither clears nor fills it with results of the old ones.
+
+    `weigh`, if provided, returns the size of a value (e.g. `len`), and
+    `maxsize` then bounds the total size of the cached values rather than
+    their number.
+
+    Values should be immutable, since they are handed out as is on every hit.
+    A cache may be shared by threads; `memoize` computes values outside its
+    lock, so concurrent misses on a key may each compute it, and only caches
+    the value if the stamp it was computed under is still the current one.
+    """
+
+    def __init__(self, maxsize=1024, policy=LRU, stamp=None, weigh=None):
+        if policy not in (LRU, LFU):
+            raise ValueError('Unknown cache policy {}'.format(policy))
+        self.maxsize = maxsize
+        self.policy = policy
+        self._stamp = stamp
+        self._stamped = None
+        self._weigh = weigh
+        self._weights = {}
+        self.size = 0
+        self._data = {}
+        # LFU: {use count: {key: None} in least recently used order}
+        self._counts = {}
+        self._buckets = collections.defaultdict(collections.OrderedDict)
+        self._min_count = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __getitem__(self, key):
+        value = self.get(key, self)
+        if value is self:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.put(key, value)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'size': self.size,
+            'maxsize': self.maxsize,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._data = {}
+            self._weights = {}
+            self.size = 0
+            self._counts = {}
+            self._buckets.clear()
+            self._min_count = 0
+
+    def check(self):
+        """ Clear the cache if the objects returned by `stamp` have changed,
+        and return the stamp the cache now holds results of, or STALE if this
+        context is pinned to replaced objects and should bypass the cache.
+        """
+        if self._stamp is None:
+            return None
+        # (outside the lock, since it may load the data)
+        stamp = self._stamp()
+        with self._lock:
+            if same(stamp, self._stamped):
+                return self._stamped
+            if replaced():
+                return STALE
+            if self._data:
+                self.invalidations += 1
+                self.clear()
+            self._stamped = stamp
+            return stamp
+
+    def get(self, key, default=None):
+        return self._get(self.check(), key, default)
+
+    def put(self, key, value):
+        self._put(self.check(), key, value)
+
+    def memoize(self, key, compute):
+        """ Return the cached value of `key`, computing and caching it first if
+        it isn't cached.
+        """
+        stamp = self.check()
+        value = self._get(stamp, key, self)
+        if value is self:
+            value = compute()
+            self._put(stamp, key, value)
+        return value
+
+    def _get(self, stamp, key, default):
+        with self._lock:
+            if stamp is STALE or key not in self._data:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._touch(key)
+            return self._data[key]
+
+    def _put(self, stamp, key, value):
+        """ Cache `value`, computed from the objects of `stamp` (see `check`),
+        unless they've been replaced since
+        """
+        if stamp is STALE or self.maxsize <= 0:
+            return
+        if self._stamp is not None and not same(self._stamp(), stamp):
+            return
+        weight = self._weigh(value) if self._weigh else 1
+        with self._lock:
+            if stamp is not self._stamped:
+                return
+            count = 1
+            if key in self._data:
+                # replace it as a new value (which may weigh more) that has
+                # been used once more
+                count = self._discard(key) + 1
+            # always keep the new value, even if it alone exceeds maxsize
+            while self._data and self.size + weight > self.maxsize:
+                self._evict()
+            self._data[key] = value
+            self._weights[key] = weight
+            self.size += weight
+            if self.policy == LFU:
+                self._counts[key] = count
+                self._buckets[count][key] = None
+                if len(self._data) == 1 or count < self._min_count:
+                    self._min_count = count
+
+    def _touch(self, key):
+        if self.policy == LRU:
+            # dicts keep insertion order, so re-inserting marks key as newest
+            self._data[key] = self._data.pop(key)
+            return
+        count = self._counts[key]
+        bucket = self._buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[count]
+            if self._min_count == count:
+                self._min_count = count + 1
+        self._counts[key] = count + 1
+        self._buckets[count + 1][key] = None
+
+    def _discard(self, key) -> int:
+        """ Remove `key`, and return its use count (LFU) """
+        del self._data[key]
+        self.size -= self._weights.pop(key)
+        if self.policy == LRU:
+            return 0
+        count = self._counts.pop(key)
+        bucket = self._buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[count]
+            self._min_count = min(self._buckets, default=0)
+        return count
+
+    def _evict(self):
+        if self.policy == LRU:
+            key = next(iter(self._data))
+        else:
+            bucket = self._buckets[self._min_count]
+            key, _ = bucket.popitem(last=False)
+            if not bucket:
+                del self._buckets[self._min_count]
+                # (put resets this, but weighted puts may evict repeatedly)
+                self._min_count = min(self._buckets, default=0)
+            del self._counts[key]
+        del self._data[key]
+        self.size -= self._weights.pop(key)
+        self.evictions += 1
@@ -0,0 +1,458 @@
+#!/usr/bin/env python
+""" A compact, read-only binary encoding of the aka, GIN, and trigram indexes,
+and of the stem masks and phrases that GIN compiles from its index.
+
+All strings (aliases, product names, stems, and trigrams) are interned in one
+table sorted by their utf-8 encoding, so that a string's id orders the same way
+the string does. Aliases are referenced by integer ids, and postings are stored
+as flat arrays of alias ids with an offsets array per index (CSR style).
+
+Aliases also have an "ordered" id, in order of their trigram count and then
+name, with the trigram postings repeated in those ids, so that fuzzy matching
+(see `ghgi.trigram.CompactTrigramIndex`) runs over the buffer in place rather
+than compiling its own copy of the indexes.
+
+Each alias of the GIN index also has its stems, as their positions in a
+sorted table of stems, and its token count, and every phrase (see
+`GIN.phrases`) is keyed by its sorted stems joined by spaces, so that GIN
+serves `stem_ids`, `alias_masks` and `phrases` from the buffer too.
+
+Everything is read through memoryviews over the underlying buffer, which is
+either a read-only mmap of the file or a `multiprocessing.shared_memory`
+block, so any number of processes can share one physical copy of the indexes.
+
+Layout (all integers are little-endian uint32, sections are 4-byte aligned):
+
+    magic                     8 bytes
+    counts                    n_strings, n_aliases, n_gin_keys, n_gin_values,
+                              n_tri_keys, n_tri_values, n_stems,
+                              n_alias_stems, n_phrases, blob_size
+    string_offsets            n_strings + 1
+    alias_names               n_aliases (string ids, sorted)
+    alias_products            n_aliases (string ids)
+    alias_trigrams            n_aliases
+    gin_keys                  n_gin_keys (string ids, sorted)
+    gin_offsets               n_gin_keys + 1
+    gin_values                n_gin_values (alias ids)
+    tri_keys                  n_tri_keys (string ids, sorted)
+    tri_offsets               n_tri_keys + 1
+    tri_values                n_tri_values (alias ids)
+    tri_ordered               n_tri_values (ordered alias ids, per tri key)
+    ordered_ids               n_aliases (the alias id of each ordered id)
+    ordered_trigrams          n_aliases
+    ordered_names             n_aliases (string ids)
+    ordered_products          n_aliases (string ids)
+    stems                     n_stems (string ids, sorted)
+    alias_stem_offsets        n_aliases + 1
+    alias_stems               n_alias_stems (stem positions)
+    alias_tokens              n_aliases (0 for aliases not in the GIN index)
+    phrase_keys               n_phrases (string ids, sorted)
+    phrase_aliases            n_phrases (alias ids)
+    blob                      blob_size bytes of utf-8 string data
+"""
+import sys
+import mmap
+import array
+import struct
+from collections.abc import Mapping, Sequence
+try:
+    from .datasets import MASTER_COMPACT_INDEX
+    from .lazy import LOCK
+except:
+    from datasets import MASTER_COMPACT_INDEX
+    from lazy import LOCK
+
+MAGIC = b'GHGIIDX3'
+HEADER = struct.Struct('<8s10I')
+
+
+class CompactIndexException(Exception):
+    pass
+
+
+def _uint32s(values):
+    arr = array.array('I', values)
+    if sys.byteorder != 'little':
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def write_compact_index(aka_index, trigram_index, gin_index, outfile, masks=None):
+    """ Write the compact encoding of the provided (json-style) indexes to the
+    binary file object `outfile`, with the (stem_ids, alias_masks, phrases)
+    `masks` that `GIN.compile_masks` compiles from `gin_index` (by default,
+    compiling them).
+    """
+    if masks is None:
+        try:
+            from .gin import GIN
+        except:
+            from gin import GIN
+        masks = GIN.compile_masks(gin_index, store=False)
+    stem_ids, alias_masks, phrases = masks
+    phrases = {' '.join(key): alias for key, alias in phrases.items()}
+    strings = set(aka_index)
+    strings |= {v[0] for v in aka_index.values()}
+    strings |= set(gin_index) | set(trigram_index)
+    strings |= set(stem_ids) | set(phrases)
+    encoded = sorted(s.encode('utf-8') for s in strings)
+    string_ids = {s.decode('utf-8'): i for i, s in enumerate(encoded)}
+    string_offsets = [0]
+    for s in encoded:
+        string_offsets += [string_offsets[-1] + len(s)]
+    blob = b''.join(encoded)
+
+    aliases = sorted(aka_index, key=lambda a: string_ids[a])
+    alias_ids = {a: i for i, a in enumerate(aliases)}
+    ordered = sorted(aliases, key=lambda a: (aka_index[a][1], string_ids[a]))
+    ordered_ids = {a: i for i, a in enumerate(ordered)}
+
+    def postings(index, ids=alias_ids):
+        keys = sorted(index, key=lambda k: string_ids[k])
+        offsets = [0]
+        values = []
+        for k in keys:
+            values += sorted(ids[a] for a in index[k])
+            offsets += [len(values)]
+        return [string_ids[k] for k in keys], offsets, values
+
+    gin_keys, gin_offsets, gin_values = postings(gin_index)
+    tri_keys, tri_offsets, tri_values = postings(trigram_index)
+    tri_ordered = postings(trigram_index, ordered_ids)[2]
+
+    stems = sorted(stem_ids, key=lambda stem: string_ids[stem])
+    positions = {stem_ids[stem]: i for i, stem in enumerate(stems)}
+    stem_offsets, alias_stems, alias_tokens = [0], [], []
+    for alias in aliases:
+        mask, tokens = alias_masks.get(alias, (0, 0))
+        while mask:
+            bit = mask & -mask
+            alias_stems += [positions[bit]]
+            mask ^= bit
+        stem_offsets += [len(alias_stems)]
+        alias_tokens += [tokens]
+    phrase_keys = sorted(phrases, key=lambda k: string_ids[k])
+
+    outfile.write(HEADER.pack(
+        MAGIC, len(encoded), len(aliases), len(gin_keys), len(gin_values),
+        len(tri_keys), len(tri_values), len(stems), len(alias_stems),
+        len(phrase_keys), len(blob)))
+    for section in [
+        string_offsets,
+        [string_ids[a] for a in aliases],
+        [string_ids[aka_index[a][0]] for a in aliases],
+        [aka_index[a][1] for a in aliases],
+        gin_keys, gin_offsets, gin_values,
+        tri_keys, tri_offsets, tri_values, tri_ordered,
+        [alias_ids[a] for a in ordered],
+        [aka_index[a][1] for a in ordered],
+        [string_ids[a] for a in ordered],
+        [string_ids[aka_index[a][0]] for a in ordered],
+        [string_ids[stem] for stem in stems],
+        stem_offsets, alias_stems, alias_tokens,
+        [string_ids[k] for k in phrase_keys],
+        [alias_ids[phrases[k]] for k in phrase_keys],
+    ]:
+        outfile.write(_uint32s(section))
+    outfile.write(blob)
+
+
+class Postings(Mapping):
+    """ A read-only {key: [alias, ...]} view of a compact postings section """
+
+    def __init__(self, index, keys, offsets, values):
+        self._index = index
+        self._keys = keys
+        self._offsets = offsets
+        self._values = values
+
+    def position(self, key):
+        return self._index.search(self._keys, key)
+
+    def ids(self, key):
+        """ Return the alias ids posted under `key`, as a memoryview """
+        i = self.position(key)
+        if i < 0:
+            return self._values[0:0]
+        return self._values[self._offsets[i]:self._offsets[i+1]]
+
+    def __getitem__(self, key):
+        i = self.position(key)
+        if i < 0:
+            raise KeyError(key)
+        return [self._index.alias(a)
+                for a in self._values[self._offsets[i]:self._offsets[i+1]]]
+
+    def __contains__(self, key):
+        return self.position(key) >= 0
+
+    def __iter__(self):
+        return (self._index.string(k) for k in self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class OrderedPostings(Postings):
+    """ A read-only {trigram: ordered alias ids} view of the trigram postings
+    in ordered ids, as memoryviews
+    """
+
+    def __getitem__(self, key):
+        i = self.position(key)
+        if i < 0:
+            raise KeyError(key)
+        return self._values[self._offsets[i]:self._offsets[i+1]]
+
+
+class Strings(Sequence):
+    """ A read-only sequence of the strings with the string ids `ids` """
+
+    def __init__(self, index, ids):
+        self._index = index
+        self._ids = ids
+
+    def __getitem__(self, i):
+        return self._index.string(self._ids[i])
+
+    def __len__(self):
+        return len(self._ids)
+
+
+class Aliases(Mapping):
+    """ A read-only {alias: [product, n_trigrams]} view matching aka_index.json """
+
+    def __init__(self, index):
+        self._index = index
+
+    def __getitem__(self, alias):
+        i = self._index.alias_id(alias)
+        if i < 0:
+            raise KeyError(alias)
+        return [self._index.product(i), self._index.alias_trigrams[i]]
+
+    def __contains__(self, alias):
+        return self._index.alias_id(alias) >= 0
+
+    def __iter__(self):
+        return (self._index.alias(i) for i in range(len(self)))
+
+    def __len__(self):
+        return len(self._index.alias_names)
+
+
+class StemIds(Mapping):
+    """ A read-only {stem: bit} view matching `GIN.stem_ids`, whose bits are
+    the positions of the stems in the sorted stems section
+    """
+
+    def __init__(self, index):
+        self._index = index
+
+    def __getitem__(self, stem):
+        i = self._index.search(self._index.stems, stem)
+        if i < 0:
+            raise KeyError(stem)
+        return 1 << i
+
+    def __contains__(self, stem):
+        return self._index.search(self._index.stems, stem) >= 0
+
+    def __iter__(self):
+        return (self._index.string(k) for k in self._index.stems)
+
+    def __len__(self):
+        return len(self._index.stems)
+
+
+class AliasMasks(Mapping):
+    """ A read-only {alias: (stem bitmask, token count)} view matching
+    `GIN.alias_masks`, of the bits of `StemIds`
+    """
+
+    def __init__(self, index):
+        self._index = index
+        self._len = None
+
+    def __getitem__(self, alias):
+        index = self._index
+        i = index.alias_id(alias)
+        if i < 0 or not index.alias_tokens[i]:
+            raise KeyError(alias)
+        mask = 0
+        for stem in index.alias_stems[index.alias_stem_offsets[i]:
+                                      index.alias_stem_offsets[i+1]]:
+            mask |= 1 << stem
+        return mask, index.alias_tokens[i]
+
+    def __iter__(self):
+        index = self._index
+        return (index.alias(i) for i in range(len(index.alias_names))
+                if index.alias_tokens[i])
+
+    def __len__(self):
+        # (counted once, since `load_once` tests the view on every use)
+        if self._len is None:
+            self._len = sum(1 for tokens in self._index.alias_tokens if tokens)
+        return self._len
+
+
+class Phrases(Mapping):
+    """ A read-only {sorted stems: alias} view matching `GIN.phrases` """
+
+    def __init__(self, index):
+        self._index = index
+
+    def __getitem__(self, key):
+        index = self._index
+        i = index.search(index.phrase_keys, ' '.join(key))
+        if i < 0:
+            raise KeyError(key)
+        return index.alias(index.phrase_aliases[i])
+
+    def __iter__(self):
+        return (tuple(self._index.string(k).split(' '))
+                for k in self._index.phrase_keys)
+
+    def __len__(self):
+        return len(self._index.phrase_keys)
+
+
+class CompactIndex:
+    """ Zero-copy accessor for a compact index buffer """
+    _opened = {}
+    _shared = set()  # names of the shared memory blocks created by `share`
+
+    def __init__(self, buffer, owner=None):
+        # `owner` keeps the mmap or shared memory block alive with this index
+        self._owner = owner
+        self._buffer = memoryview(buffer)
+        self._views = [self._buffer]
+        if len(self._buffer) < HEADER.size:
+            raise CompactIndexException('compact index is truncated')
+        (magic, n_strings, n_aliases, n_gin_keys, n_gin_values, n_tri_keys,
+         n_tri_values, n_stems, n_alias_stems, n_phrases,
+         blob_size) = HEADER.unpack_from(self._buffer)
+        if magic != MAGIC:
+            raise CompactIndexException('not a compact index: {}'.format(magic))
+        if sys.byteorder != 'little':
+            raise CompactIndexException(
+                'compact indexes require a little-endian platform')
+
+        self._cursor = HEADER.size
+        self.string_offsets = self._section(n_strings + 1)
+        self.alias_names = self._section(n_aliases)
+        self.alias_products = self._section(n_aliases)
+        self.alias_trigrams = self._section(n_aliases)
+        gin = [self._section(n_gin_keys), self._section(n_gin_keys + 1),
+               self._section(n_gin_values)]
+        tri = [self._section(n_tri_keys), self._section(n_tri_keys + 1),
+               self._section(n_tri_values)]
+        tri_ordered = self._section(n_tri_values)
+        self.ordered_ids = self._section(n_aliases)
+        self.ordered_trigrams = self._section(n_aliases)
+        self.ordered_names = Strings(self, self._section(n_aliases))
+        self.ordered_products = Strings(self, self._section(n_aliases))
+        self.stems = self._section(n_stems)
+        self.alias_stem_offsets = self._section(n_aliases + 1)
+        self.alias_stems = self._section(n_alias_stems)
+        self.alias_tokens = self._section(n_aliases)
+        self.phrase_keys = self._section(n_phrases)
+        self.phrase_aliases = self._section(n_phrases)
+        self.blob = self._buffer[self._cursor:self._cursor + blob_size]
+        self._views += [self.blob]
+        if len(self.blob) != blob_size:
+            raise CompactIndexException('compact index is truncated')
+
+        self.gin_index = Postings(self, *gin)
+        self.trigram_index = Postings(self, *tri)
+        self.ordered_trigram_index = OrderedPostings(self, tri[0], tri[1], tri_ordered)
+        self.aka_index = Aliases(self)
+        self.stem_ids = StemIds(self)
+        self.alias_masks = AliasMasks(self)
+        self.phrases = Phrases(self)
+
+    def _section(self, count):
+        end = self._cursor + 4 * count
+        if end > len(self._buffer):
+            raise CompactIndexException('compact index is truncated')
+        section = self._buffer[self._cursor:end]
+        self._views += [section, section.cast('I')]
+        self._cursor = end
+        return self._views[-1]
+
+    def close(self):
+        """ Release the buffer and close its mmap or shared memory block """
+        for view in reversed(self._views):
+            view.release()
+        if self._owner is not None:
+            self._owner.close()
+
+    @classmethod
+    def open(cls, path=MASTER_COMPACT_INDEX):
+        """ Return the (per-process, shared) index memory-mapped from `path` """
+        with LOCK:
+            if path not in cls._opened:
+                with open(path, 'rb') as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                cls._opened[path] = cls(mapped, owner=mapped)
+            return cls._opened[path]
+
+    @classmethod
+    def attach(cls, name):
+        """ Return the index held in the existing shared memory block `name` """
+        # (multiprocessing is slow to import, so only when it's first needed)
+        from multiprocessing import shared_memory, resource_tracker
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # before python 3.13 attaching always registers the block with the
+            # resource tracker, which would unlink it when a process that
+            # didn't create it exits
+            shm = shared_memory.SharedMemory(name=name)
+            if name not in cls._shared:
+                resource_tracker.unregister(shm._name, 'shared_memory')
+        return cls(shm.buf, owner=shm)
+
+    def share(self, name=None):
+        """ Copy the index into a new shared memory block and return the block;
+        other processes can then `attach` to it by its name. The caller is
+        responsible for unlinking the block.
+        """
+        from multiprocessing import shared_memory
+        shm = shared_memory.SharedMemory(
+            name=name, create=True, size=len(self._buffer))
+        shm.buf[:len(self._buffer)] = self._buffer
+        CompactIndex._shared.add(shm.name)
+        return shm
+
+    def string(self, i):
+        return str(self.blob[self.string_offsets[i]:self.string_offsets[i+1]], 'utf-8')
+
+    def alias(self, i):
+        return self.string(self.alias_names[i])
+
+    def product(self, i):
+        return self.string(self.alias_products[i])
+
+    def search(self, ids, key):
+        """ Binary search the sorted string ids `ids` for the string `key`,
+        returning its position or -1 if it is absent.
+        """
+        target = key.encode('utf-8')
+        lo, hi = 0, len(ids)
+        offsets = self.string_offsets
+        while lo < hi:
+            mid = (lo + hi) // 2
+            i = ids[mid]
+            value = bytes(self.blob[offsets[i]:offsets[i+1]])
+            if value == target:
+                return mid
+            if value < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return -1
+
+    def alias_id(self, alias):
+        return self.search(self.alias_names, alias)
@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+""" An optional SQLite storage backend for the products, origins, references,
+and indexes, generated by generate.py alongside the json datasets.
+
+Everything is read through read-only Mapping views that look up rows on
+demand, so a process only ever holds the entries it actually uses (products
+are resolved through the `parents` table as they're first used), and
+trigram alias search is an indexed FTS5 query rather than a scan of the
+trigram index. Select the backend with `use`:
+
+    ghgi.database.use(SQLITE)  # or each class' `load_sqlite`
+    ghgi.database.use(JSON)    # the default
+
+Tables (rows are inserted, and iterated, in the order of the json datasets):
+
+    products          name, data (json, with its `name` set)
+    parents           product, parent, pct, kind (`super` or `loss`), for
+                      every inheritance edge, as the products list them
+    origins           name, super, path
+    origin_entries    origin, key, value (json), every key of an origin file
+    refs              id, data (json)
+    aliases           alias, product, trigrams (as aka_index.json)
+    alias_trigrams    FTS5 trigram-tokenized aliases, rowid = aliases.rowid
+    alias_trigram_instances
+                      the (alias rowid, trigram) postings of alias_trigrams
+    gin               stem, alias (as gin_product_index.json)
+"""
+import os
+import json
+import sqlite3
+from collections.abc import Mapping
+try:
+    from .datasets import MASTER_DATABASE
+    from .lazy import LOCK
+    from .graph import ProductGraph
+except:
+    from datasets import MASTER_DATABASE
+    from lazy import LOCK
+    from graph import ProductGraph
+
+JSON = 'json'
+SQLITE = 'sqlite'
+
+SCHEMA = '''
+CREATE TABLE products (name TEXT NOT NULL UNIQUE, data TEXT NOT NULL);
+CREATE TABLE parents (
+    product TEXT NOT NULL, parent TEXT NOT NULL, pct REAL, kind TEXT NOT NULL);
+CREATE INDEX parents_product ON parents (product);
+CREATE INDEX parents_parent ON parents (parent);
+CREATE TABLE origins (name TEXT NOT NULL UNIQUE, super TEXT, path TEXT);
+CREATE TABLE origin_entries (
+    origin TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,
+    UNIQUE (origin, key));
+CREATE TABLE refs (id TEXT NOT NULL UNIQUE, data TEXT NOT NULL);
+CREATE TABLE aliases (
+    alias TEXT NOT NULL UNIQUE, product TEXT NOT NULL, trigrams INTEGER NOT NULL);
+CREATE VIRTUAL TABLE alias_trigrams USING fts5(alias, tokenize='trigram');
+CREATE VIRTUAL TABLE alias_trigram_instances
+    USING fts5vocab(alias_trigrams, instance);
+CREATE TABLE gin (stem TEXT NOT NULL, alias TEXT NOT NULL);
+CREATE INDEX gin_stem ON gin (stem);
+'''
+
+
+class DatabaseException(Exception):
+    pass
+
+
+def write_database(path, products, origins, references, aka_index, gin_index):
+    """ Write a new database at `path` from the (json-style) master products,
+    {origin name: (file path, origin data)}, references, aka index, and GIN
+    index, replacing any existing file only once it is complete.
+    """
+    partial = path + '.partial'
+    if os.path.exists(partial):
+        os.remove(partial)
+    connection = sqlite3.connect(partial)
+    try:
+        connection.executescript(SCHEMA)
+        products = {k: v for k, v in products.items() if not k.startswith('_')}
+        connection.executemany('INSERT INTO products VALUES (?, ?)', [
+            (name, json.dumps(dict(product, name=name)))
+            for name, product in products.items()])
+        edges = []
+        for name, product in products.items():
+            for kind in ['super', 'loss']:
+                for parent, pct in (product.get(kind) or {}).items():
+                    edges += [(name, parent, pct, kind)]
+        connection.executemany('INSERT INTO parents VALUES (?, ?, ?, ?)', edges)
+        connection.executemany('INSERT INTO origins VALUES (?, ?, ?)', [
+            (name, data.get('super'), os.path.basename(origin_path))
+            for name, (origin_path, data) in origins.items()])
+        connection.executemany('INSERT INTO origin_entries VALUES (?, ?, ?)', [
+            (name, key, json.dumps(value))
+            for name, (_, data) in origins.items() for key, value in data.items()])
+        connection.executemany('INSERT INTO refs VALUES (?, ?)', [
+            (str(key), json.dumps(value)) for key, value in references.items()])
+        rows = [(i + 1, alias, product, trigrams)
+                for i, (alias, (product, trigrams)) in enumerate(aka_index.items())]
+        connection.executemany(
+            'INSERT INTO aliases (rowid, alias, product, trigrams) VALUES (?, ?, ?, ?)',
+            rows)
+        connection.executemany(
+            'INSERT INTO alias_trigrams (rowid, alias) VALUES (?, ?)',
+            [(rowid, alias) for rowid, alias, _, _ in rows])
+        connection.executemany('INSERT INTO gin VALUES (?, ?)', [
+            (stem, alias) for stem, aliases in gin_index.items() for alias in aliases])
+        connection.commit()
+        connection.execute('VACUUM')
+    finally:
+        connection.close()
+    os.replace(partial, path)
+
+
+class Table(Mapping):
+    """ A read-only {key: value} view of the rows selected by `select` (with
+    the key as its last parameter), decoded by `decode(rows)`. `keys` selects
+    the keys, in order.
+    """
+
+    def __init__(self, database, select, keys, decode, params=()):
+        self._database = database
+        self._select = select
+        self._keys = keys
+        self._decode = decode
+        self._params = tuple(params)
+        self._len = None
+
+    def rows(self, key):
+        return self._database.execute(self._select, self._params + (key,)).fetchall()
+
+    def __getitem__(self, key):
+        rows = self.rows(key)
+        if not rows:
+            raise KeyError(key)
+        return self._decode(rows)
+
+    def __contains__(self, key):
+        return bool(self.rows(key))
+
+    def __iter__(self):
+        return (row[0] for row in self._database.execute(self._keys, self._params))
+
+    def __len__(self):
+        # the database is read-only, so this only needs counting once
+        if self._len is None:
+            self._len = sum(1 for _ in self)
+        return self._len
+
+
+def _json(rows):
+    return json.loads(rows[0][0])
+
+
+class Origins(Mapping):
+    """ A read-only {origin: {key: value}} view matching the origin files """
+
+    def __init__(self, database):
+        self._database = database
+        self._origins = {}
+
+    def __getitem__(self, origin):
+        if origin not in self._origins:
+            if origin not in self._database.origin_supers:
+                raise KeyError(origin)
+            self._origins[origin] = Table(
+                self._database,
+                'SELECT value FROM origin_entries WHERE origin = ? AND key = ?',
+                'SELECT key FROM origin_entries WHERE origin = ? ORDER BY rowid',
+                _json, params=(origin,))
+        return self._origins[origin]
+
+    def __iter__(self):
+        return iter(self._database.origin_supers)
+
+    def __len__(self):
+        return len(self._database.origin_supers)
+
+
+class Database:
+    """ Read-only accessor for a database written by `write_database`. Each
+    process (e.g. each forked worker) opens its own connection.
+    """
+    _opened = {}
+
+    def __init__(self, path):
+        if not os.path.exists(path):
+            raise DatabaseException('database {} not found'.format(path))
+        self.path = path
+        self._pid = None
+        self._connection = None
+
+        self.products = Table(
+            self, 'SELECT data FROM products WHERE name = ?',
+            'SELECT name FROM products ORDER BY rowid', _json)
+        self.references = Table(
+            self, 'SELECT data FROM refs WHERE id = ?',
+            'SELECT id FROM refs ORDER BY rowid', _json)
+        self.aka_index = Table(
+            self, 'SELECT product, trigrams FROM aliases WHERE alias = ?',
+            'SELECT alias FROM aliases ORDER BY rowid', lambda rows: list(rows[0]))
+        self.gin_index = Table(
+            self, 'SELECT alias FROM gin WHERE stem = ? ORDER BY rowid',
+            'SELECT stem FROM gin GROUP BY stem ORDER BY min(rowid)',
+            lambda rows: [row[0] for row in rows])
+        self.origins = Origins(self)
+        self.origin_supers = dict(self.execute(
+            'SELECT name, super FROM origins ORDER BY rowid').fetchall())
+
+    @classmethod
+    def open(cls, path=MASTER_DATABASE):
+        """ Return the (per-process, shared) database at `path` """
+        with LOCK:
+            if path not in cls._opened:
+                cls._opened[path] = cls(path)
+            return cls._opened[path]
+
+    def connection(self):
+        if self._pid != os.getpid():
+            with LOCK:
+                if self._pid != os.getpid():
+                    # never use a connection across a fork
+                    self._connection = sqlite3.connect(
+                        'file:{}?mode=ro'.format(self.path), uri=True,
+                        check_same_thread=False)
+                    self._pid = os.getpid()
+        return self._connection
+
+    def execute(self, sql, params=()):
+        return self.connection().execute(sql, params)
+
+    def product_graph(self) -> ProductGraph:
+        """ Return the inheritance graph of the products, read from the
+        parents table rather than the products themselves
+        """
+        return ProductGraph.from_edges(
+            [row[0] for row in self.execute(
+                'SELECT name FROM products ORDER BY rowid')],
+            self.execute('SELECT product, parent FROM parents ORDER BY rowid'))
+
+    def trigram_candidates(self, termgram) -> list:
+        """ Return the (alias, product, alias trigram count, shared trigram
+        count, position of the first shared trigram in `termgram`) of every
+        alias sharing a trigram with `termgram`, as `Trigram.match` counts
+        them. A term too short to have trigrams only matches equal aliases.
+        """
+        grams = {}
+        for i, gram in enumerate(termgram):
+            count, first = grams.get(gram, (0, i))
+            grams[gram] = (count + 1, first)
+        if any(len(gram) != 3 for gram in grams):
+            return [(alias, product, trigrams, 1, 0) for alias, product, trigrams
+                    in self.execute(
+                        'SELECT alias, product, trigrams FROM aliases '
+                        'WHERE lower(trim(alias)) = ?', (termgram[0],))]
+        values = ', '.join(['(?, ?, ?)'] * len(grams))
+        params = [value for gram, (count, first) in grams.items()
+                  for value in (gram, count, first)]
+        return self.execute(
+            'WITH grams (gram, count, first) AS (VALUES {}) '
+            'SELECT a.alias, a.product, a.trigrams, hits.count, hits.first '
+            'FROM (SELECT doc, sum(count) AS count, min(first) AS first '
+            '      FROM (SELECT DISTINCT doc, term FROM alias_trigram_instances '
+            '            WHERE term IN (SELECT gram FROM grams)) '
+            '      JOIN grams ON term = gram GROUP BY doc) AS hits '
+            'JOIN aliases AS a ON a.rowid = hits.doc'.format(values),
+            params).fetchall()
+
+
+def use(backend=SQLITE, path=MASTER_DATABASE):
+    """ Serve the products, origins, references, and indexes from the json
+    datasets (JSON, the default) or the database at `path` (SQLITE).
+    """
+    try:
+        from .product import Product
+        from .origin import Origin
+        from .reference import Reference
+        from .gin import GIN
+        from .trigram import Trigram
+    except:
+        from product import Product
+        from origin import Origin
+        from reference import Reference
+        from gin import GIN
+        from trigram import Trigram
+    classes = [Reference, Origin, GIN, Trigram, Product]
+    if backend == SQLITE:
+        database = Database.open(path)
+        for cls in classes:
+            cls.load_sqlite(database=database)
+    elif backend == JSON:
+        for cls in classes:
+            cls.load_json()
+    else:
+        raise ValueError('Unknown backend {}'.format(backend))
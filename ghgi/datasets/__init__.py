@@ -1,6 +1,9 @@
 import os
 import pathlib
 from .master import MASTER_PRODUCTS, MASTER_AKA_INDEX, MASTER_TRIGRAM_INDEX, MASTER_GIN_INDEX
+from .master import MASTER_COMPACT_INDEX, MASTER_BASELINES, MASTER_LEXICON
+from .master import MASTER_STEMS
+from .master import MASTER_DATABASE, MASTER_ORIGIN_MANIFEST, MASTER_SNAPSHOT
 from .source import SOURCE_PRODUCTS, SOURCE_REFERENCES, SOURCE_FOOD_VALUES
 
 DATASETS = pathlib.Path(__file__).parent.absolute()
@@ -17,6 +20,13 @@ MASTER_PRODUCTS = os.path.join(MASTER, MASTER_PRODUCTS)
 MASTER_AKA_INDEX = os.path.join(MASTER, MASTER_AKA_INDEX)
 MASTER_TRIGRAM_INDEX = os.path.join(MASTER, MASTER_TRIGRAM_INDEX)
 MASTER_GIN_INDEX = os.path.join(MASTER, MASTER_GIN_INDEX)
+MASTER_COMPACT_INDEX = os.path.join(MASTER, MASTER_COMPACT_INDEX)
+MASTER_BASELINES = os.path.join(MASTER, MASTER_BASELINES)
+MASTER_LEXICON = os.path.join(MASTER, MASTER_LEXICON)
+MASTER_STEMS = os.path.join(MASTER, MASTER_STEMS)
+MASTER_DATABASE = os.path.join(MASTER, MASTER_DATABASE)
+MASTER_ORIGIN_MANIFEST = os.path.join(MASTER, MASTER_ORIGIN_MANIFEST)
+MASTER_SNAPSHOT = os.path.join(MASTER, MASTER_SNAPSHOT)
 
 ORIGINS = os.path.join(MASTER, 'origins')
 
@@ -2,3 +2,10 @@ MASTER_PRODUCTS = 'products.json'
 MASTER_AKA_INDEX = 'aka_index.json'
 MASTER_TRIGRAM_INDEX = 'trigram_product_index.json'
 MASTER_GIN_INDEX = 'gin_product_index.json'
+MASTER_COMPACT_INDEX = 'indexes.bin'
+MASTER_BASELINES = 'baselines.json'
+MASTER_LEXICON = 'lexicon.json'
+MASTER_STEMS = 'stems.json'
+MASTER_DATABASE = 'ghgi.sqlite3'
+MASTER_ORIGIN_MANIFEST = 'origins.json'
+MASTER_SNAPSHOT = 'snapshot.pickle'
@@ -0,0 +1,16 @@
+import os
+import hashlib
+
+
+def file_digest(paths):
+    """ Return a hex digest of the names and contents of the files at `paths`,
+    e.g. to detect whether an artifact generated from them is stale. Only the
+    file names (not their directories) are hashed, so the digest doesn't depend
+    on where the package is installed.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.basename(path).encode('utf-8'))
+        with open(path, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
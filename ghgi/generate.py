@@ -1,13 +1,22 @@
 #!/usr/bin/env python
 from ghgi.product import Product
+import os
 import json
 
 
 from .trigram import build_indexes
+from .compact import write_compact_index
+from .database import write_database
+from .snapshot import write_snapshot
 from .gin import GIN
+from .parser import Parser
+from .tagger import LexiconTagger
 from .datasets import SOURCE_PRODUCTS, SOURCE_FOOD_VALUES
-from .datasets import MASTER_GIN_INDEX
-from .origin import Origin
+from .datasets import MASTER_GIN_INDEX, MASTER_COMPACT_INDEX, MASTER_BASELINES
+from .datasets import MASTER_LEXICON, MASTER_DATABASE, MASTER_SNAPSHOT, REFERENCES
+from .datasets import MASTER_STEMS
+from .datasets import ORIGINS, MASTER_ORIGIN_MANIFEST
+from .origin import Origin, build_manifest
 from .datasets import MASTER_PRODUCTS, MASTER_AKA_INDEX, MASTER_TRIGRAM_INDEX
 
 
@@ -95,11 +104,32 @@ def extend_products(infile, outfile):
     return extended_products
 
 
+def lexicon_vocabulary(aka_index):
+    """ The words expected in ingredient text: the tokens of every alias, the
+    parser's own vocabulary, and common numbers and punctuation, in lower and
+    title case.
+    """
+    words = set()
+    for alias in aka_index:
+        words.update(GIN.tokenize(alias))
+    for vocabulary in [Parser.UNITS, Parser.TEXT_NUMBERS, Parser.STOPWORDS,
+                       Parser.PREP_MODS, Parser.VULGAR_FRACTIONS.values()]:
+        for phrase in vocabulary:
+            words.update(GIN.tokenize(str(phrase)))
+    words.update(str(i) for i in range(101))
+    words.update(['(', ')', '[', ']', ',', '.', ':', ';', '-', '--', '/', '&'])
+    return words | {w.title() for w in words}
+
+
 if __name__ == "__main__":
     sort_products(SOURCE_PRODUCTS)
     sort_products(SOURCE_FOOD_VALUES)
-    for origin in Origin.ORIGIN_PATHS.values():
-        sort_origin(origin)
+    for entry in build_manifest()['origins'].values():
+        sort_origin(os.path.join(ORIGINS, entry['path']))
+
+    # index the (sorted) origin files
+    with open(MASTER_ORIGIN_MANIFEST, 'w') as manifest_file:
+        json.dump(build_manifest(), manifest_file, indent=4)
 
     # create the un-localized master products database
     with open(SOURCE_PRODUCTS) as f:
@@ -109,6 +139,10 @@ if __name__ == "__main__":
     # validate products
     Product.validate_db()
 
+    # precompute the efficiency baselines and ratios
+    with open(MASTER_BASELINES, 'w') as baselines_file:
+        json.dump(Product.build_baselines_artifact(), baselines_file, indent=4)
+
     with open(MASTER_PRODUCTS, 'r') as products:
         aka_index, trigram_index = build_indexes(products)
         print('There are {} aliases in the database.'.format(len(aka_index)))
@@ -117,8 +151,38 @@ if __name__ == "__main__":
         with open(MASTER_TRIGRAM_INDEX, 'w') as tri_file:
             json.dump(trigram_index, tri_file, indent=4)
 
+    # the stems of the vocabulary, so that queries rarely need the stemmer.
+    # They're written before the GIN index is built from them, and any table
+    # loaded earlier is dropped so that it's reread.
+    with open(MASTER_STEMS, 'w') as stems_file:
+        json.dump(GIN.build_stems(lexicon_vocabulary(aka_index)),
+                  stems_file, indent=4)
+    GIN._stems = None
+
     gin_index = GIN.generate()
     with open(MASTER_GIN_INDEX, 'w') as gin_file:
         json.dump(gin_index, gin_file, indent=4)
 
+    # the compact binary equivalent of the aka, trigram, and GIN indexes
+    with open(MASTER_COMPACT_INDEX, 'wb') as compact_file:
+        write_compact_index(aka_index, trigram_index, gin_index, compact_file)
+
+    # the optional SQLite backend (see ghgi.database)
+    origins = {}
+    for origin, origin_path in Origin.ORIGIN_PATHS.items():
+        with open(origin_path) as origin_file:
+            origins[origin] = (origin_path, json.load(origin_file))
+    with open(REFERENCES) as references_file:
+        references = json.load(references_file)
+    write_database(MASTER_DATABASE, extended, origins, references,
+                   aka_index, gin_index)
+
+    # the part of speech tags of the vocabulary that don't depend on context
+    with open(MASTER_LEXICON, 'w') as lexicon_file:
+        json.dump(LexiconTagger.build(lexicon_vocabulary(aka_index)),
+                  lexicon_file, indent=4)
+
+    # every runtime dataset, and the tables derived from them, for ghgi.warm
+    write_snapshot(MASTER_SNAPSHOT)
+
     # TODO: there should be some sort of check on the origins. Maybe via test?
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+""" Dataset generations: a consistent set of every dataset store (products,
+origins, references, indexes, and the tables derived from them) that can be
+replaced as a whole while the process keeps serving requests.
+
+    future = ghgi.generation.reload()  # from the regenerated snapshot
+    future.result()  # (optionally) wait until it's active
+
+Activating a generation swaps every store in at once. Reads of the stores made
+between two activations can still mix generations, so a request that needs a
+consistent view pins one for its duration:
+
+    with Generation.pinned():
+        score_recipe(lines)
+
+Results cached from the stores (lookup and GIN query results, Scorer matches,
+the GHG matrix) are stamped with them, and so are dropped once they're
+replaced; contexts still pinned to a replaced generation compute theirs
+without caching them. The persistent cache is rehashed on activation.
+"""
+import threading
+import contextlib
+from concurrent.futures import Future
+try:
+    from .lazy import LOCK, PINNED
+    from .product import Product
+    from .origin import Origin
+    from .reference import Reference
+    from .gin import GIN
+    from .trigram import Trigram
+    from .persistent import PersistentCache
+except:
+    from lazy import LOCK, PINNED
+    from product import Product
+    from origin import Origin
+    from reference import Reference
+    from gin import GIN
+    from trigram import Trigram
+    from persistent import PersistentCache
+
+
+class Generation:
+    """ A {(class, attribute): value} set of every dataset store, and the
+    VERSION and dataset digest it was built from, if known.
+    """
+    STORES = [
+        (Product, '_db'), (Product, '_fvdb'), (Product, '_graph'),
+        (Product, '_resolved'), (Product, '_baselines'),
+        (Product, '_baselines_artifact'),
+        (Origin, '_manifest'), (Origin, '_registry'), (Origin, '_db'),
+        (Origin, '_flattened'),
+        (Reference, '_db'),
+        (GIN, '_index'), (GIN, '_aka_index'), (GIN, '_stems'), (GIN, '_stem_ids'),
+        (GIN, '_alias_masks'), (GIN, '_phrases'),
+        (Trigram, '_product_index'), (Trigram, '_aka_index'),
+        (Trigram, '_database'), (Trigram, '_index'),
+    ]
+    _active = None
+
+    def __init__(self, stores: dict, version=None, digest=None):
+        missing = [store for store in self.STORES if store not in stores]
+        if missing:
+            raise ValueError('generation is missing stores {}'.format(
+                ', '.join('{}.{}'.format(owner.__name__, name)
+                          for owner, name in missing)))
+        self.stores = {store: stores[store] for store in self.STORES}
+        self.version = version
+        self.digest = digest
+
+    @classmethod
+    def capture(cls) -> 'Generation':
+        """ Load every store (as their first use would) and return them """
+        with LOCK:
+            Product.db()
+            Product.fv_db()
+            Product.efficiency_baselines()
+            Reference.db()
+            for origin in Origin.ORIGINS:
+                Origin.flattened(origin)
+            GIN.index()
+            GIN.aka_index()
+            GIN.stems()
+            GIN.alias_masks()
+            GIN.phrases()
+            Trigram.aka_index()
+            if Trigram._database is None:
+                Trigram.index()
+            return cls({(owner, name): getattr(owner, name)
+                        for owner, name in cls.STORES})
+
+    def is_active(self) -> bool:
+        return all(getattr(owner, name) is value
+                   for (owner, name), value in self.stores.items())
+
+    @classmethod
+    def active(cls) -> 'Generation':
+        """ Return the generation of the stores in use, loading them first if
+        they've been replaced other than by `activate` (e.g. by
+        `ghgi.database.use`) or aren't loaded yet.
+        """
+        with LOCK:
+            if cls._active is None or not cls._active.is_active():
+                cls._active = cls.capture()
+            return cls._active
+
+    def activate(self) -> 'Generation':
+        """ Serve every store from this generation from now on; contexts
+        pinned to another keep reading that one.
+        """
+        with LOCK:
+            for (owner, name), value in self.stores.items():
+                setattr(owner, name, value)
+            Generation._active = self
+        cache = PersistentCache.active()
+        if cache is not None:
+            cache.rehash(self.stores)
+        return self
+
+    @classmethod
+    @contextlib.contextmanager
+    def pinned(cls, generation: 'Generation' = None):
+        """ Read every store from `generation` (by default the active one) in
+        this context, even if another generation is activated meanwhile.
+        """
+        generation = generation or cls.active()
+        token = PINNED.set(generation.stores)
+        try:
+            yield generation
+        finally:
+            PINNED.reset(token)
+
+
+def reload(path=None, verify=True) -> Future:
+    """ Build a generation from the snapshot at `path` (see `ghgi.snapshot`;
+    by default the one written by generate.py) in a background thread and
+    activate it. Return a Future of the activated generation.
+    """
+    try:
+        from .snapshot import load, MASTER_SNAPSHOT
+    except:
+        from snapshot import load, MASTER_SNAPSHOT
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(load(path or MASTER_SNAPSHOT, verify).activate())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name='ghgi-reload', daemon=True).start()
+    return future
@@ -1,12 +1,30 @@
+import os
 import json
+import threading
 import collections
+from types import MappingProxyType
 from ghgi.datasets import master
-import nltk
 
 try:
     from .datasets import MASTER_PRODUCTS, MASTER_GIN_INDEX, MASTER_AKA_INDEX
+    from .datasets import MASTER_COMPACT_INDEX, MASTER_DATABASE, MASTER_STEMS
+    from .compact import CompactIndex
+    from .database import Database
+    from .tokenizer import Tokenizer
+    from .tagger import Tagger
+    from .cache import Cache, LRU
+    from .lazy import load_once, assigned, LOCK
+    from .persistent import PersistentCache
 except:
     from datasets import MASTER_PRODUCTS, MASTER_GIN_INDEX, MASTER_AKA_INDEX
+    from datasets import MASTER_COMPACT_INDEX, MASTER_DATABASE, MASTER_STEMS
+    from compact import CompactIndex
+    from database import Database
+    from tokenizer import Tokenizer
+    from tagger import Tagger
+    from cache import Cache, LRU
+    from lazy import load_once, assigned, LOCK
+    from persistent import PersistentCache
 
 # words to exclude from stemming
 NO_STEM = {
@@ -32,46 +50,210 @@ MUST_MATCH = {
     'leaf'
 }
 
+QUERY_CACHE_SIZE = 4096
+# the most stems of words missing from the stem table to remember
+STEM_MEMO_SIZE = 4096
+
+# matching engines: the GIN index (the default), or an Aho-Corasick scan of
+# each line for every alias (see `ghgi.scanner`)
+GIN_ENGINE = 'gin'
+SCANNER = 'scanner'
+ENGINES = [GIN_ENGINE, SCANNER]
+
 
 class GIN:
     """ A GIN index optimized for matching ingredient entries.
     """
 
     _stemmer = None
+    _stems = None
+    _stem_memo = None
     _index = None
     _aka_index = None
+    _stem_ids = None
+    _alias_masks = None
+    _phrases = None
+    _query_cache = None
+    _engine = None
+    _scanner = None
+    _phrase_stats = collections.Counter()
+    _phrase_lock = threading.Lock()  # for the stats
 
     @classmethod
     def index(cls):
-        if not cls._index:
+        def load():
             with open(MASTER_GIN_INDEX) as p:
-                cls._index = json.load(p)
-        return cls._index
+                return MappingProxyType(json.load(p))
+        return load_once(cls, '_index', load)
 
     @classmethod
     def aka_index(cls):
-        if not cls._aka_index:
+        def load():
             with open(MASTER_AKA_INDEX) as p:
-                cls._aka_index = json.load(p)
-        return cls._aka_index
+                return MappingProxyType(json.load(p))
+        return load_once(cls, '_aka_index', load)
+
+    @classmethod
+    def load_compact(cls, path=MASTER_COMPACT_INDEX, index=None):
+        """ Serve the GIN and aka indexes, and their stem masks and phrases,
+        from a compact binary index (see `ghgi.compact`), memory-mapped from
+        `path` unless an already opened `CompactIndex` is provided, e.g. one
+        attached from shared memory.
+        """
+        if index is None:
+            index = CompactIndex.open(path)
+        cls._index = index.gin_index
+        cls._aka_index = index.aka_index
+        cls._stem_ids = index.stem_ids
+        cls._alias_masks = index.alias_masks
+        cls._phrases = index.phrases
+
+    @classmethod
+    def load_sqlite(cls, path=MASTER_DATABASE, database=None):
+        """ Serve the GIN and aka indexes from the database at `path` (see
+        `ghgi.database`) unless an already opened `Database` is provided.
+        """
+        if database is None:
+            database = Database.open(path)
+        cls._index = database.gin_index
+        cls._aka_index = database.aka_index
+        cls._stem_ids = None
+        cls._alias_masks = None
+        cls._phrases = None
+
+    @classmethod
+    def load_json(cls):
+        """ Serve the GIN and aka indexes from their json files again (the
+        default)
+        """
+        cls._index = None
+        cls._aka_index = None
+        cls._stem_ids = None
+        cls._alias_masks = None
+        cls._phrases = None
+
+    @classmethod
+    def stem_ids(cls):
+        """ Return a dict of {stem: bit} over every stem used by an alias in the
+        GIN index (and the MUST_MATCH words), as used by `alias_masks`.
+        """
+        return load_once(cls, '_stem_ids', lambda: cls.compile_masks()[0])
+
+    @classmethod
+    def alias_masks(cls):
+        """ Return a dict of {alias: (stem bitmask, token count)} for every alias
+        in the GIN index, so candidate filtering needs no re-tokenization.
+        """
+        return load_once(cls, '_alias_masks', lambda: cls.compile_masks()[1])
+
+    @classmethod
+    def phrases(cls):
+        """ Return a dict of {sorted stems: alias} of the aliases that any term
+        with exactly those stems matches with a confidence of 1.0 (see
+        `phrase_match`).
+        """
+        return load_once(cls, '_phrases', lambda: cls.compile_masks()[2])
+
+    @classmethod
+    def compile_masks(cls, index=None, store=True):
+        """ Return the `stem_ids`, `alias_masks` and `phrases` of the aliases
+        of the GIN `index` (by default the one in use), and set them if `store`
+        """
+        stem_ids = {m: 1 << i for i, m in enumerate(sorted(MUST_MATCH))}
+        alias_masks = {}
+        groups = collections.defaultdict(list)  # {stem set: [(size, key, alias)]}
+        for aliases in (cls.index() if index is None else index).values():
+            for alias in aliases:
+                if alias in alias_masks:
+                    continue
+                tokens = cls.tokenize(alias)
+                mask = 0
+                stems = cls.stem(tokens)
+                for stem in stems:
+                    if stem not in stem_ids:
+                        stem_ids[stem] = 1 << len(stem_ids)
+                    mask |= stem_ids[stem]
+                alias_masks[alias] = (mask, len(tokens))
+                key = tuple(sorted(cls.stem(cls.lower(tokens))))
+                if set(key) == set(stems):
+                    groups[frozenset(key)] += [(len(tokens), key, alias)]
+        # a term matches every alias with the same stems, and prefers the one
+        # with the fewest tokens; if that's a tie, it's left to `match`
+        phrases = {}
+        for group in groups.values():
+            group.sort()
+            if len(group) == 1 or group[0][0] < group[1][0]:
+                _, key, alias = group[0]
+                phrases[key] = alias
+        if store:
+            cls._alias_masks = alias_masks
+            cls._stem_ids = stem_ids
+            cls._phrases = phrases
+        return stem_ids, alias_masks, phrases
+
+    @classmethod
+    def mask(cls, stems: list) -> int:
+        """ Return the bitmask of `stems`, ignoring any that no alias uses """
+        stem_ids = cls.stem_ids()
+        mask = 0
+        for stem in stems:
+            mask |= stem_ids.get(stem, 0)
+        return mask
 
     @classmethod
     def stemmer(cls):
-        if cls._stemmer is None:
-            cls._stemmer = nltk.SnowballStemmer('english')
-        return cls._stemmer
+        def load():
+            import nltk  # slow to import, so only when it's first needed
+            return nltk.SnowballStemmer('english')
+        return load_once(cls, '_stemmer', load, loaded=assigned)
 
     @classmethod
     def tokenize(cls, text: str) -> list:
-        return nltk.word_tokenize(text)
+        return Tokenizer.active().tokenize(text)
+
+    @classmethod
+    def stems(cls, path=MASTER_STEMS) -> dict:
+        """ Return the {word: stem} table generated with the indexes, or an
+        empty table if it hasn't been generated.
+        """
+        def load():
+            try:
+                with open(path) as f:
+                    return json.load(f)
+            except FileNotFoundError:
+                return {}
+        return load_once(cls, '_stems', load, loaded=assigned)
+
+    @classmethod
+    def build_stems(cls, vocabulary) -> dict:
+        """ Return the stem table of the words in `vocabulary` and NO_STEM """
+        stemmer = cls.stemmer()
+        return {word: word if word in NO_STEM else stemmer.stem(word)
+                for word in sorted(set(vocabulary) | NO_STEM)}
+
+    @classmethod
+    def stem_memo(cls) -> Cache:
+        """ The stems of the words missing from the stem table """
+        return load_once(cls, '_stem_memo',
+                         lambda: Cache(STEM_MEMO_SIZE, LRU), loaded=assigned)
 
     @classmethod
     def stem(cls, tokens: list) -> list:
-        return [cls.stemmer().stem(t) if t not in NO_STEM else t for t in tokens]
+        stems = cls.stems()
+        return [stems[t] if t in stems else cls.stem_word(t) for t in tokens]
+
+    @classmethod
+    def stem_word(cls, word: str) -> str:
+        """ Return the stem of a `word` that isn't in the stem table (see
+        `stem`), running the stemmer only if it isn't in the memo either.
+        """
+        if word in NO_STEM:
+            return word
+        return cls.stem_memo().memoize(word, lambda: cls.stemmer().stem(word))
 
     @classmethod
     def pos_tag(cls, tokens: list) -> list:
-        return nltk.pos_tag(tokens)
+        return Tagger.active().tag(tokens)
 
     @classmethod
     def lower(cls, tokens: list) -> list:
@@ -110,8 +292,107 @@ class GIN:
 
             return gin_index
 
+    @classmethod
+    def engine(cls) -> str:
+        """ Return the matching engine in use (see `use_engine`) """
+        return load_once(
+            cls, '_engine',
+            lambda: cls.check_engine(os.environ.get('GHGI_MATCHER', GIN_ENGINE)))
+
+    @classmethod
+    def use_engine(cls, name: str) -> str:
+        """ Match with the engine `name`, one of ENGINES, from now on """
+        cls._engine = cls.check_engine(name)
+        cache = PersistentCache.active()
+        if cache is not None:
+            cache.rehash()
+        return cls._engine
+
+    @staticmethod
+    def check_engine(name: str) -> str:
+        if name not in ENGINES:
+            raise ValueError('Unknown matching engine {}, expected one of {}'.format(
+                name, ENGINES))
+        return name
+
+    @classmethod
+    def scanner(cls) -> 'AliasScanner':
+        """ Return the AliasScanner of the aka index, compiling it when it's
+        first used (or replaced).
+        """
+        try:
+            from .scanner import AliasScanner
+        except:
+            from scanner import AliasScanner
+        aka_index = cls.aka_index()
+        scanner = cls._scanner
+        if scanner is None or not scanner.compiled_from(aka_index):
+            with LOCK:
+                scanner = cls._scanner
+                if scanner is None or not scanner.compiled_from(aka_index):
+                    scanner = AliasScanner(aka_index, cls)
+                    if aka_index is cls._aka_index:
+                        cls._scanner = scanner
+        return scanner
+
+    @classmethod
+    def stamp(cls) -> tuple:
+        """ The indexes, engine, and tokenizer and tagger backends that query
+        results are computed from
+        """
+        return (cls.index(), cls.aka_index(), cls.engine(), Tokenizer.active(),
+                Tagger.active())
+
+    @classmethod
+    def query_cache(cls) -> Cache:
+        return load_once(cls, '_query_cache', cls.configure_cache, loaded=assigned)
+
+    @classmethod
+    def configure_cache(cls, maxsize=QUERY_CACHE_SIZE, policy=LRU):
+        """ Replace the query cache with an empty one of `maxsize` entries and
+        eviction `policy` (see `ghgi.cache`); a `maxsize` of 0 disables it.
+        """
+        cls._query_cache = Cache(maxsize, policy, stamp=cls.stamp)
+        return cls._query_cache
+
     @classmethod
     def query(cls, term: str):
+        """ Return the (alias, aka entry, match pct, match size, term size)
+        of the best match for `term`, as `match`, from the query cache.
+        """
+        alias, aka, pct, match_size, term_size = cls.query_cache().memoize(
+            term, lambda: cls.frozen(cls.match(term)))
+        return alias, list(aka) if aka is not None else None, pct, match_size, term_size
+
+    @classmethod
+    def phrase_match(cls, tokens: list, stemmed_tokens: list):
+        """ Return the `match` of `tokens` if they're an alias, give or take
+        word order and inflection (see `phrases`), or None.
+        """
+        alias = cls.phrases().get(tuple(sorted(stemmed_tokens)))
+        with cls._phrase_lock:
+            cls._phrase_stats['hits' if alias is not None else 'misses'] += 1
+        if alias is None:
+            return None
+        return alias, cls.aka_index()[alias], 1.0, len(tokens), len(tokens)
+
+    @classmethod
+    def phrase_stats(cls) -> dict:
+        """ Return the number of `phrase_match` hits and misses, and its hit
+        rate.
+        """
+        with cls._phrase_lock:
+            hits, misses = cls._phrase_stats['hits'], cls._phrase_stats['misses']
+        return {'hits': hits, 'misses': misses,
+                'hit_rate': hits / (hits + misses) if hits + misses else 0.0}
+
+    @staticmethod
+    def frozen(result):
+        alias, aka, pct, match_size, term_size = result
+        return alias, tuple(aka) if aka is not None else None, pct, match_size, term_size
+
+    @classmethod
+    def match(cls, term: str):
         # TODO: this could be improved by making better use of the pos_tags
         # and semantics. We can get smarter about identifying different patterns,
         # e.g. [NN1, OR, NN2] -> pick one of the NNx, vs [NN1, OR, NN2, NN3] in which case
@@ -126,12 +407,20 @@ class GIN:
         if len(tokens) == 1 and cls.lower(tokens)[0] in NO_SOLO:
             return None, None, 0.0, 0, 0
 
+        if cls.engine() == SCANNER:
+            return cls.scanner().match(tokens, cls)
+
         # identify the locations of ORs
         or_indexes = [i for i in range(
             len(tokens)) if tokens[i].lower() == 'or']
 
         if not or_indexes:
-            return cls.best_match(tokens)
+            # most terms are an alias as is, which needs no tagging or scoring
+            stemmed_tokens = cls.stem(cls.lower(tokens))
+            match = cls.phrase_match(tokens, stemmed_tokens)
+            if match is not None:
+                return match
+            return cls.best_match(tokens, stemmed_tokens=stemmed_tokens)
 
         # otherwise, generate whatever variants make most sense based on the OR
         # structure, match each variant's tokens, and select the best one.
@@ -166,7 +455,7 @@ class GIN:
         return candidates[0]
 
     @classmethod
-    def best_match(cls, tokens: list, use_keyword: bool = True):
+    def best_match(cls, tokens: list, use_keyword: bool = True, stemmed_tokens=None):
         pos_tags = cls.pos_tag(tokens)
         # the keyword is the last noun: must match if use_keyword is True
         key_word_index = None
@@ -176,7 +465,8 @@ class GIN:
                     key_word_index = len(pos_tags)-(i+1)
                     break
 
-        stemmed_tokens = cls.stem(cls.lower(tokens))
+        if stemmed_tokens is None:
+            stemmed_tokens = cls.stem(cls.lower(tokens))
 
         if key_word_index is not None:
             matches = cls.index().get(stemmed_tokens[key_word_index], [])
@@ -196,23 +486,27 @@ class GIN:
                 for m in matches:
                     results[m] += 1
 
-        # filter for candidate matches that have *all* of their terms in the query
+        # filter for candidate matches that have *all* of their terms in the
+        # query, i.e. whose stem masks are a subset of the query's
+        alias_masks = cls.alias_masks()
+        query_mask = cls.mask(stemmed_tokens)
+        must_mask = cls.mask([m for m in MUST_MATCH if m in stemmed_tokens])
         full_matches = {}
         for r in results:
-            stemmed_result_tokens = cls.stem(cls.tokenize(r))
-            if all([srt in stemmed_tokens for srt in stemmed_result_tokens]):
-                musts = [m for m in MUST_MATCH if m in stemmed_tokens]
-                if musts:
-                    if not all([m in stemmed_result_tokens for m in musts]):
-                        continue
-                full_matches[r] = results[r]
+            result_mask = alias_masks[r][0]
+            if result_mask & ~query_mask:
+                continue
+            if result_mask & must_mask != must_mask:
+                continue
+            full_matches[r] = results[r]
 
         results = full_matches
 
         if len(results) == 0:
             if use_keyword:
                 # fall back to not matching on keyword
-                return cls.best_match(tokens, use_keyword=False)
+                return cls.best_match(tokens, use_keyword=False,
+                                      stemmed_tokens=stemmed_tokens)
             else:
                 return None, None, 0.0, 0, 0
 
@@ -221,7 +515,7 @@ class GIN:
         term_size = len(tokens)
         if len(max_matches) == 1:
             selected = max_matches[0]
-            match_size = len(cls.tokenize(selected))
+            match_size = alias_masks[selected][1]
             match_pct = max_match_count*2 / (match_size + term_size)
             return selected, cls.aka_index()[selected], match_pct, match_size, term_size
 
@@ -229,7 +523,7 @@ class GIN:
         best_score = 0.0
         selected = None
         for match in max_matches:
-            match_size = len(cls.tokenize(match))
+            match_size = alias_masks[match][1]
             match_pct = max_match_count*2 / (match_size + term_size)
             if match_pct > best_score:
                 # find the one that matched most closely as a share of its size
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+import collections.abc
+try:
+    from .lazy import LOCK
+except:
+    from lazy import LOCK
+
+
+class ProductGraphException(Exception):
+    pass
+
+
+class ProductGraph:
+    """ The product inheritance graph, compiled from the `super` and `loss`
+    entries of a products database into a topologically ordered DAG.
+
+    `order` lists every product after all of its parents, so that inherited
+    attributes can be computed for the whole database in a single linear pass
+    (see `resolve`).
+    """
+    PARENTS = 'super'
+    LOSS = 'loss'
+
+    def __init__(self, db):
+        self.link(db, [(name, parent) for name, product in db.items()
+                       for kind in [self.PARENTS, self.LOSS]
+                       for parent in product.get(kind) or {}])
+
+    @classmethod
+    def from_edges(cls, names, edges) -> 'ProductGraph':
+        """ Return the graph of the products `names`, given the (product,
+        parent) edges of their `super` and then `loss` entries, in order,
+        without the products themselves (see `ghgi.database`).
+        """
+        graph = cls.__new__(cls)
+        graph.link(names, edges)
+        return graph
+
+    def link(self, names, edges):
+        names = list(names)
+        known = set(names)
+        self.parents = {name: [] for name in names}  # for parents in the db
+        self.missing = {}  # {name: [parent, ...]} for parents not in the db
+        self.children = collections.defaultdict(list)
+        for name, parent in edges:
+            if parent not in known:
+                missing = self.missing.setdefault(name, [])
+                if parent not in missing:
+                    missing += [parent]
+            elif parent not in self.parents[name]:
+                self.parents[name] += [parent]
+                self.children[parent] += [name]
+        self.order = self.sort()
+
+    @property
+    def roots(self):
+        """ The products without (known) parents, in topological order """
+        return [name for name in self.order if not self.parents[name]]
+
+    def sort(self):
+        """ Return the products in topological order (Kahn's algorithm),
+        raising a ProductGraphException if the graph has a cycle.
+        """
+        indegree = {name: len(parents) for name, parents in self.parents.items()}
+        ready = collections.deque(
+            name for name, degree in indegree.items() if not degree)
+        order = []
+        while ready:
+            name = ready.popleft()
+            order += [name]
+            for child in self.children.get(name, []):
+                indegree[child] -= 1
+                if not indegree[child]:
+                    ready.append(child)
+
+        if len(order) < len(self.parents):
+            cycle = self.cycle({n for n, degree in indegree.items() if degree})
+            raise ProductGraphException('Product inheritance cycle: {}'.format(
+                ' -> '.join(cycle)))
+        return order
+
+    def cycle(self, unsorted):
+        """ Return one cycle, as a list of names, among the `unsorted` products
+        (which must each have a parent in `unsorted`).
+        """
+        name = min(unsorted)
+        seen = []
+        while name not in seen:
+            seen += [name]
+            name = min(p for p in self.parents[name] if p in unsorted)
+        return seen[seen.index(name):] + [name]
+
+    def resolve(self, resolve_product):
+        """ Call `resolve_product(name, resolved)` for every product in
+        topological order, where `resolved` is the {name: result} dict of the
+        products resolved so far (which includes all of the product's parents),
+        and return the completed dict.
+        """
+        resolved = {}
+        for name in self.order:
+            resolved[name] = resolve_product(name, resolved)
+        return resolved
+
+    def resolve_lazily(self, resolve_product) -> 'LazyResolution':
+        """ As `resolve`, but return a read-only {name: result} view that only
+        resolves a product (after its parents) the first time it's read.
+        """
+        return LazyResolution(self, resolve_product)
+
+
+class LazyResolution(collections.abc.Mapping):
+    """ The {name: result} products of a graph, each resolved by
+    `resolve_product(name, resolved)` on first use (see
+    `ProductGraph.resolve_lazily`). `resolved` holds the results so far.
+    """
+
+    def __init__(self, graph: ProductGraph, resolve_product):
+        self.graph = graph
+        self.resolve_product = resolve_product
+        self.resolved = {}
+
+    def __getitem__(self, name):
+        value = self.resolved.get(name, self)
+        if value is not self:
+            return value
+        if name not in self.graph.parents:
+            raise KeyError(name)
+        with LOCK:
+            if name not in self.resolved:
+                for parent in self.graph.parents[name]:
+                    self[parent]
+                self.resolved[name] = self.resolve_product(name, self)
+            return self.resolved[name]
+
+    def __contains__(self, name):
+        return name in self.graph.parents
+
+    def __iter__(self):
+        return iter(self.graph.order)
+
+    def __len__(self):
+        return len(self.graph.order)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+""" Helpers for deferring expensive work until it's first needed, to keep
+`import ghgi` cheap for short-lived processes, and for doing it only once when
+several threads need it at the same time.
+"""
+import threading
+import contextvars
+
+# the lock held while anything lazy is first loaded. There's only the one,
+# since loaders call each other (e.g. Product.db resolves every product
+# through Origin.load), and so per-store locks could deadlock; it's only ever
+# contended while a store is first loading.
+LOCK = threading.RLock()
+
+# the {(owner, name): value} stores that this context is pinned to, if any
+# (see `ghgi.generation`), which `current` reads in place of the attributes
+PINNED = contextvars.ContextVar('ghgi_pinned_stores', default=None)
+
+
+def assigned(value) -> bool:
+    """ `load_once`'s test for stores whose unloaded value is None """
+    return value is not None
+
+
+def current(owner, name):
+    """ Return `owner.<name>`, or its pinned value if this context is pinned
+    to one.
+    """
+    pinned = PINNED.get()
+    if pinned is not None:
+        value = pinned.get((owner, name), pinned)
+        if value is not pinned:
+            return value
+    return getattr(owner, name)
+
+
+def replaced() -> bool:
+    """ Return whether this context is pinned to stores that are no longer
+    the ones in use, e.g. to a dataset generation that has been replaced, so
+    results computed from them shouldn't be cached in place of the current
+    ones.
+    """
+    pinned = PINNED.get()
+    return pinned is not None and any(
+        getattr(owner, name) is not value
+        for (owner, name), value in pinned.items())
+
+
+def load_once(owner, name, load, loaded=bool):
+    """ Return `owner.<name>` (see `current`), first setting it to `load()`
+    if it isn't `loaded` (by default, if it's empty).
+
+    Concurrent first calls only load it once, and it's only set once `load`
+    has returned, so other threads never see a partly built value. `load` may
+    itself set other attributes, which should then be set before it returns.
+    """
+    value = current(owner, name)
+    if loaded(value):
+        return value
+    with LOCK:
+        value = getattr(owner, name)
+        if not loaded(value):
+            value = load()
+            setattr(owner, name, value)
+    return value
+
+
+class cached_classproperty:
+    """ A class attribute whose value is computed by the decorated function
+    (which takes the class) the first time it's read, and then stored on the
+    class in place of the descriptor, so later reads are plain attribute reads.
+
+        class Parser:
+            @cached_classproperty
+            def RE_UNITS_PLURAL(cls):
+                return re.compile(...)
+    """
+
+    def __init__(self, function):
+        self.function = function
+        self.name = function.__name__
+        self.__doc__ = function.__doc__
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        with LOCK:
+            value = owner.__dict__.get(self.name, self)
+            if value is self:
+                value = self.function(owner)
+                setattr(owner, self.name, value)
+        return value
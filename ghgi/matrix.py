@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+""" A dense products × origins × GHGFlavor matrix of fully resolved GHG
+values, for computing the impacts of many ingredients at once.
+
+NumPy is an optional dependency of ghgi, and is only required by this module.
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    from .product import Product
+    from .origin import Origin, GHGFlavor, UnknownOriginException
+    from .lazy import LOCK, replaced
+except:
+    from product import Product
+    from origin import Origin, GHGFlavor, UnknownOriginException
+    from lazy import LOCK, replaced
+
+FLAVORS = list(GHGFlavor)
+
+
+class GHGMatrix:
+    """ `values[p, o, f]` is the GHG mass ratio of product `p` from origin `o`
+    for flavor `f` (indexed by GHGFlavor.value), with all `super` origin and
+    parent product fallbacks resolved; it is NaN where no value is available.
+    """
+    _matrix = None
+    _source = None
+
+    def __init__(self, products, origins, values):
+        self.products = list(products)
+        self.origins = list(origins)
+        self.values = values
+        self.values.setflags(write=False)
+        self.product_index = {p: i for i, p in enumerate(self.products)}
+        self.origin_index = {o: i for i, o in enumerate(self.origins)}
+
+    @classmethod
+    def build(cls, resolved=None):
+        """ Build a matrix from a resolved product table (by default, that of
+        the products database; see `Product.resolved`).
+        """
+        if np is None:
+            raise ImportError('GHGMatrix requires numpy')
+        if resolved is None:
+            resolved = Product.resolved()
+        products = sorted(resolved)
+        origins = list(Origin.ORIGINS)
+        values = np.full((len(products), len(origins), len(FLAVORS)), np.nan)
+        for p, name in enumerate(products):
+            for o, origin in enumerate(origins):
+                for f, value in enumerate(resolved[name].ghg[origin]):
+                    if value is not None:
+                        values[p, o, f] = value
+        return cls(products, origins, values)
+
+    @classmethod
+    def get(cls):
+        """ Return the (lazily built) matrix of the products database; it is
+        rebuilt if the database has been reloaded since. A context pinned to a
+        replaced database (see `ghgi.generation`) gets a matrix of its own.
+        """
+        resolved = Product.resolved()
+        with LOCK:
+            if cls._matrix is None or cls._source is not resolved:
+                if replaced():
+                    return cls.build(resolved)
+                cls._matrix = cls.build(resolved)
+                cls._source = resolved
+            return cls._matrix
+
+    def product_ids(self, names):
+        """ Return an int array of the row ids of the products `names`, with -1
+        for unknown products.
+        """
+        return np.array([self.product_index.get(n, -1) for n in names], dtype=np.intp)
+
+    def origin_id(self, origin):
+        if not origin:
+            origin = Origin.DEFAULT
+        if origin not in self.origin_index:
+            raise UnknownOriginException(
+                'Origin {} not found in database'.format(origin))
+        return self.origin_index[origin]
+
+    def impacts(self, product_ids, masses):
+        """ Return an (n, origins, flavors) array of the GHG impacts of `masses`
+        (in grams) of the products `product_ids`, for every origin and flavor.
+        Impacts of unknown products (id -1) or unavailable values are NaN.
+        """
+        product_ids = np.asarray(product_ids, dtype=np.intp)
+        masses = np.asarray(masses, dtype=float)
+        values = self.values[np.where(product_ids < 0, 0, product_ids)]
+        values = np.where((product_ids < 0)[:, None, None], np.nan, values)
+        return values * masses[:, None, None]
+
+    def impact(self, product_ids, masses, origin=None, flavor: GHGFlavor = None):
+        """ Return the (n,) array of impacts for a single origin and flavor
+        (by default Origin.DEFAULT and GHGFlavor.MEDIAN).
+        """
+        if not flavor:
+            flavor = GHGFlavor.MEDIAN
+        o = self.origin_id(origin)
+        product_ids = np.asarray(product_ids, dtype=np.intp)
+        masses = np.asarray(masses, dtype=float)
+        values = self.values[np.where(product_ids < 0, 0, product_ids), o, flavor.value]
+        return np.where(product_ids < 0, np.nan, values) * masses
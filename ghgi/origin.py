@@ -1,18 +1,36 @@
 import os
 import json
+import hashlib
+import logging
 from enum import Enum
+from types import MappingProxyType
 try:
-    from .datasets import ORIGINS
+    from .datasets import ORIGINS, MASTER_DATABASE, MASTER_ORIGIN_MANIFEST
     from .reference import Reference
+    from .database import Database
+    from .cache import Cache, LRU
+    from .lazy import load_once, assigned, current, LOCK
 except:
-    from datasets import ORIGINS
+    from datasets import ORIGINS, MASTER_DATABASE, MASTER_ORIGIN_MANIFEST
     from reference import Reference
+    from database import Database
+    from cache import Cache, LRU
+    from lazy import load_once, assigned, current, LOCK
+
+# the most origin entries (loaded, flattened, and resolved per product) to keep
+# in memory, e.g. a few hundred origins of a few hundred products each
+ORIGIN_CACHE_ENTRIES = 100000
 
 
 class UnknownOriginException(Exception):
     pass
 
 
+class OriginHierarchyException(Exception):
+    """ An origin's `super` chain is broken, or cyclic """
+    pass
+
+
 class GHGFlavor(Enum):
     """ GHGFlavor indexes the different GHG values available in the database
     as follows:
@@ -31,28 +49,99 @@ class GHGFlavor(Enum):
     P_90 = 3
 
 
-class Origin:
-    _db = {}
-    ORIGIN_PATHS = {}
-    DEFAULT = None
-    SUPER = 'super'
-    for root, dirs, files in os.walk(ORIGINS, topdown=True):
-        # index the origin data files for retrieval as needed
-        for name in files:
+def build_manifest(root=ORIGINS) -> dict:
+    """ Index the origin files under `root`, returning the manifest that
+    generate.py writes: the default (root) origin, and each origin's path
+    (relative to `root`), `super`, content digest, and number of entries.
+    """
+    origins = {}
+    for directory, dirs, files in os.walk(root, topdown=True):
+        dirs.sort()
+        # parents come before their subdirectories, e.g. global.json first
+        for name in sorted(files):
             if not name.endswith('.json'):
                 continue
-            if not DEFAULT:
-                # topdown means the first file is the parent (global.json)
-                DEFAULT = name[:-5]
-            ORIGIN_PATHS[name[:-5]] = os.path.join(root, name)
+            path = os.path.join(directory, name)
+            with open(path, 'rb') as f:
+                content = f.read()
+            data = json.loads(content)
+            origins[name[:-5]] = {
+                'path': os.path.relpath(path, root).replace(os.sep, '/'),
+                Origin.SUPER: data.get(Origin.SUPER),
+                'digest': hashlib.sha256(content).hexdigest(),
+                'entries': len([k for k in data
+                                if k != Origin.SUPER and not k.startswith('_')]),
+            }
+    roots = [name for name, entry in origins.items() if not entry[Origin.SUPER]]
+    if len(roots) != 1:
+        raise OriginHierarchyException(
+            'expected a single root origin, found {}'.format(roots))
+    for name, entry in origins.items():
+        if entry[Origin.SUPER] and entry[Origin.SUPER] not in origins:
+            raise OriginHierarchyException('Origin {} has unknown super {}'.format(
+                name, entry[Origin.SUPER]))
+    return {'default': roots[0], 'origins': origins}
+
+
+def registry(manifest) -> dict:
+    """ Return the ORIGINS, ORIGIN_PATHS and DEFAULT of an origin manifest """
+    paths = {name: os.path.join(ORIGINS, entry['path'])
+             for name, entry in manifest['origins'].items()}
+    return {'ORIGINS': list(paths), 'ORIGIN_PATHS': paths,
+            'DEFAULT': manifest['default']}
 
-    ORIGINS = list(ORIGIN_PATHS.keys())
+
+class OriginRegistry(type):
+    """ Reads the origin manifest the first time the ORIGINS, ORIGIN_PATHS or
+    DEFAULT class attributes are used, rather than on import. They're kept in
+    the `_registry` store, so a context pinned to a dataset generation (see
+    `ghgi.generation`) sees that generation's origins.
+    """
+    MANIFESTED = ('ORIGINS', 'ORIGIN_PATHS', 'DEFAULT')
+
+    def __getattr__(cls, name):
+        if name not in cls.MANIFESTED:
+            raise AttributeError(name)
+        return load_once(cls, '_registry', lambda: registry(cls.manifest()),
+                         loaded=assigned)[name]
+
+
+class Origin(metaclass=OriginRegistry):
+    _db = Cache(ORIGIN_CACHE_ENTRIES, LRU, weigh=len)
+    _flattened = Cache(ORIGIN_CACHE_ENTRIES, LRU, weigh=len)
+    _manifest = None
+    _registry = None
+    SUPER = 'super'
+
+    @classmethod
+    def manifest(cls) -> dict:
+        """ Return the origin manifest (see `build_manifest`) written by
+        generate.py, or, if it's missing, one built from the origin files.
+        """
+        def load():
+            try:
+                with open(MASTER_ORIGIN_MANIFEST) as m:
+                    return json.load(m)
+            except FileNotFoundError:
+                logging.warning('{} not found; please regenerate it'.format(
+                    MASTER_ORIGIN_MANIFEST))
+                return build_manifest()
+        return load_once(cls, '_manifest', load, loaded=assigned)
+
+    @classmethod
+    def configure_cache(cls, max_entries=ORIGIN_CACHE_ENTRIES):
+        """ Keep up to about `max_entries` entries of loaded origin files, and
+        as many of flattened origins (and of the GHG values resolved per
+        origin for products loaded from now on), evicting the least recently
+        used origins first.
+        """
+        cls._db = Cache(max_entries, LRU, weigh=len)
+        cls._flattened = Cache(max_entries, LRU, weigh=len)
 
     @classmethod
     def valid(cls, origin):
         # ensure all entries have at least one valid source, and four values
-        cls.load(origin)
-        for k, entry in cls._db[origin].items():
+        for k, entry in cls.load(origin).items():
             if k == Origin.SUPER or k.startswith('_'):
                 continue
             if not all([str(e) in Reference.db() for e in entry[0]]):
@@ -64,18 +153,102 @@ class Origin:
     @classmethod
     def validate(cls):
         for origin in cls.ORIGINS:
+            cls.flattened(origin)  # raises on a broken or cyclic `super` chain
             if not cls.valid(origin):
                 raise Exception('origin {} has invalid data'.format(origin))
 
     @classmethod
-    def load(cls, origin):
-        if origin not in cls._db:
-            # lazy load the data files
-            if origin not in cls.ORIGINS:
-                raise UnknownOriginException(
-                    'Origin {} not found in database'.format(origin))
-            with open(cls.ORIGIN_PATHS[origin]) as o:
-                cls._db[origin] = json.load(o)
+    def load(cls, origin) -> dict:
+        """ Return the data of `origin`, loading its file if it isn't loaded """
+        # (a single get, since another thread may evict it in between)
+        db = current(cls, '_db')
+        data = db.get(origin)
+        if data is not None:
+            return data
+        with LOCK:
+            data = db.get(origin)
+            if data is None:
+                # lazy load the data files
+                if origin not in cls.ORIGIN_PATHS:
+                    raise UnknownOriginException(
+                        'Origin {} not found in database'.format(origin))
+                with open(cls.ORIGIN_PATHS[origin], 'rb') as o:
+                    content = o.read()
+                digest = cls.manifest()['origins'][origin]['digest']
+                if hashlib.sha256(content).hexdigest() != digest:
+                    logging.warning('origin {} has changed; please regenerate {}'.format(
+                        origin, MASTER_ORIGIN_MANIFEST))
+                data = json.loads(content)
+                db[origin] = data
+        return data
+
+    @classmethod
+    def load_sqlite(cls, path=MASTER_DATABASE, database=None):
+        """ Serve the origins from the database at `path` (see `ghgi.database`)
+        unless an already opened `Database` is provided.
+        """
+        if database is None:
+            database = Database.open(path)
+        cls._db = database.origins
+        cls._flattened = Cache(cls._flattened.maxsize, LRU, weigh=len)
+
+    @classmethod
+    def load_json(cls):
+        """ Serve the origins from their json files again (the default) """
+        cls.configure_cache(cls._flattened.maxsize)
+
+    @classmethod
+    def chain(cls, origin) -> list:
+        """ Return `origin` followed by its `super`, that origin's `super`, and
+        so on up to the root origin, loading each of them.
+        """
+        chain = []
+        while origin:
+            if origin in chain:
+                raise OriginHierarchyException('Origin super cycle: {}'.format(
+                    ' -> '.join(chain[chain.index(origin):] + [origin])))
+            if origin not in cls.ORIGIN_PATHS and chain:
+                raise OriginHierarchyException(
+                    'Origin {} has unknown super {}'.format(chain[-1], origin))
+            chain += [origin]
+            origin = cls.load(origin).get(cls.SUPER)
+        return chain
+
+    @classmethod
+    def flattened(cls, origin):
+        """ Return the read-only {product: (entry, source origin)} table of
+        every product available to `origin`, i.e. its own entries merged over
+        those of its `super` chain, where `source origin` is the nearest origin
+        in the chain with an entry for the product.
+
+        Tables are compiled once per origin, from the (shared) table of its
+        `super`.
+        """
+        flattened = current(cls, '_flattened')
+        flat = flattened.get(origin)
+        if flat is not None:
+            return flat
+        with LOCK:
+            flat = flattened.get(origin)
+            if flat is None:
+                chain = cls.chain(origin)
+                table = dict(cls.flattened(chain[1])) if len(chain) > 1 else {}
+                for product, entry in cls.load(origin).items():
+                    if product == cls.SUPER or product.startswith('_'):
+                        continue
+                    table[product] = (entry, origin)
+                flat = MappingProxyType(table)
+                flattened[origin] = flat
+        return flat
+
+    @classmethod
+    def provenance(cls, origin, product):
+        """ Return the origin that supplies `product`'s values for `origin`, or
+        None if no origin in its `super` chain has any.
+        """
+        flat = cls.flattened(origin).get(product)
+        if flat is not None:
+            return flat[1]
 
     @classmethod
     def values(cls, origin, product):
@@ -83,16 +256,9 @@ class Origin:
         tree from the database. If no data is available and the origin has no
         super, return None.
         """
-        if origin not in cls._db:
-            cls.load(origin)
-
-        # if the data is available for this origin, return it
-        if product in cls._db[origin]:
-            return cls._db[origin][product]
-
-        # if the origin has a super, try that
-        if cls._db[origin].get(cls.SUPER):
-            return cls.values(cls._db[origin][cls.SUPER], product)
+        flat = cls.flattened(origin).get(product)
+        if flat is not None:
+            return flat[0]
 
     @classmethod
     def ghg_value(cls, product, origin, flavor: GHGFlavor):
@@ -101,12 +267,12 @@ class Origin:
         """
         if not origin:
             origin = cls.DEFAULT
-        if origin not in cls.ORIGINS:
+        if origin not in cls.ORIGIN_PATHS:
             raise UnknownOriginException(
                 'Origin {} not found in database'.format(origin))
         if not flavor:
             flavor = GHGFlavor.MEDIAN
 
-        values = cls.values(origin, product)
-        if values is not None:
-            return values[1][flavor.value]
+        flat = cls.flattened(origin).get(product)
+        if flat is not None:
+            return flat[0][1][flavor.value]
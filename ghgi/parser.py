@@ -6,13 +6,19 @@ except:
     from convert import Convert
 import re
 import logging
-from sre_constants import FAILURE
-import nltk
 from typing import Tuple
 try:
     from .product import Product, Ingredient
+    from .tokenizer import Tokenizer
+    from .tagger import Tagger
+    from .persistent import PersistentCache, PARSE
+    from .lazy import cached_classproperty
 except:
     from product import Product, Ingredient
+    from tokenizer import Tokenizer
+    from tagger import Tagger
+    from persistent import PersistentCache, PARSE
+    from lazy import cached_classproperty
 
 logging.basicConfig(level=logging.INFO)
 
@@ -299,9 +305,18 @@ class Parser:
     }
 
     # --------- Unit regexes --------- #
-    RE_UNIT_LABELS = [case_insensitize(unit) for unit in UNITS]
-    RE_UNITS_GROUP = r'|'.join(RE_UNIT_LABELS)
-    RE_UNITS_PLURAL = re.compile(r'({})([sei]*)$'.format(RE_UNITS_GROUP))
+    # (these are big, so they're only compiled when first used)
+    @cached_classproperty
+    def RE_UNIT_LABELS(cls):
+        return [case_insensitize(unit) for unit in cls.UNITS]
+
+    @cached_classproperty
+    def RE_UNITS_GROUP(cls):
+        return r'|'.join(cls.RE_UNIT_LABELS)
+
+    @cached_classproperty
+    def RE_UNITS_PLURAL(cls):
+        return re.compile(r'({})([sei]*)$'.format(cls.RE_UNITS_GROUP))
 
     # --------- Input text pre-processing --------- #
     @classmethod
@@ -325,7 +340,9 @@ class Parser:
 
         return text, sustain, unsustain
 
-    RE_GAPLESS_UNITS = re.compile(r'(\d)({})\b'.format(RE_UNITS_GROUP))
+    @cached_classproperty
+    def RE_GAPLESS_UNITS(cls):
+        return re.compile(r'(\d)({})\b'.format(cls.RE_UNITS_GROUP))
 
     @classmethod
     def gap_units(cls, text: str) -> str:
@@ -353,37 +370,44 @@ class Parser:
     RE_ALL_PARENS = re.compile(r'^\([^\)]*\)$')
     RE_COLON_ANYWHERE = re.compile(r'.*:.*')
     RE_TERMINAL_COLON = re.compile(r'.*:\s*$')
+
     # entries that cause subsequent entries to be disregarded as well
-    RE_DISREGARD_SUSTAIN_HEADERS = [re.compile(r) for r in [
-        r'equipment:\s*$',
-        r'special equipment:\s*$',
-        r'glass(ware)?:\s*$',
-        r'note:\s*$',
-        r'serving suggestion(s)?:\s*$',
-        r'test-kitchen tip:\s*$',
-        r'type of fire:\s*$',
-    ]]
+    @cached_classproperty
+    def RE_DISREGARD_SUSTAIN_HEADERS(cls):
+        return [re.compile(r) for r in [
+            r'equipment:\s*$',
+            r'special equipment:\s*$',
+            r'glass(ware)?:\s*$',
+            r'note:\s*$',
+            r'serving suggestion(s)?:\s*$',
+            r'test-kitchen tip:\s*$',
+            r'type of fire:\s*$',
+        ]]
 
     # entries that cause subsequent entries to no longer be disregarded
-    RE_DISREGARD_UNSUSTAIN_HEADERS = [re.compile(r) for r in [
-        r'for .*:\s*$',
-    ]]
+    @cached_classproperty
+    def RE_DISREGARD_UNSUSTAIN_HEADERS(cls):
+        return [re.compile(r) for r in [
+            r'for .*:\s*$',
+        ]]
 
     # cases where this entry should be disregarded
-    RE_DISREGARD_HEADERS = [re.compile(r) for r in [
-        r'accompaniments?:',
-        r'for .*:',
-        r'garnish(es)?:',
-        r'glass(ware)?:',
-        r'grill heat:',
-        r'ingredient info:',
-        r'note:',
-        r'serving suggestion(s)?:',
-        r'test-kitchen tip:',
-        r'type of fire:',
-        r'special equipment:',
-        r'equipment:',
-    ]]
+    @cached_classproperty
+    def RE_DISREGARD_HEADERS(cls):
+        return [re.compile(r) for r in [
+            r'accompaniments?:',
+            r'for .*:',
+            r'garnish(es)?:',
+            r'glass(ware)?:',
+            r'grill heat:',
+            r'ingredient info:',
+            r'note:',
+            r'serving suggestion(s)?:',
+            r'test-kitchen tip:',
+            r'type of fire:',
+            r'special equipment:',
+            r'equipment:',
+        ]]
 
     @classmethod
     def disregard(cls, text: str) -> Tuple[bool, bool, bool]:
@@ -431,13 +455,13 @@ class Parser:
     # --------- Tokenization --------- #
     @classmethod
     def tokenize(cls, text: str) -> list:
-        """ A wrapper on nltk.word_tokenize, except when
+        """ A wrapper on the active word tokenizer backend (by default
+        nltk.word_tokenize, see `Tokenizer`), except when
         we see things like "grams/3" in the nltk tokens (e.g. from an ingredient that read
         "45 grams/3 ounces of oil"), replace it with "grams", "/", "3" so we can use the
         slash as an indicator of an alternative measure.
         """
-        # tokenize and tag the text usin nltk defaults
-        tokens = nltk.word_tokenize(text)
+        tokens = Tokenizer.active().tokenize(text)
         out = []
         for t in tokens:
             if '/' not in t:
@@ -613,7 +637,29 @@ class Parser:
         build on each other to extract the amount information, and consolidate
         the remaining text to focus on useful words and phrases.
         """
-        data = nltk.pos_tag(tokens)
+        ingredients = cls.label(Tagger.active().tag(tokens))
+        # nltk doesn't do a great job when ingredient data is mixed in, so
+        # re-pos_tag the leftovers to improve accuracy of POS values for the
+        # focus() call that follows.
+        ingredients = [cls.retag(i) for i in ingredients]
+        return cls.refine(ingredients)
+
+    @classmethod
+    def tag_many(cls, token_lists: list) -> list:
+        """ Equivalent to `[Parser.tag(tokens) for tokens in token_lists]`, but
+        with a single batched tagger call for each of the tagging and re-tagging
+        stages instead of one (or more) per line.
+        """
+        labelled = [cls.label(data)
+                    for data in Tagger.active().tag_sents(token_lists)]
+        cls.retag_many([i for ingredients in labelled for i in ingredients])
+        return [cls.refine(ingredients) for ingredients in labelled]
+
+    @classmethod
+    def label(cls, data: list) -> list:
+        """ Extract the amount information from pos_tagged tokens, and split
+        them into a list of separate ingredients.
+        """
         data = cls.tag_units_and_quantities(data)
         data = cls.coalesce_units(data)
         data = cls.tag_amounts(data)
@@ -625,11 +671,11 @@ class Parser:
         data = cls.strip_remnants(data)
         data = cls.plus_amounts(data)
         # hereafter, ingredients is a list of separate ingredients
-        ingredients = cls.label_ingredients(data)
-        # nltk doesn't do a great job when ingredient data is mixed in, so
-        # re-pos_tag the leftovers to improve accuracy of POS values for the
-        # focus() call that follows.
-        ingredients = [cls.retag(i) for i in ingredients]
+        return cls.label_ingredients(data)
+
+    @classmethod
+    def refine(cls, ingredients: list) -> list:
+        """ Resolve the amounts of retagged ingredients, and focus their text """
         ingredients = [cls.resolve_amounts(i) for i in ingredients]
         # hereafter, ingredients are a 3-tuple as we add a `mods` element
         ingredients = [cls.focus(i) for i in ingredients]
@@ -965,19 +1011,41 @@ class Parser:
         Retag the remaining words once the amount info has been removed, 
         parsing the biggest chunks possible to maximize the info given to nltk.
         """
+        for start, end in cls.retag_spans(ingredient):
+            ingredient[0][start:end] = Tagger.active().tag(
+                [ing[0] for ing in ingredient[0][start:end]])
+        return ingredient
+
+    @classmethod
+    def retag_many(cls, ingredients: list) -> list:
+        """ Retag a list of ingredients in-place with a single tagger call """
+        spans = [(ingredient, start, end)
+                 for ingredient in ingredients
+                 for start, end in cls.retag_spans(ingredient)]
+        tagged = Tagger.active().tag_sents(
+            [[ing[0] for ing in ingredient[0][start:end]]
+             for ingredient, start, end in spans])
+        for (ingredient, start, end), tags in zip(spans, tagged):
+            ingredient[0][start:end] = tags
+        return ingredients
+
+    @classmethod
+    def retag_spans(cls, ingredient: list) -> list:
+        """ Return the (start, end) index pairs of the runs of string tokens
+        that lie between an ingredient's amounts.
+        """
         # Find any ingredient bits that aren't strings!
         non_string_indexes = [i for i in range(
             len(ingredient[0])) if type(ingredient[0][i][0]) is not str]
-        # now, move pairwise through the non_string_index values, re-tagging
+        # now, move pairwise through the non_string_index values, collecting
         # whatever's in between those indexes
+        spans = []
         prev = 0
         for i in non_string_indexes:
-            ingredient[0][prev:i] = nltk.pos_tag(
-                [ing[0] for ing in ingredient[0][prev:i]])
+            spans += [(prev, i)]
             prev = i + 1
-        ingredient[0][prev:] = nltk.pos_tag(
-            [ing[0] for ing in ingredient[0][prev:]])
-        return ingredient
+        spans += [(prev, len(ingredient[0]))]
+        return spans
 
     @classmethod
     def resolve_amounts(cls, ingredient: list) -> list:
@@ -1205,16 +1273,73 @@ class Parser:
         if text is None:
             return {}, sustain
 
-        data = {}
+        # TODO: figure out what to do about "for example", "like", "such as" phrases
+        return cls.analyze(text), disregard_active
+
+    @classmethod
+    def analyze(cls, text: str) -> dict:
+        """ Return the parsed ingredient dictionary of preprocessed `text`,
+        from the persistent cache if it is enabled (see `PersistentCache`).
+        """
+        cache = PersistentCache.active()
+        if cache is not None:
+            data = cache.get(PARSE, text, PersistentCache.MISSING)
+            if data is not PersistentCache.MISSING:
+                return data
+        data = cls.assemble(cls.tag(cls.prepare(text)))
+        if cache is not None:
+            cache.put(PARSE, text, data)
+        return data
+
+    @classmethod
+    def parse_many(cls, lines: list, disregard_active: bool = False) -> list:
+        """ Parse a list of raw ingredient lines, e.g. a recipe's, returning a
+        list of `(data, disregard)` tuples identical to what calling `parse` on each
+        line in turn (threading its returned flag through as `disregard_active`)
+        would produce.
+
+        The POS tagging of all of the lines is batched, which is substantially
+        faster than tagging them one at a time.
+        """
+        results = [None] * len(lines)
+        pending = []  # (index, text, tokens) of lines that need tagging
+        cache = PersistentCache.active()
+        for i, raw_text in enumerate(lines):
+            text, sustain, unsustain = cls.preprocess(raw_text)
+            if disregard_active:
+                disregard_active = not unsustain
+                results[i] = ({}, disregard_active)
+            elif text is None:
+                disregard_active = sustain
+                results[i] = ({}, disregard_active)
+            else:
+                data = PersistentCache.MISSING
+                if cache is not None:
+                    data = cache.get(PARSE, text, PersistentCache.MISSING)
+                if data is PersistentCache.MISSING:
+                    pending += [(i, text, cls.prepare(text))]
+                else:
+                    results[i] = (data, False)
+
+        tagged = cls.tag_many([tokens for _, _, tokens in pending])
+        for (i, text, _), tagged_data in zip(pending, tagged):
+            results[i] = (cls.assemble(tagged_data), False)
+            if cache is not None:
+                cache.put(PARSE, text, results[i][0])
+        return results
+
+    @classmethod
+    def prepare(cls, text: str) -> list:
+        """ Tokenize preprocessed text and unify its numbers """
         tokens = cls.tokenize(text)
         tokens = cls.decimate(tokens)
-        tokens = cls.rangeify(tokens)
-
-        tagged_data = cls.tag(tokens)
-        # TODO: figure out what to do about "for example", "like", "such as" phrases
+        return cls.rangeify(tokens)
 
+    @classmethod
+    def assemble(cls, tagged_data: list) -> dict:
+        """ Convert the output of `tag` to a parsed ingredient dictionary """
         if not tagged_data:
-            return data, disregard_active
+            return {}
 
         # return tagged_data in the format it already knows!
         tagged_data = tagged_data[0]  # only use the first entry for now
@@ -1230,4 +1355,4 @@ class Parser:
         if tagged_data and tagged_data[0]:  # remnant
             data[cls.NAMES] = [cls.detokenize(tagged_data[0])]
 
-        return data, disregard_active
+        return data
@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+""" An optional on-disk (SQLite) cache of parse and lookup results, so that
+repeated runs over mostly unchanged text skip tokenizing, tagging, and
+matching for every line they have seen before.
+
+Entries are stored under a version that hashes `ghgi.VERSION`, the parser
+and GIN word tables, the active tokenizer, tagger (and its lexicon) and
+matching engine, and the master products and index files. An entry written
+under any other version is never served.
+
+Enable it with `PersistentCache.enable(path)`, or by setting the
+GHGI_PERSISTENT_CACHE environment variable to the path of the cache file.
+"""
+import os
+import json
+import atexit
+import sqlite3
+import hashlib
+import threading
+try:
+    from .datasets import MASTER_PRODUCTS, MASTER_AKA_INDEX, MASTER_GIN_INDEX
+    from .digest import file_digest
+    from .lazy import LOCK, PINNED
+except:
+    from datasets import MASTER_PRODUCTS, MASTER_AKA_INDEX, MASTER_GIN_INDEX
+    from digest import file_digest
+    from lazy import LOCK, PINNED
+
+PARSE = 'parse'  # {preprocessed text: Parser.assemble data}
+LOOKUP = 'lookup'  # {ingredient names: [product name, alias, confidence]}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    kind TEXT NOT NULL,
+    version TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (kind, version, key)
+)'''
+
+
+def version() -> str:
+    """ Return the hash of everything that parse and lookup results depend on """
+    try:
+        from . import VERSION
+        from .parser import Parser
+        from .tokenizer import Tokenizer
+        from .tagger import Tagger
+        from . import gin
+    except:
+        from ghgi import VERSION
+        from parser import Parser
+        from tokenizer import Tokenizer
+        from tagger import Tagger
+        import gin
+
+    tables = {
+        'units': Parser.UNITS,
+        'stopwords': sorted(Parser.STOPWORDS),
+        'prep_mods': sorted(Parser.PREP_MODS),
+        'no_stem': sorted(gin.NO_STEM),
+        'no_solo': sorted(gin.NO_SOLO),
+        'must_match': sorted(gin.MUST_MATCH),
+        'tokenizer': Tokenizer.active().name,
+        'tagger': Tagger.active().name,
+        'lexicon': getattr(Tagger.active(), 'lexicon', None),
+        'matcher': gin.GIN.engine(),
+    }
+    digest = hashlib.sha256(VERSION.encode('utf-8'))
+    digest.update(json.dumps(tables, sort_keys=True).encode('utf-8'))
+    digest.update(file_digest(
+        [MASTER_PRODUCTS, MASTER_AKA_INDEX, MASTER_GIN_INDEX]).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class PersistentCache:
+    """ A {(kind, key): json value} store in the SQLite file at `path`.
+
+    Writes are buffered, and committed every `batch_size` entries, on `flush`,
+    and at exit. Each process (e.g. each forked worker) opens its own
+    connection, which its threads share.
+    """
+    BATCH_SIZE = 256
+    MISSING = object()
+    _active = None
+    _checked_env = False
+
+    def __init__(self, path, batch_size=BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.version = version()
+        self._pending = {}
+        self._pid = None
+        self._connection = None
+        self._lock = threading.RLock()
+        self._stores = None  # see `rehash`
+        self.hits = 0
+        self.misses = 0
+        atexit.register(self.flush)
+
+    @classmethod
+    def enable(cls, path=None) -> 'PersistentCache':
+        """ Serve parse and lookup results from (and save them to) the cache
+        file at `path`.
+        """
+        cls.disable()
+        cls._active = cls(path or os.environ['GHGI_PERSISTENT_CACHE'])
+        cls._active.prune()
+        return cls._active
+
+    @classmethod
+    def disable(cls):
+        if cls._active is not None:
+            cls._active.close()
+        cls._active = None
+        cls._checked_env = True
+
+    @classmethod
+    def active(cls):
+        """ Return the enabled cache, or None """
+        if not cls._checked_env:
+            with LOCK:
+                if not cls._checked_env:
+                    if os.environ.get('GHGI_PERSISTENT_CACHE'):
+                        cls.enable()
+                    cls._checked_env = True
+        return cls._active
+
+    def connection(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # never share a connection (or pending writes) across a fork
+                self._connection = sqlite3.connect(
+                    self.path, timeout=30, check_same_thread=False)
+                self._connection.execute('PRAGMA journal_mode=WAL')
+                self._connection.execute(SCHEMA)
+                self._connection.commit()
+                self._pending = {}
+                self._pid = os.getpid()
+            return self._connection
+
+    def get(self, kind: str, key: str, default=None):
+        with self._lock:
+            connection = self.connection()
+            if (kind, key) in self._pending:
+                self.hits += 1
+                return json.loads(self._pending[(kind, key)])
+            row = connection.execute(
+                'SELECT value FROM entries WHERE kind = ? AND version = ? AND key = ?',
+                (kind, self.version, key)).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, kind: str, key: str, value):
+        pinned = PINNED.get()
+        if pinned is not None and self._stores is not None and pinned is not self._stores:
+            return  # computed from a replaced dataset generation
+        value = json.dumps(value)
+        with self._lock:
+            self.connection()
+            self._pending[(kind, key)] = value
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._pending or self._pid != os.getpid():
+                return
+            with self._connection:
+                self._connection.executemany(
+                    'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)',
+                    [(kind, self.version, key, value)
+                     for (kind, key), value in self._pending.items()])
+            self._pending = {}
+
+    def rehash(self, stores=None):
+        """ Save the pending entries, and then serve and save entries under
+        the version of the current files and backends, e.g. once a new dataset
+        generation is active. If its `stores` are given, contexts pinned to
+        any other generation (see `ghgi.generation`) no longer save entries.
+        """
+        with self._lock:
+            self.flush()
+            self.version = version()
+            if stores is not None:
+                self._stores = stores
+
+    def prune(self):
+        """ Delete the entries of every other version """
+        with self._lock, self.connection():
+            self._connection.execute(
+                'DELETE FROM entries WHERE version != ?', (self.version,))
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+            self._pid = None
+        atexit.unregister(self.flush)
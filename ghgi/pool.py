@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+""" Score recipes in parallel across worker processes.
+
+Parsing and matching are pure Python, so threads can't score recipes in
+parallel. `ScoringPool` instead preloads every lazily loaded database, index,
+and model in the parent process, then forks its workers, which share those
+pages copy-on-write rather than each loading (and holding) their own copy.
+
+    with ScoringPool(workers=8) as pool:
+        for score in pool.imap(recipes):
+            ...
+"""
+import gc
+import multiprocessing
+import multiprocessing.util
+try:
+    from .gin import GIN
+    from .origin import Origin
+    from .persistent import PersistentCache
+    from .product import Product
+    from .recipe import Scorer
+    from .tagger import Tagger, NltkTagger
+    from .tokenizer import Tokenizer
+except:
+    from gin import GIN
+    from origin import Origin
+    from persistent import PersistentCache
+    from product import Product
+    from recipe import Scorer
+    from tagger import Tagger, NltkTagger
+    from tokenizer import Tokenizer
+
+DEFAULT_CHUNKSIZE = 8
+
+_scorer = None  # each worker's Scorer
+
+
+def preload():
+    """ Load everything that recipe scoring otherwise loads on first use """
+    Product.db()
+    Product.fv_db()
+    Product.baselines_artifact()
+    Product.efficiency_baselines()
+    for origin in Origin.ORIGINS:
+        Origin.flattened(origin)
+    GIN.index()
+    GIN.aka_index()
+    GIN.alias_masks()
+    GIN.stemmer()
+    # the punkt model (cached by nltk.data) and the perceptron tagger
+    Tokenizer.active().tokenize('Preload. The tokenizer.')
+    Tagger.active()
+    NltkTagger.perceptron()
+    cache = PersistentCache.active()
+    if cache is not None:
+        # workers open their own connections, and drop inherited pending writes
+        cache.flush()
+
+
+def _start_worker(origin, flavors, preloaded, collect=True):
+    global _scorer
+    if collect:
+        # (forked workers start with the collector disabled; see ScoringPool)
+        gc.enable()
+    if not preloaded:
+        preload()
+    _scorer = Scorer(origin, flavors)
+    cache = PersistentCache.active()
+    if cache is not None:
+        # workers exit without running atexit handlers
+        multiprocessing.util.Finalize(None, cache.flush, exitpriority=10)
+
+
+def _score(lines):
+    return _scorer.score(lines)
+
+
+def _score_ingredient(line):
+    return _scorer.score([line]).ingredients[0]
+
+
+class ScoringPool:
+    """ A pool of `workers` (by default, one per cpu) recipe scoring processes,
+    for the given origin and GHGFlavors (see `Scorer`).
+
+    Work is dispatched in chunks of `chunksize` recipes, and results are
+    returned in the order of their inputs.
+    """
+
+    def __init__(self, workers=None, origin=None, flavors=None,
+                 chunksize=DEFAULT_CHUNKSIZE):
+        self.chunksize = chunksize
+        # fork where it's available, so that workers inherit the preloaded
+        # stores; otherwise each worker has to load its own
+        forking = 'fork' in multiprocessing.get_all_start_methods()
+        if not forking:
+            self._pool = multiprocessing.get_context().Pool(
+                workers, initializer=_start_worker,
+                initargs=(origin, flavors, False))
+            return
+        preload()
+        # freeze every object for the fork, so the workers' garbage collector
+        # doesn't touch (and so copy) the preloaded objects' pages, but only
+        # for the fork: the parent's objects are unfrozen again right after
+        collect = gc.isenabled()
+        gc.disable()
+        gc.freeze()
+        try:
+            self._pool = multiprocessing.get_context('fork').Pool(
+                workers, initializer=_start_worker,
+                initargs=(origin, flavors, True, collect))
+        finally:
+            gc.unfreeze()
+            if collect:
+                gc.enable()
+
+    def imap(self, recipes, chunksize=None):
+        """ Lazily score the recipes (lists of ingredient lines) in the iterable
+        `recipes`, yielding RecipeScores in order.
+        """
+        return self._pool.imap(_score, recipes, chunksize or self.chunksize)
+
+    def score_recipes(self, recipes, chunksize=None) -> list:
+        return list(self.imap(recipes, chunksize))
+
+    def score_ingredients(self, lines, chunksize=None) -> list:
+        """ Score each line of `lines` as an independent ingredient, returning
+        an IngredientScore per line.
+        """
+        return list(self._pool.imap(
+            _score_ingredient, lines, chunksize or self.chunksize))
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.close()
+        else:
+            self._pool.terminate()
+            self._pool.join()
@@ -1,22 +1,40 @@
 #!/usr/bin/env python
 from enum import Enum
+from types import MappingProxyType
+from typing import NamedTuple, Mapping, Optional
+import collections.abc
 import json
 import copy
 import logging
 try:
-    from .datasets import MASTER_PRODUCTS, SOURCE_FOOD_VALUES
+    from .datasets import MASTER_PRODUCTS, SOURCE_FOOD_VALUES, MASTER_BASELINES
+    from .datasets import MASTER_DATABASE
+    from .database import Database
+    from .digest import file_digest
     from .gin import GIN
     from .convert import Convert
-    from .origin import Origin, GHGFlavor
+    from .origin import Origin, GHGFlavor, UnknownOriginException
+    from .graph import ProductGraph
     from .formatter import bold
+    from .cache import Cache, LRU
+    from .lazy import load_once, assigned, current, LOCK
+    from .persistent import PersistentCache, LOOKUP
 except:
-    from datasets import MASTER_PRODUCTS, SOURCE_FOOD_VALUES
+    from datasets import MASTER_PRODUCTS, SOURCE_FOOD_VALUES, MASTER_BASELINES
+    from datasets import MASTER_DATABASE
+    from database import Database
+    from digest import file_digest
     from gin import GIN
     from convert import Convert
-    from origin import Origin, GHGFlavor
+    from origin import Origin, GHGFlavor, UnknownOriginException
+    from graph import ProductGraph
     from formatter import bold
+    from cache import Cache, LRU
+    from lazy import load_once, assigned, current, LOCK
+    from persistent import PersistentCache, LOOKUP
 
 DEFAULT_FLAVOR = GHGFlavor.MEDIAN
+LOOKUP_CACHE_SIZE = 4096
 
 
 class Category(Enum):
@@ -52,10 +70,129 @@ class Ingredient:
     MODS = 'mods'
 
 
+class ResolvedProduct(NamedTuple):
+    """ A product's values with everything it inherits from its `super`
+    products already resolved. Records are immutable, and can be shared freely.
+    """
+    name: str
+    sg: Optional[float]
+    g: float
+    bunch: Optional[float]  # None if Product.unbundle would use its default
+    pkg: Optional[float]  # None if Product.unbundle would use its default
+    categories: Mapping  # {category: food value}, as Product.food_values
+    ghg: Mapping  # {origin: (value per GHGFlavor, or None)}, see ResolvedGHG
+
+    def ghg_value(self, origin, flavor: GHGFlavor):
+        """ Equivalent to `Product.ghg_value` for this product """
+        if not origin:
+            origin = Origin.DEFAULT
+        if origin not in self.ghg:
+            raise UnknownOriginException(
+                'Origin {} not found in database'.format(origin))
+        if not flavor:
+            flavor = GHGFlavor.MEDIAN
+        return self.ghg[origin][flavor.value]
+
+
+class GHGTables:
+    """ The GHG values of the products in `db`, resolved through their `super`
+    products, per origin. Each origin's table is resolved for every product
+    the first time it's needed, and up to about `maxsize` values (by default,
+    as many as Origin keeps of origin entries) are kept, evicting the least
+    recently used origins first. `tables` may provide some tables already.
+    If `lazy`, each table only resolves the products that are read from it.
+    """
+
+    def __init__(self, db, graph, maxsize=None, tables: dict = None,
+                 lazy=False):
+        self.db = db
+        self.graph = graph
+        self.lazy = lazy
+        self.tables = Cache(maxsize or Origin._flattened.maxsize, LRU, weigh=len)
+        for origin, table in (tables or {}).items():
+            self.tables[origin] = MappingProxyType(table)
+
+    def table(self, origin):
+        """ Return the read-only {name: (value per GHGFlavor, or None)} table
+        of `origin`
+        """
+        if origin not in Origin.ORIGIN_PATHS:
+            raise UnknownOriginException(
+                'Origin {} not found in database'.format(origin))
+        table = self.tables.get(origin)
+        if table is not None:
+            return table
+        with LOCK:
+            table = self.tables.get(origin)
+            if table is None:
+                flat = Origin.flattened(origin)
+
+                def resolve(name, resolved):
+                    return self.resolve(name, flat, resolved)
+                if self.lazy:
+                    table = self.graph.resolve_lazily(resolve)
+                else:
+                    table = MappingProxyType(self.graph.resolve(resolve))
+                self.tables[origin] = table
+        return table
+
+    def resolve(self, name, flat, resolved) -> tuple:
+        """ Return the values of `name` given the flattened table of the
+        origin (see `Origin.flattened`) and its parents' `resolved` values
+        """
+        supers = [(resolved[parent], pct) for parent, pct
+                  in (self.db[name].get(Product.PARENTS) or {}).items()
+                  if parent in resolved]
+        entry = flat.get(name)
+        values = []
+        for f in range(len(GHGFlavor)):
+            value = entry[0][1][f] if entry is not None else None
+            if value is None:
+                for par, pct in supers:
+                    if par[f] is not None:
+                        if value is None:
+                            value = 0.0
+                        value += par[f] * pct/100.0
+            values += [value]
+        return tuple(values)
+
+
+class ResolvedGHG(collections.abc.Mapping):
+    """ The read-only {origin: (value per GHGFlavor, or None)} GHG values of a
+    resolved product, from its `GHGTables`.
+    """
+    __slots__ = ('tables', 'name')
+
+    def __init__(self, tables: GHGTables, name: str):
+        self.tables = tables
+        self.name = name
+
+    def __getitem__(self, origin):
+        if origin not in Origin.ORIGIN_PATHS:
+            raise KeyError(origin)
+        return self.tables.table(origin)[self.name]
+
+    def __contains__(self, origin):
+        return origin in Origin.ORIGIN_PATHS
+
+    def __iter__(self):
+        return iter(Origin.ORIGINS)
+
+    def __len__(self):
+        return len(Origin.ORIGINS)
+
+    def __repr__(self):
+        return 'ResolvedGHG({!r})'.format(self.name)
+
+
 class Product:
     _db = {}
     _fvdb = {}
     _baselines = {}
+    _baselines_artifact = None
+    _graph = None
+    _resolved = {}
+    _lookup_cache = None
     NAME = 'name'
     NAMES = 'names'
     ALIAS = 'alias'
@@ -70,32 +207,138 @@ class Product:
 
     @classmethod
     def db(cls):
-        if not cls._db:
-            with open(MASTER_PRODUCTS) as p:
-                cls._db = json.load(p)
-            hidden = [k for k in cls._db if k.startswith('_')]
-            for k in hidden:
-                del cls._db[k]
-            for k in cls._db:
-                cls._db[k][cls.NAME] = k
-        return cls._db
+        return load_once(cls, '_db', cls.read_db)
+
+    @classmethod
+    def read_db(cls):
+        """ Load products.json, setting the graph and resolved products of it
+        before returning a read-only view of it, so they're in place whenever
+        `_db` is.
+        """
+        with open(MASTER_PRODUCTS) as p:
+            db = json.load(p)
+        hidden = [k for k in db if k.startswith('_')]
+        for k in hidden:
+            del db[k]
+        for k in db:
+            db[k][cls.NAME] = k
+        cls._graph = ProductGraph(db)
+        cls._resolved = cls.resolve(db, cls._graph)
+        return MappingProxyType(db)
+
+    @classmethod
+    def load_sqlite(cls, path=MASTER_DATABASE, database=None):
+        """ Serve the products database from the database at `path` (see
+        `ghgi.database`) unless an already opened `Database` is provided.
+        """
+        if database is None:
+            database = Database.open(path)
+        cls._db = database.products
+        cls._graph = database.product_graph()
+        cls._resolved = cls.resolve(cls._db, cls._graph, lazy=True)
+
+    @classmethod
+    def load_json(cls):
+        """ Serve the products database from products.json again (the
+        default)
+        """
+        cls._db = {}
+        cls._graph = None
+        cls._resolved = {}
+
+    @classmethod
+    def graph(cls):
+        """ Return the ProductGraph of the products database """
+        cls.db()
+        return current(cls, '_graph')
+
+    @classmethod
+    def resolved(cls):
+        """ Return the read-only {name: ResolvedProduct} table of the products
+        database, which is materialized when the database is loaded (or, from
+        the SQLite backend, one product at a time, as they're used).
+        """
+        resolved = current(cls, '_resolved')
+        if not resolved:
+            cls.db()
+            resolved = current(cls, '_resolved')
+        return resolved
+
+    @classmethod
+    def resolve(cls, db, graph=None, lazy=False):
+        """ Return a read-only {name: ResolvedProduct} table for the products
+        in `db`, resolving each product once, after its parents. GHG values
+        are resolved per origin, when it's first used (see `GHGTables`). If
+        `lazy`, products are only read from `db` and resolved when they're
+        first looked up in the table (see `ProductGraph.resolve_lazily`).
+        """
+        if graph is None:
+            graph = ProductGraph(db)
+        tables = GHGTables(db, graph, lazy=lazy)
+
+        def resolve_product(name, resolved):
+            product = db[name]
+            supers = [(resolved[parent], pct)
+                      for parent, pct in (product.get(cls.PARENTS) or {}).items()
+                      if parent in resolved]
+
+            sg = product.get(cls.SG)
+            if (not sg) and supers:
+                sg = sum([par.sg * pct/100.0 for par, pct in supers if par.sg])
+
+            g = product.get(cls.MASS)
+            if not g:
+                g = sum([par.g * pct/100.0 for par, pct in supers]) if supers else 0.0
+
+            bunch = product.get(cls.BUNCH)
+            pkg = product.get(cls.PKG)
+            if len(supers) == 1:
+                bunch = bunch or supers[0][0].bunch
+                pkg = pkg or supers[0][0].pkg
+
+            return ResolvedProduct(
+                name=name,
+                sg=sg,
+                g=g,
+                bunch=bunch or None,
+                pkg=pkg or None,
+                categories=MappingProxyType(cls.food_values(product)),
+                ghg=ResolvedGHG(tables, name),
+            )
+
+        if lazy:
+            return graph.resolve_lazily(resolve_product)
+        return MappingProxyType(graph.resolve(resolve_product))
 
     @classmethod
     def fv_db(cls):
         # food values database
-        if not cls._fvdb:
+        def load():
             with open(SOURCE_FOOD_VALUES) as fv:
-                cls._fvdb = json.load(fv)
-        return cls._fvdb
+                return MappingProxyType(json.load(fv))
+        return load_once(cls, '_fvdb', load)
 
     @classmethod
-    def valid(cls, product, flavor=None):
+    def valid(cls, product, flavor=None, memo=None):
+        """ Return whether `product` has valid `flavor` data, directly or via its
+        parents. `memo` is an optional {(name, flavor): bool} dict of the results
+        for products that have already been validated.
+        """
         if flavor is None:
-            return all([cls.valid(product, f) for f in [cls.MASS, cls.SG, cls.CATS]])
+            return all([cls.valid(product, f, memo) for f in [cls.MASS, cls.SG, cls.CATS]])
 
         if not product:
             return False
-        elif product[cls.NAME].startswith('_'):
+        if memo is None:
+            return cls.valid_flavor(product, flavor, memo)
+        key = (product[cls.NAME], flavor)
+        if key not in memo:
+            memo[key] = cls.valid_flavor(product, flavor, memo)
+        return memo[key]
+
+    @classmethod
+    def valid_flavor(cls, product, flavor, memo=None):
+        if product[cls.NAME].startswith('_'):
             # ignore these
             return True
         # validate mass/sg
@@ -105,7 +348,7 @@ class Product:
                     print('Product {} invalid: no `{}` data'.format(
                         bold(product[cls.NAME]), flavor))
                     return False
-                elif not all([cls.valid(cls.get(par_name), flavor) for par_name in product[cls.PARENTS]]):
+                elif not all([cls.valid(cls.db().get(par_name), flavor, memo) for par_name in product[cls.PARENTS]]):
                     print('Product {} invalid: invalid parents `{}` data'.format(
                         bold(product[cls.NAME]), flavor))
                     return False
@@ -122,7 +365,7 @@ class Product:
                     print('Product {} invalid: no food values'.format(
                         bold(product[cls.NAME])))
                     return False
-                elif not all([cls.valid(cls.get(par_name), flavor) for par_name in product[cls.PARENTS]]):
+                elif not all([cls.valid(cls.db().get(par_name), flavor, memo) for par_name in product[cls.PARENTS]]):
                     print('Product {} invalid: bad or incomplete parent food values'.format(
                         bold(product[cls.NAME])))
                     return False
@@ -141,15 +384,24 @@ class Product:
         `super`, the keys [Product.NAME, Product.MASS, and Product.SG] and a value
         for at least one Category.
         """
-        for product in cls.db().values():
-            if not cls.valid(product):
+        graph = cls.graph()  # raises if there are inheritance cycles
+        if graph.missing:
+            raise Exception('Product database failed to validate: unknown parents {}'.format(
+                graph.missing))
+
+        # parents come first, so each product's parents are validated (and
+        # memoized) before it is
+        memo = {}
+        for name in graph.order:
+            product = cls.db()[name]
+            if not cls.valid(product, memo=memo):
                 raise Exception(
                     'Product database failed to validate on {}'.format(product))
-            if not cls.ghg_value(product, Origin.DEFAULT, DEFAULT_FLAVOR):
+            ghg_value = cls.resolved()[name].ghg_value(
+                Origin.DEFAULT, DEFAULT_FLAVOR)
+            if not ghg_value:
                 print('{} has ghg_value {}'.format(
-                    bold(product[cls.NAME]),
-                    cls.ghg_value(product, Origin.DEFAULT, DEFAULT_FLAVOR)
-                ))
+                    bold(product[cls.NAME]), ghg_value))
 
     @classmethod
     def efficiency_baselines(cls):
@@ -164,27 +416,79 @@ class Product:
         and the baseline is chosen as for other groups: the second-lowest product median
         ghg value (exclusive of water) is used as as reference.
         """
-        if not cls._baselines:
-            baselines = cls.expanded_baselines()
-            for origin in baselines:
-                for cat in baselines[origin]:
-                    baselines[origin][cat].sort(reverse=True)
-                    if len(baselines[origin][cat]) <= 1:
-                        # no meaningful comparison possible
-                        baselines[origin][cat] = None
-                    elif len(baselines[origin][cat]) <= 6:
-                        baselines[origin][cat] = baselines[origin][cat][0]
-                    else:
-                        baselines[origin][cat] = baselines[origin][cat][1]
-            cls._baselines = baselines
-        return cls._baselines
+        def load():
+            artifact = cls.baselines_artifact()
+            if artifact:
+                return artifact['baselines']
+            return cls.compute_efficiency_baselines()
+        return load_once(cls, '_baselines', load)
+
+    @classmethod
+    def compute_efficiency_baselines(cls):
+        """ Compute (see `efficiency_baselines`) from the current datasets """
+        baselines = cls.expanded_baselines()
+        for origin in baselines:
+            for cat in baselines[origin]:
+                baselines[origin][cat].sort(reverse=True)
+                if len(baselines[origin][cat]) <= 1:
+                    # no meaningful comparison possible
+                    baselines[origin][cat] = None
+                elif len(baselines[origin][cat]) <= 6:
+                    baselines[origin][cat] = baselines[origin][cat][0]
+                else:
+                    baselines[origin][cat] = baselines[origin][cat][1]
+        return baselines
+
+    @classmethod
+    def baselines_sources(cls):
+        """ The dataset files that the baselines are computed from """
+        return [MASTER_PRODUCTS, SOURCE_FOOD_VALUES] + [
+            Origin.ORIGIN_PATHS[origin] for origin in sorted(Origin.ORIGINS)]
+
+    @classmethod
+    def baselines_artifact(cls):
+        """ Return the precomputed baselines and per-origin efficiency ratios
+        written by generate.py, or an empty dict if they are missing or stale.
+        """
+        def load():
+            artifact = {}
+            try:
+                with open(MASTER_BASELINES) as b:
+                    artifact = json.load(b)
+            except FileNotFoundError:
+                pass
+            if artifact and artifact.get('digest') != file_digest(cls.baselines_sources()):
+                logging.warning(
+                    'ignoring stale baselines; please regenerate {}'.format(MASTER_BASELINES))
+                artifact = {}
+            return artifact
+        return load_once(cls, '_baselines_artifact', load, loaded=assigned)
+
+    @classmethod
+    def build_baselines_artifact(cls):
+        """ Compute the baselines, and the efficiency ratio of every product for
+        every origin, from the current datasets, for generate.py to write.
+        """
+        cls._baselines_artifact = {}  # don't use any existing precomputed values
+        cls._baselines = cls.compute_efficiency_baselines()
+        ratios = {
+            origin: {
+                name: cls.ghg_efficiency_ratio(cls.db()[name], origin)
+                for name in cls.graph().order
+            } for origin in Origin.ORIGINS
+        }
+        return {
+            'digest': file_digest(cls.baselines_sources()),
+            'baselines': cls._baselines,
+            'efficiency_ratios': ratios,
+        }
 
     @classmethod
     def expanded_baselines(cls):
         baselines = {o: {Category.NA.value: []} for o in Origin.ORIGINS}
-        for product in cls.db():
-            if cls.db()[product].get(Product.PARENTS):
-                continue  # filter out aliases and composites
+        # filter out aliases and composites
+        roots = [p for p in cls.graph().roots if not cls.db()[p].get(Product.PARENTS)]
+        for product in roots:
             for origin in Origin.ORIGINS:
                 ghg_values = Product.ghg_efficiencies(
                     cls.db()[product], origin)
@@ -219,6 +523,23 @@ class Product:
             result.update({Product.NAME: db_name, Product.ALIAS: alias})
         return result
 
+    @classmethod
+    def stamp(cls) -> tuple:
+        """ The stores that lookup results are computed from """
+        return (cls.db(),) + GIN.stamp()
+
+    @classmethod
+    def lookup_cache(cls) -> Cache:
+        return load_once(cls, '_lookup_cache', cls.configure_cache, loaded=assigned)
+
+    @classmethod
+    def configure_cache(cls, maxsize=LOOKUP_CACHE_SIZE, policy=LRU):
+        """ Replace the lookup cache with an empty one of `maxsize` entries and
+        eviction `policy` (see `ghgi.cache`); a `maxsize` of 0 disables it.
+        """
+        cls._lookup_cache = Cache(maxsize, policy, stamp=cls.stamp)
+        return cls._lookup_cache
+
     @staticmethod
     def lookup(ingredient):
         # given a list of names for a product, return the match with the
@@ -228,19 +549,46 @@ class Product:
 
         if not Product.NAMES in ingredient:
             return (None, None)
+        names = tuple(ingredient[Product.NAMES])
+        match = Product.lookup_cache().memoize(
+            names, lambda: Product.stored_match(names))
+        if match is None:
+            return (None, None)
+        # the cache only holds names, so each caller gets its own product copy
+        db_name, alias, confidence = match
+        return Product.get(db_name, alias), confidence
+
+    @staticmethod
+    def stored_match(names):
+        """ Return `Product.match(names)`, from the persistent cache if it is
+        enabled (see `PersistentCache`).
+        """
+        cache = PersistentCache.active()
+        if cache is None:
+            return Product.match(names)
+        key = json.dumps(names)
+        match = cache.get(LOOKUP, key, PersistentCache.MISSING)
+        if match is PersistentCache.MISSING:
+            match = Product.match(names)
+            cache.put(LOOKUP, key, match)
+        return tuple(match) if match is not None else None
+
+    @staticmethod
+    def match(names):
+        """ Return the (product name, alias, confidence) of the best match
+        among `names`, or None if none of them match.
+        """
         results = []
-        for name in ingredient[Product.NAMES]:
+        for name in names:
             name = name.replace('-', ' ')
             size = len(name)
             match = GIN.query(name)
             if match[0] is not None:
-                product = Product.get(match[1][0], match[0])
-                confidence = match[2]
-                results += [(product, confidence, size)]
+                results += [(match[1][0], match[0], match[2], size)]
 
-        results.sort(key=lambda k: k[2], reverse=True)  # prefer longer matches
-        results.sort(key=lambda k: k[1], reverse=True)
-        return results[0][:2] if results else (None, None)
+        results.sort(key=lambda k: k[3], reverse=True)  # prefer longer matches
+        results.sort(key=lambda k: k[2], reverse=True)
+        return results[0][:3] if results else None
 
     @staticmethod
     def itemize(ingredients):
@@ -251,6 +599,16 @@ class Product:
             (ingredient[Ingredient.PRODUCT],
              ingredient['match_conf']) = Product.lookup(ingredient)
 
+    @staticmethod
+    def resolved_product(product):
+        """ Return the ResolvedProduct of `product` if it's one of the
+        database's, or None (e.g. for products built by hand), in which case
+        its values are computed through its parents.
+        """
+        if not product:
+            return None
+        return Product.resolved().get(product.get(Product.NAME))
+
     @staticmethod
     def sg(product):
         # parent values are dicts of {parent: percentage} where the
@@ -258,11 +616,14 @@ class Product:
         # product. So a 50/50 mix would have parents {x: 50, y: 50},
         # and a concentrate might have parents {x: 400}. Products can override
         # their parents' `sg` and `g` values to inherit only their ghg values.
+        resolved = Product.resolved_product(product)
+        if resolved is not None:
+            return resolved.sg
         sg = product.get(Product.SG)
         if (not sg) and product.get(Product.PARENTS):
             sg = 0
             for parent, percentage in product[Product.PARENTS].items():
-                par_sg = Product.sg(Product.get(parent))
+                par_sg = Product.sg(Product.db().get(parent))
                 if par_sg:
                     sg += par_sg * percentage/100.0
 
@@ -270,32 +631,40 @@ class Product:
 
     @staticmethod
     def g(product):
+        resolved = Product.resolved_product(product)
+        if resolved is not None:
+            return resolved.g
         if product.get(Product.MASS):
             return product[Product.MASS]
         parents = product.get(Product.PARENTS)
         if not parents:
             return 0.0
-        return sum([Product.g(Product.get(parent)) * percentage/100.0 for parent, percentage in parents.items()])
+        return sum([Product.g(Product.db().get(parent)) * percentage/100.0 for parent, percentage in parents.items()])
 
     @staticmethod
     def unbundle(product, qty, unit):
         """ Convert pkg and bunch units to qty, other_unit """
+        resolved = Product.resolved_product(product)
         if unit == Ingredient.BUNCH:
+            if resolved is not None:
+                return qty * (resolved.bunch or 6), Ingredient.EA
             if product.get(Product.BUNCH):
                 return qty * product.get(Product.BUNCH), Ingredient.EA
             parents = product.get(Product.PARENTS, [])
             if len(parents) == 1:
-                parent = Product.get(list(parents.keys())[0])
+                parent = Product.db().get(list(parents.keys())[0])
                 return Product.unbundle(parent, qty, unit)
             else:  # default
                 return qty * 6, Ingredient.EA
 
         elif unit == Ingredient.PKG:
+            if resolved is not None:
+                return qty * (resolved.pkg or 540), 'ml'
             if product.get(Product.PKG):
                 return qty * product.get(Product.PKG), 'ml'
             parents = product.get(Product.PARENTS, [])
             if len(parents) == 1:
-                parent = Product.get(list(parents.keys())[0])
+                parent = Product.db().get(list(parents.keys())[0])
                 return Product.unbundle(parent, qty, unit)
             else:  # default
                 return qty * 540, 'ml'
@@ -424,10 +793,13 @@ class Product:
     def ghg_value(product, origin, flavor: GHGFlavor):
         if product is None:
             return None
+        resolved = Product.resolved_product(product)
+        if resolved is not None:
+            return resolved.ghg_value(origin, flavor)
         value = Origin.ghg_value(product[Product.NAME], origin, flavor)
         if (value is None) and product[Product.PARENTS]:
             for parent, pct in product[Product.PARENTS].items():
-                par_value = Product.ghg_value(Product.get(parent),
+                par_value = Product.ghg_value(Product.db().get(parent),
                                               origin, flavor)
                 if par_value is not None:
                     if value is None:
@@ -447,12 +819,17 @@ class Product:
         return {k: v for k, v in values.items() if k in CATEGORY_VALUES}
 
     @staticmethod
-    def ghg_efficiency_ratio(product, origin=Origin.DEFAULT):
+    def ghg_efficiency_ratio(product, origin=None):
         # return the ratio between this product's efficiency and its
-        # baseline(s). If it has no food values, aggregate its parents'
-        # ghg_efficiency_ratios
+        # baseline(s) for origin (by default Origin.DEFAULT). If it has no
+        # food values, aggregate its parents' ghg_efficiency_ratios
         if product is None:
             return None
+        origin = origin or Origin.DEFAULT
+
+        ratios = Product.baselines_artifact().get('efficiency_ratios', {})
+        if product.get(Product.NAME) in ratios.get(origin, {}):
+            return ratios[origin][product[Product.NAME]]
 
         prod_efficiencies = Product.ghg_efficiencies(product, origin)
 
@@ -470,7 +847,7 @@ class Product:
         shares = 0.0
         for parent, share in product.get(Product.PARENTS, {}).items():
             parent_eff_ratio = Product.ghg_efficiency_ratio(
-                Product.get(parent), origin)
+                Product.db().get(parent), origin)
             if parent_eff_ratio is None:
                 continue
             shares += share
@@ -490,19 +867,18 @@ class Product:
         return {cat: value/ghg_impact for cat, value in Product.food_values(product).items()}
 
     @staticmethod
-    def impact(ingredient, origin=Origin.DEFAULT):
+    def impact(ingredient, origin=None):
         if not ingredient or ingredient.get('error'):
             return 0.0
+        origin = origin or Origin.DEFAULT
 
         mass = Product.mass(ingredient)
         ingredient[Product.MASS] = mass
         if not ingredient.get(Ingredient.PRODUCT):
             return 0.0
 
-        ghg_impact = Product.ghg_value(
-            ingredient[Ingredient.PRODUCT],
-            origin, DEFAULT_FLAVOR
-        )
+        product = ingredient[Ingredient.PRODUCT]
+        ghg_impact = Product.ghg_value(product, origin, DEFAULT_FLAVOR)
         result = round(ghg_impact * mass, 2) if ghg_impact else None
         ingredient['impact'] = result
         return result
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+""" Score the GHG impact of whole recipes.
+
+`score_recipe` runs every line of a recipe through the parser, matches the
+parsed ingredients to products, and totals their impacts, timing each stage:
+
+    preprocess      Parser.preprocess, and the tracking of disregarded lines
+    tokenize        Parser.prepare
+    tag             Parser.tag and Parser.assemble
+    match           Product.lookup
+    impact          Product.mass and the GHG values of the matched products
+
+`score_recipes` scores many recipes with one `Scorer`, so that lines and
+ingredient names that recur across recipes are only parsed and matched once.
+"""
+import copy
+import time
+import collections
+from typing import NamedTuple, Mapping, Optional
+try:
+    from .parser import Parser
+    from .product import Product, Ingredient, DEFAULT_FLAVOR
+    from .origin import Origin, GHGFlavor, UnknownOriginException
+    from .persistent import PersistentCache, PARSE
+    from .lazy import replaced
+except:
+    from parser import Parser
+    from product import Product, Ingredient, DEFAULT_FLAVOR
+    from origin import Origin, GHGFlavor, UnknownOriginException
+    from persistent import PersistentCache, PARSE
+    from lazy import replaced
+
+STAGES = ['preprocess', 'tokenize', 'tag', 'match', 'impact']
+MATCH_CONF = 'match_conf'
+
+
+class IngredientScore(NamedTuple):
+    line: str
+    ingredient: dict  # the parsed ingredient, with its product, match_conf, and mass
+    impacts: Mapping  # {GHGFlavor: impact, or None if unmatched or unknown}
+
+    @property
+    def product(self) -> Optional[str]:
+        product = self.ingredient.get(Ingredient.PRODUCT)
+        return product[Product.NAME] if product else None
+
+
+class RecipeScore(NamedTuple):
+    origin: str
+    ingredients: list  # an IngredientScore per line
+    totals: Mapping  # {GHGFlavor: total impact of the matched ingredients}
+    timings: Mapping  # {stage: seconds}
+
+    def total(self, flavor: GHGFlavor = DEFAULT_FLAVOR) -> float:
+        return self.totals[flavor]
+
+
+class Scorer:
+    """ Scores recipes for an origin and set of GHGFlavors, caching the parse
+    and match results of (up to `cache_size`) distinct lines and names.
+    """
+    CACHE_SIZE = 4096
+
+    def __init__(self, origin=None, flavors=None, cache_size=CACHE_SIZE):
+        self.origin = origin or Origin.DEFAULT
+        if self.origin not in Origin.ORIGINS:
+            raise UnknownOriginException(
+                'Origin {} not found in database'.format(self.origin))
+        self.flavors = list(flavors) if flavors else list(GHGFlavor)
+        self.cache_size = cache_size
+        self._parses = collections.OrderedDict()
+        self._matches = collections.OrderedDict()
+        self._stamped = None  # the Product.stamp of the matches
+        self.stats = collections.Counter(
+            {'lines': 0, 'parses': 0, 'parse_hits': 0, 'matches': 0, 'match_hits': 0})
+
+    def _cached(self, cache, key, compute, miss, hit):
+        if key in cache:
+            self.stats[hit] += 1
+            cache.move_to_end(key)
+        else:
+            self.stats[miss] += 1
+            cache[key] = compute()
+            if len(cache) > self.cache_size:
+                cache.popitem(last=False)
+        # callers mutate their results, so never hand out the cached copy
+        return copy.deepcopy(cache[key])
+
+    def parse(self, text: str, timings: dict) -> dict:
+        """ Parse preprocessed `text`, as `Parser.parse` would """
+        def compute():
+            cache = PersistentCache.active()
+            if cache is not None:
+                start = time.perf_counter()
+                data = cache.get(PARSE, text, PersistentCache.MISSING)
+                if data is not PersistentCache.MISSING:
+                    timings['tag'] += time.perf_counter() - start
+                    return data
+            start = time.perf_counter()
+            tokens = Parser.prepare(text)
+            tokenized = time.perf_counter()
+            data = Parser.assemble(Parser.tag(tokens))
+            timings['tokenize'] += tokenized - start
+            timings['tag'] += time.perf_counter() - tokenized
+            if cache is not None:
+                cache.put(PARSE, text, data)
+            return data
+        return self._cached(self._parses, text, compute, 'parses', 'parse_hits')
+
+    def match(self, ingredient: dict) -> tuple:
+        """ Return the (product, confidence) match of a parsed ingredient """
+        names = tuple(ingredient.get(Product.NAMES) or [])
+        stamp = Product.stamp()
+        if self._stamped is None or any(
+                a is not b for a, b in zip(stamp, self._stamped)):
+            if replaced():
+                # pinned to replaced products or indexes; keep the matches of
+                # the current ones
+                self.stats['matches'] += 1
+                return Product.lookup(ingredient)
+            # the products or indexes have been replaced
+            self._matches.clear()
+            self._stamped = stamp
+        return self._cached(self._matches, names, lambda: Product.lookup(ingredient),
+                            'matches', 'match_hits')
+
+    def impacts(self, ingredient: dict) -> dict:
+        """ Set the mass of a matched ingredient and return its impacts """
+        impacts = {flavor: None for flavor in self.flavors}
+        if not ingredient or ingredient.get('error'):
+            return impacts
+        mass = Product.mass(ingredient)
+        ingredient[Product.MASS] = mass
+        product = ingredient.get(Ingredient.PRODUCT)
+        if not product:
+            return impacts
+
+        resolved = Product.resolved().get(product[Product.NAME])
+        for flavor in self.flavors:
+            if resolved is not None:
+                ghg = resolved.ghg_value(self.origin, flavor)
+            else:
+                ghg = Product.ghg_value(product, self.origin, flavor)
+            impacts[flavor] = round(ghg * mass, 2) if ghg else None
+        return impacts
+
+    def score(self, lines) -> RecipeScore:
+        """ Score the ingredient `lines` of a single recipe """
+        timings = {stage: 0.0 for stage in STAGES}
+        ingredients = []
+        disregard_active = False
+        for line in lines:
+            self.stats['lines'] += 1
+            start = time.perf_counter()
+            text, sustain, unsustain = Parser.preprocess(line)
+            timings['preprocess'] += time.perf_counter() - start
+
+            # thread disregard_active through the lines exactly as Parser.parse
+            if disregard_active:
+                ingredient, disregard_active = {}, not unsustain
+            elif text is None:
+                ingredient, disregard_active = {}, sustain
+            else:
+                ingredient = self.parse(text, timings)
+
+            if ingredient:
+                start = time.perf_counter()
+                ingredient[Ingredient.PRODUCT], ingredient[MATCH_CONF] = \
+                    self.match(ingredient)
+                timings['match'] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            impacts = self.impacts(ingredient)
+            timings['impact'] += time.perf_counter() - start
+            ingredients += [IngredientScore(line, ingredient, impacts)]
+
+        totals = {flavor: sum(score.impacts[flavor] or 0.0 for score in ingredients)
+                  for flavor in self.flavors}
+        return RecipeScore(self.origin, ingredients, totals, timings)
+
+
+def score_recipe(lines, origin=None, flavors=None) -> RecipeScore:
+    """ Score the ingredient `lines` of a recipe for `origin` (by default
+    Origin.DEFAULT) and `flavors` (by default all GHGFlavors).
+    """
+    return Scorer(origin, flavors).score(lines)
+
+
+def score_recipes(recipes, origin=None, flavors=None):
+    """ Lazily score each recipe (a list of ingredient lines) in the iterable
+    `recipes`, sharing parse and match results between them.
+    """
+    scorer = Scorer(origin, flavors)
+    for lines in recipes:
+        yield scorer.score(lines)
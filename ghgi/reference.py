@@ -1,8 +1,13 @@
 import json
+from types import MappingProxyType
 try:
-    from .datasets import REFERENCES
+    from .datasets import REFERENCES, MASTER_DATABASE
+    from .database import Database
+    from .lazy import load_once
 except:
-    from datasets import REFERENCES
+    from datasets import REFERENCES, MASTER_DATABASE
+    from database import Database
+    from lazy import load_once
 
 
 class Reference:
@@ -11,10 +16,23 @@ class Reference:
     @classmethod
     def load(cls):
         with open(REFERENCES) as r:
-            cls._db = json.load(r)
+            cls._db = MappingProxyType(json.load(r))
+        return cls._db
 
     @classmethod
     def db(cls):
-        if not cls._db:
-            cls.load()
-        return cls._db
+        return load_once(cls, '_db', cls.load)
+
+    @classmethod
+    def load_sqlite(cls, path=MASTER_DATABASE, database=None):
+        """ Serve the references from the database at `path` (see
+        `ghgi.database`) unless an already opened `Database` is provided.
+        """
+        if database is None:
+            database = Database.open(path)
+        cls._db = database.references
+
+    @classmethod
+    def load_json(cls):
+        """ Serve the references from references.json again (the default) """
+        cls._db = {}
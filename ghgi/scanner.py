@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+""" An alternative to the GIN index's matching engine, which finds every alias
+that occurs in an ingredient line in a single pass.
+
+Every alias is compiled, as the sequence of its words' stems, into a
+word-level Aho-Corasick automaton. Scanning a line's stems through it yields
+every occurrence of every alias in it, with its position, in time linear in
+the line's length (plus the number of occurrences). The GIN index's
+preferences then choose among them:
+
+* a line of one NO_SOLO word matches nothing, and nor do NO_SOLO words alone;
+* an alias must have the line's MUST_MATCH words, if any;
+* where aliases compete, those with the line's keyword (its last noun) are
+  preferred, so the line is only tagged if they do;
+* then those that have the most of the line's words, the best share of
+  their own (i.e. the longest), and the first alphabetically;
+* a line with 'or's is scanned once, and the best match of its alternatives
+  (separated by 'or's and commas) chosen as `GIN.or_match` does.
+
+Unlike the GIN index, the words of an alias must occur in order and next to
+each other. Select it with `GIN.use_engine(SCANNER)` or the GHGI_MATCHER
+environment variable, and compare the two with `python -m ghgi.benchmark
+scanner`.
+"""
+import collections
+try:
+    from .gin import NO_SOLO, MUST_MATCH
+except:
+    from gin import NO_SOLO, MUST_MATCH
+
+# the tokens that separate the alternatives of a line
+SEPARATORS = {'or', ','}
+
+
+class AliasScanner:
+    """ A word-level Aho-Corasick automaton of the aliases of an aka index,
+    as the stems of their words (see `GIN.stem`).
+    """
+
+    def __init__(self, aka_index, gin):
+        self.source = aka_index
+        # the first alias alphabetically of each sequence of stems, as the GIN
+        # index prefers among equals
+        sequences = {}
+        for alias in sorted(aka_index):
+            stems = tuple(gin.stem(gin.lower(gin.tokenize(alias))))
+            if stems:
+                sequences.setdefault(stems, alias)
+        self.aliases = {}  # {alias: (stem set, word count)}
+        self.goto = [{}]  # per state, {stem: next state}
+        self.outputs = [()]  # per state, the (alias, word count) ending there
+        for stems, alias in sequences.items():
+            self.aliases[alias] = (frozenset(stems), len(stems))
+            state = 0
+            for stem in stems:
+                if stem not in self.goto[state]:
+                    self.goto += [{}]
+                    self.outputs += [()]
+                    self.goto[state][stem] = len(self.goto) - 1
+                state = self.goto[state][stem]
+            self.outputs[state] += ((alias, len(stems)),)
+        # the failure links, breadth first, with the outputs of every suffix
+        # folded into each state's own
+        self.fail = [0] * len(self.goto)
+        queue = collections.deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for stem, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and stem not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(stem, 0)
+                self.outputs[child] += self.outputs[self.fail[child]]
+
+    def compiled_from(self, aka_index) -> bool:
+        return self.source is aka_index
+
+    def scan(self, stems: list) -> list:
+        """ Return the (start, end, alias) of every occurrence of an alias in
+        `stems`, by end and then by length, longest first.
+        """
+        goto, fail, outputs = self.goto, self.fail, self.outputs
+        occurrences = []
+        state = 0
+        for end, stem in enumerate(stems, 1):
+            while state and stem not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(stem, 0)
+            for alias, size in outputs[state]:
+                occurrences += [(end - size, end, alias)]
+        return occurrences
+
+    def match(self, tokens: list, gin):
+        """ Return the `GIN.match` of the line `tokens` (see the module) """
+        lowered = gin.lower(tokens)
+        stems = gin.stem(lowered)
+        occurrences = self.scan(stems)
+        chunks = [(0, len(tokens))]  # (start, end) of each alternative
+        if 'or' in lowered:
+            chunks, start = [], 0
+            for i, token in enumerate(lowered + [',']):
+                if token in SEPARATORS:
+                    if i > start:
+                        chunks += [(start, i)]
+                    start = i + 1
+        tags = []  # the line's pos tags, once they're needed
+
+        def keyword(lo, hi):
+            if not tags:
+                tags.extend(gin.pos_tag(tokens))
+            for i in reversed(range(lo, hi)):
+                if tags[i][1].startswith('NN'):
+                    return stems[i]
+
+        results = []
+        for lo, hi in chunks:
+            chunk = stems[lo:hi]
+            present = set(chunk)
+            must = {m for m in MUST_MATCH if m in present}
+            candidates = {}
+            for start, end, alias in occurrences:
+                if start < lo or end > hi:
+                    continue
+                alias_stems, size = self.aliases[alias]
+                if size == 1 and lowered[start] in NO_SOLO:
+                    continue
+                if not must <= alias_stems:
+                    continue
+                count = sum(1 for stem in chunk if stem in alias_stems)
+                candidates[alias] = (count, 2 * count / (size + len(chunk)), size)
+            if len(candidates) > 1:
+                key = keyword(lo, hi)
+                preferred = {alias: score for alias, score in candidates.items()
+                             if key in self.aliases[alias][0]}
+                candidates = preferred or candidates
+            if not candidates:
+                continue
+            alias = min(candidates, key=lambda a: (
+                -candidates[a][0], -candidates[a][1], a))
+            _, pct, size = candidates[alias]
+            results += [(alias, gin.aka_index()[alias], pct, size, len(chunk))]
+
+        if not results:
+            return None, None, 0.0, 0, 0
+        best = max(result[2] for result in results)
+        candidates = [result for result in results if result[2] == best]
+        candidates.sort(key=lambda result: result[3], reverse=True)
+        return candidates[0]
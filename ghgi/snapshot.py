@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+""" A single-file snapshot of every runtime dataset, so that a new process
+can load all of them with one read rather than parsing each json file (and
+rebuilding each derived table) on its first request.
+
+The snapshot is a pickle of plain python data (no ghgi classes), written by
+generate.py, and records the `ghgi.VERSION` and a digest of the dataset files
+it was built from. `load` refuses a snapshot that doesn't match either, and
+returns it as a dataset generation (see `ghgi.generation`), which `warm`
+activates.
+
+    import ghgi
+    ghgi.warm()
+"""
+import os
+import pickle
+from types import MappingProxyType
+try:
+    from . import VERSION
+    from .datasets import MASTER_PRODUCTS, SOURCE_FOOD_VALUES, REFERENCES
+    from .datasets import MASTER_AKA_INDEX, MASTER_TRIGRAM_INDEX, MASTER_GIN_INDEX
+    from .datasets import MASTER_BASELINES, MASTER_ORIGIN_MANIFEST, MASTER_SNAPSHOT
+    from .datasets import MASTER_STEMS
+    from .digest import file_digest
+    from .product import Product, ResolvedProduct, ResolvedGHG, GHGTables
+    from .origin import Origin, registry
+    from .reference import Reference
+    from .gin import GIN
+    from .trigram import Trigram, TrigramIndex
+    from .graph import ProductGraph
+    from .cache import Cache, LRU
+    from .generation import Generation
+except:
+    from ghgi import VERSION
+    from datasets import MASTER_PRODUCTS, SOURCE_FOOD_VALUES, REFERENCES
+    from datasets import MASTER_AKA_INDEX, MASTER_TRIGRAM_INDEX, MASTER_GIN_INDEX
+    from datasets import MASTER_BASELINES, MASTER_ORIGIN_MANIFEST, MASTER_SNAPSHOT
+    from datasets import MASTER_STEMS
+    from digest import file_digest
+    from product import Product, ResolvedProduct, ResolvedGHG, GHGTables
+    from origin import Origin, registry
+    from reference import Reference
+    from gin import GIN
+    from trigram import Trigram, TrigramIndex
+    from graph import ProductGraph
+    from cache import Cache, LRU
+    from generation import Generation
+
+# the layout of the snapshot's tables, bumped whenever they change
+FORMAT = 4
+
+
+class SnapshotException(Exception):
+    pass
+
+
+def sources() -> list:
+    """ The dataset files that a snapshot is built from """
+    return [
+        MASTER_PRODUCTS, SOURCE_FOOD_VALUES, REFERENCES, MASTER_AKA_INDEX,
+        MASTER_TRIGRAM_INDEX, MASTER_GIN_INDEX, MASTER_BASELINES,
+        MASTER_ORIGIN_MANIFEST, MASTER_STEMS,
+    ] + [Origin.ORIGIN_PATHS[origin] for origin in Origin.ORIGINS]
+
+
+def build_snapshot() -> dict:
+    """ Load every dataset, and build every derived table, from the json files """
+    for cls in [Reference, Origin, GIN, Trigram, Product]:
+        cls.load_json()
+    Product._fvdb = {}
+    Product._baselines = {}
+    Product._baselines_artifact = None
+    GIN._stems = None
+    resolved = {
+        name: (product.name, product.sg, product.g, product.bunch, product.pkg,
+               dict(product.categories))
+        for name, product in Product.resolved().items()}
+    tables = GHGTables(Product.db(), Product.graph())
+    return {
+        'version': VERSION,
+        'format': FORMAT,
+        'digest': file_digest(sources()),
+        'products': dict(Product.db()),
+        'food_values': dict(Product.fv_db()),
+        'resolved': resolved,
+        'ghg': {origin: dict(tables.table(origin)) for origin in Origin.ORIGINS},
+        'baselines': Product.efficiency_baselines(),
+        'baselines_artifact': Product.baselines_artifact(),
+        'manifest': Origin.manifest(),
+        'origins': {origin: Origin.load(origin) for origin in Origin.ORIGINS},
+        'references': dict(Reference.db()),
+        'gin_index': dict(GIN.index()),
+        'aka_index': dict(GIN.aka_index()),
+        'stems': GIN.stems(),
+        'stem_ids': GIN.stem_ids(),
+        'alias_masks': GIN.alias_masks(),
+        'phrases': GIN.phrases(),
+        'trigram_index': dict(Trigram.product_index()),
+    }
+
+
+def write_snapshot(path=MASTER_SNAPSHOT):
+    """ Write the snapshot of the current datasets to `path` """
+    partial = path + '.partial'
+    with open(partial, 'wb') as f:
+        pickle.dump(build_snapshot(), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(partial, path)
+
+
+def read(path=MASTER_SNAPSHOT, verify=True) -> dict:
+    """ Return the snapshot at `path`, after checking that it was built for
+    this VERSION and (if `verify`) from the current dataset files.
+    """
+    try:
+        with open(path, 'rb') as f:
+            snapshot = pickle.loads(f.read())
+    except FileNotFoundError:
+        raise SnapshotException(
+            'snapshot {} not found; please regenerate it'.format(path))
+    if snapshot['version'] != VERSION:
+        raise SnapshotException('snapshot {} is for version {}, not {}'.format(
+            path, snapshot['version'], VERSION))
+    if snapshot.get('format') != FORMAT:
+        raise SnapshotException(
+            'snapshot {} is in an older format; please regenerate it'.format(path))
+    if verify and snapshot['digest'] != file_digest(sources()):
+        raise SnapshotException(
+            'snapshot {} is stale; please regenerate it'.format(path))
+    return snapshot
+
+
+def load(path=MASTER_SNAPSHOT, verify=True) -> Generation:
+    """ Return the dataset generation of the snapshot at `path` (see `read`),
+    without activating it.
+    """
+    snapshot = read(path, verify)
+    db = MappingProxyType(snapshot['products'])
+    graph = ProductGraph(db)
+    tables = GHGTables(db, graph, tables=snapshot['ghg'])
+    resolved = MappingProxyType({
+        name: ResolvedProduct(
+            name, sg, g, bunch, pkg, MappingProxyType(categories),
+            ResolvedGHG(tables, name))
+        for name, (name, sg, g, bunch, pkg, categories)
+        in snapshot['resolved'].items()})
+    maxsize = Origin._flattened.maxsize
+    origins = Cache(maxsize, LRU, weigh=len)
+    for origin, data in snapshot['origins'].items():
+        origins[origin] = data
+    product_index = MappingProxyType(snapshot['trigram_index'])
+    aka_index = MappingProxyType(snapshot['aka_index'])
+    trigram_index = TrigramIndex(product_index, aka_index)
+    return Generation({
+        (Product, '_db'): db,
+        (Product, '_fvdb'): MappingProxyType(snapshot['food_values']),
+        (Product, '_graph'): graph,
+        (Product, '_resolved'): resolved,
+        (Product, '_baselines'): snapshot['baselines'],
+        (Product, '_baselines_artifact'): snapshot['baselines_artifact'],
+        (Origin, '_manifest'): snapshot['manifest'],
+        (Origin, '_registry'): registry(snapshot['manifest']),
+        (Origin, '_db'): origins,
+        (Origin, '_flattened'): Cache(maxsize, LRU, weigh=len),
+        (Reference, '_db'): MappingProxyType(snapshot['references']),
+        (GIN, '_index'): MappingProxyType(snapshot['gin_index']),
+        (GIN, '_aka_index'): aka_index,
+        (GIN, '_stems'): snapshot['stems'],
+        (GIN, '_stem_ids'): snapshot['stem_ids'],
+        (GIN, '_alias_masks'): snapshot['alias_masks'],
+        (GIN, '_phrases'): snapshot['phrases'],
+        (Trigram, '_product_index'): product_index,
+        (Trigram, '_aka_index'): aka_index,
+        (Trigram, '_database'): None,
+        (Trigram, '_index'): trigram_index,
+    }, version=snapshot['version'], digest=snapshot['digest'])
+
+
+def warm(path=MASTER_SNAPSHOT, verify=True) -> Generation:
+    """ Load every runtime dataset from the snapshot at `path` (see `read`),
+    and return their (now active) generation.
+    """
+    return load(path, verify).activate()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+""" Sparse trigram incidence matrices of the aliases, for fuzzy matching many
+terms at once (see `Trigram.match_many`).
+
+The overlaps of every term with every alias are the product of the terms'
+(terms × trigrams) and the aliases' (trigrams × aliases) incidence matrices,
+from which scores are computed, and the best selected, in bulk. NumPy is
+required, and SciPy is used for the product if it's installed.
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    import scipy.sparse as sp
+except ImportError:
+    sp = None
+
+
+def spans(indptr, rows):
+    """ Return the positions in a CSR matrix's data of the entries of `rows`
+    (in order), and the number of entries of each.
+    """
+    starts = indptr[rows]
+    sizes = indptr[rows + 1] - starts
+    offsets = np.repeat(starts - np.cumsum(sizes) + sizes, sizes)
+    return offsets + np.arange(offsets.size), sizes
+
+
+def csr_product(a, b, shape):
+    """ Return the dense product of the (data, indices, indptr) CSR matrices
+    `a` and `b` (`a` @ `b`), of `shape`.
+    """
+    if sp is not None:
+        inner = len(b[2]) - 1
+        return (sp.csr_matrix(a, shape=(shape[0], inner)) @
+                sp.csr_matrix(b, shape=(inner, shape[1]))).toarray()
+    a_data, a_indices, a_indptr = a
+    b_data, b_indices, b_indptr = b
+    # every (row of a, column of b) pair joined through a's columns, summed
+    rows = np.repeat(np.arange(len(a_indptr) - 1), np.diff(a_indptr))
+    joined, sizes = spans(b_indptr, a_indices)
+    cells = np.repeat(rows, sizes) * shape[1] + b_indices[joined]
+    values = np.repeat(a_data, sizes) * b_data[joined]
+    return np.bincount(cells, weights=values,
+                       minlength=shape[0] * shape[1]).reshape(shape)
+
+
+class TrigramMatrix:
+    """ The (trigrams × aliases) incidence matrix, in CSR form, of a
+    `TrigramIndex`, whose postings are already its rows.
+    """
+    # the most (term, alias) scores computed at once
+    BLOCK = 1 << 22
+
+    def __init__(self, index):
+        if np is None:
+            raise ImportError('TrigramMatrix requires numpy')
+        self.index = index
+        self.grams = {gram: g for g, gram in enumerate(index.postings)}
+        sizes = [len(posting) for posting in index.postings.values()]
+        self.indptr = np.zeros(len(sizes) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=self.indptr[1:])
+        self.indices = np.concatenate(
+            [np.asarray(posting, dtype=np.int64)
+             for posting in index.postings.values()] or
+            [np.zeros(0, dtype=np.int64)])
+        self.data = np.ones(self.indices.size)
+        self.lengths = np.asarray(index.lengths, dtype=float)
+        self.ranks = np.asarray(index.ranks, dtype=np.int64)
+        # (trigram, alias) of every entry, which CSR order sorts
+        self.keys = (np.repeat(np.arange(len(sizes)), sizes) * self.lengths.size
+                     + self.indices)
+
+    def encode(self, termgrams: list):
+        """ Return the (terms × trigrams) CSR incidence matrix of the trigrams
+        of each term in `termgrams`, counting repeats, the position in the
+        term of the first of each of its entries, and the number of trigrams
+        of each term.
+        """
+        sizes = np.array([len(termgram) for termgram in termgrams], dtype=np.int64)
+        grams = self.grams
+        width = max(len(grams), 1)
+        ids = np.array([grams.get(gram, -1) for termgram in termgrams
+                        for gram in termgram], dtype=np.int64)
+        terms = np.repeat(np.arange(len(termgrams)), sizes)
+        positions = np.arange(ids.size) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        known = ids >= 0
+        # (term, trigram) entries, in CSR order
+        keys, firsts, counts = np.unique(
+            terms[known] * width + ids[known],
+            return_index=True, return_counts=True)
+        indptr = np.searchsorted(keys // width, np.arange(len(termgrams) + 1))
+        return ((counts.astype(float), keys % width, indptr),
+                positions[known][firsts], sizes.astype(float))
+
+    def top(self, termgrams: list, k=5, min_score=0.0) -> list:
+        """ Return the `TrigramIndex.top` matches of each of `termgrams` """
+        matches = [[] for _ in termgrams]
+        if k <= 0 or not termgrams or not self.lengths.size:
+            return matches
+        (data, indices, indptr), positions, n = self.encode(termgrams)
+        rows = max(1, self.BLOCK // self.lengths.size)
+        for lo in range(0, len(termgrams), rows):
+            hi = min(lo + rows, len(termgrams))
+            block = (data[indptr[lo]:indptr[hi]], indices[indptr[lo]:indptr[hi]],
+                     indptr[lo:hi + 1] - indptr[lo])
+            self._top(block, positions[indptr[lo]:indptr[hi]], n[lo:hi], k,
+                      min_score, matches[lo:hi])
+        return matches
+
+    def _top(self, terms, positions, n, k, min_score, matches):
+        counts = csr_product(terms, (self.data, self.indices, self.indptr),
+                             (len(n), self.lengths.size))
+        scores = counts / (self.lengths + n[:, None] - counts)
+        # only the aliases tying with or beating the k-th best score of their
+        # term need their tie breakers
+        limit = np.full(len(n), float(min_score))
+        if k < self.lengths.size:
+            kth = -np.partition(-scores, k - 1, axis=1)[:, k - 1]
+            limit = np.maximum(limit, kth)
+        rows, aliases = np.nonzero((scores >= limit[:, None]) & (counts > 0))
+        if not rows.size:
+            return
+        scores = scores[rows, aliases]
+
+        # the position of the first of its term's trigrams each alias has
+        joined, sizes = spans(terms[2], rows)
+        keys = terms[1][joined] * self.lengths.size + np.repeat(aliases, sizes)
+        found = np.searchsorted(self.keys, keys)
+        shared = self.keys[np.minimum(found, self.keys.size - 1)] == keys
+        firsts = np.minimum.reduceat(
+            np.where(shared, positions[joined], np.iinfo(np.int64).max),
+            np.cumsum(sizes) - sizes)
+
+        # best first, ties broken as `TrigramIndex.top` does
+        order = np.lexsort((self.ranks[aliases], firsts, -scores, rows))
+        rows, aliases, scores = rows[order], aliases[order], scores[order]
+        keep = np.arange(rows.size) - np.searchsorted(rows, rows) < k
+        products, names = self.index.products, self.index.aliases
+        for t, i, score in zip(rows[keep].tolist(), aliases[keep].tolist(),
+                               scores[keep].tolist()):
+            matches[t].append((products[i], names[i], score))
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+""" Part of speech tagger backends.
+
+`NltkTagger` is nltk's averaged perceptron tagger, as used by `nltk.pos_tag`,
+except that the model is loaded once rather than on every call.
+
+The perceptron tags any word found in its tag dictionary (the words it saw
+with one, unambiguous tag in training) with that tag, regardless of context.
+`LexiconTagger` keeps the entries of that dictionary for the vocabulary of the
+dataset and parser (see `generate.py`), so token lists made up only of those
+words are tagged exactly as the perceptron would tag them without running it.
+Other token lists go to the perceptron, with their results memoized.
+
+`Parser` and `GIN` use the active backend, which can be selected with
+`Tagger.use` or the GHGI_TAGGER environment variable. The default is the
+lexicon, since it tags everything exactly as the perceptron does. Until
+generate.py has written lexicon.json, the lexicon is the perceptron's whole tag
+dictionary, which is read when the lexicon is first used.
+"""
+import os
+import json
+import logging
+import threading
+import collections
+try:
+    from .datasets import MASTER_LEXICON
+    from .lazy import load_once, assigned
+    from .persistent import PersistentCache
+except:
+    from datasets import MASTER_LEXICON
+    from lazy import load_once, assigned
+    from persistent import PersistentCache
+
+DEFAULT_TAGGER = 'lexicon'
+
+
+class Tagger:
+    """ A part of speech tagger backend """
+    name = None
+    BACKENDS = {}
+    _active = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.name:
+            Tagger.BACKENDS[cls.name] = cls
+
+    def tag(self, tokens: list) -> list:
+        """ Return the list of (token, tag) pairs for `tokens` """
+        raise NotImplementedError
+
+    def tag_sents(self, sentences: list) -> list:
+        return [self.tag(tokens) for tokens in sentences]
+
+    @classmethod
+    def active(cls) -> 'Tagger':
+        """ Return the backend used by the parser and GIN index """
+        return load_once(
+            Tagger, '_active',
+            lambda: Tagger.use(os.environ.get('GHGI_TAGGER', DEFAULT_TAGGER)),
+            loaded=assigned)
+
+    @classmethod
+    def use(cls, name: str) -> 'Tagger':
+        """ Make the backend registered as `name` the active one """
+        if name not in Tagger.BACKENDS:
+            raise ValueError('Unknown tagger {}, expected one of {}'.format(
+                name, sorted(Tagger.BACKENDS)))
+        Tagger._active = Tagger.BACKENDS[name]()
+        cache = PersistentCache.active()
+        if cache is not None:
+            cache.rehash()
+        return Tagger._active
+
+
+class NltkTagger(Tagger):
+    """ nltk's averaged perceptron tagger """
+    name = 'nltk'
+    _perceptron = None
+
+    @classmethod
+    def perceptron(cls):
+        def load():
+            import nltk  # slow to import, so only when it's first needed
+            return nltk.tag.PerceptronTagger()
+        return load_once(cls, '_perceptron', load, loaded=assigned)
+
+    def tag(self, tokens: list) -> list:
+        return self.perceptron().tag(list(tokens))
+
+
+class LexiconTagger(Tagger):
+    """ Tag tokens from a precomputed {word: tag} lexicon, falling back to
+    (memoized calls to) another tagger for token lists with unknown words.
+
+    `stats` counts the calls to `tag`, and how many of them were answered from
+    the lexicon, from the memo, or by the fallback tagger.
+    """
+    name = 'lexicon'
+    MEMO_SIZE = 4096
+    _lexicon = None
+
+    def __init__(self, lexicon: dict = None, fallback: Tagger = None,
+                 memo_size: int = MEMO_SIZE):
+        self.lexicon = lexicon if lexicon is not None else self.load()
+        self.fallback = fallback or NltkTagger()
+        self.memo = collections.OrderedDict()
+        self.memo_size = memo_size
+        self._lock = threading.Lock()  # for the memo and stats
+        self.stats = collections.Counter(
+            {'calls': 0, 'lexicon': 0, 'memo': 0, 'fallback': 0})
+
+    @classmethod
+    def load(cls, path=MASTER_LEXICON) -> dict:
+        """ Return the lexicon at `path` (shared by all instances). If it
+        hasn't been generated, return the perceptron's tag dictionary instead,
+        or an empty lexicon, with a warning, if the perceptron isn't installed
+        either.
+        """
+        def load():
+            try:
+                with open(path) as f:
+                    return json.load(f)
+            except FileNotFoundError:
+                pass
+            try:
+                return dict(NltkTagger.perceptron().tagdict)
+            except LookupError:
+                logging.warning('{} not found; please regenerate it'.format(path))
+                return {}
+        return load_once(cls, '_lexicon', load, loaded=assigned)
+
+    @classmethod
+    def build(cls, vocabulary, tagger: NltkTagger = None) -> dict:
+        """ Return the lexicon of the words in `vocabulary` that the perceptron
+        tags the same way in any context.
+        """
+        tagdict = (tagger or NltkTagger()).perceptron().tagdict
+        return {word: tagdict[word] for word in sorted(set(vocabulary))
+                if word in tagdict}
+
+    def tag(self, tokens: list) -> list:
+        tokens = tuple(tokens)
+        lexicon = self.lexicon
+        if all(token in lexicon for token in tokens):
+            with self._lock:
+                self.stats['calls'] += 1
+                self.stats['lexicon'] += 1
+            return [(token, lexicon[token]) for token in tokens]
+
+        with self._lock:
+            self.stats['calls'] += 1
+            tagged = self.memo.get(tokens)
+            if tagged is not None:
+                self.stats['memo'] += 1
+                self.memo.move_to_end(tokens)
+                return list(tagged)
+            self.stats['fallback'] += 1
+
+        tagged = self.fallback.tag(tokens)
+        with self._lock:
+            self.memo[tokens] = tuple(tagged)
+            if len(self.memo) > self.memo_size:
+                self.memo.popitem(last=False)
+        return tagged
+
+    def hit_rate(self) -> float:
+        """ The share of calls that didn't need the fallback tagger """
+        if not self.stats['calls']:
+            return 0.0
+        return 1 - self.stats['fallback'] / self.stats['calls']
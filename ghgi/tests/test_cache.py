@@ -0,0 +1,97 @@
+from unittest import TestCase
+from unittest.mock import patch
+from ghgi.cache import Cache, LRU, LFU
+from ghgi.gin import GIN
+from ghgi.tokenizer import Tokenizer
+
+
+class TestCache(TestCase):
+    def test_lru(self):
+        cache = Cache(maxsize=2, policy=LRU)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)  # evicts b, the least recently used
+        self.assertNotIn('b', cache)
+        self.assertEqual(cache.get('b', 'missing'), 'missing')
+        self.assertEqual(cache.memoize('a', lambda: 0), 1)
+        self.assertEqual(cache.stats, {
+            'hits': 2, 'misses': 1, 'evictions': 1, 'invalidations': 0,
+            'size': 2, 'maxsize': 2})
+
+    def test_lfu(self):
+        cache = Cache(maxsize=2, policy=LFU)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        for _ in range(3):
+            cache.get('b')
+        cache.get('a')
+        cache.put('c', 3)  # evicts a, the least frequently used
+        self.assertEqual(sorted(cache._data), ['b', 'c'])
+        cache.put('d', 4)  # evicts c, used once
+        self.assertEqual(sorted(cache._data), ['b', 'd'])
+        self.assertEqual(cache.evictions, 2)
+        self.assertRaises(ValueError, Cache, 2, 'mru')
+
+    def test_weighed(self):
+        for policy in (LRU, LFU):
+            cache = Cache(maxsize=5, policy=policy, weigh=len)
+            cache['a'] = 'xx'
+            cache['b'] = 'yy'
+            self.assertEqual(cache['a'], 'xx')
+            cache['c'] = 'zzzz'  # evicts b, then a
+            self.assertEqual(list(cache._data), ['c'])
+            self.assertEqual((cache.size, cache.evictions), (4, 2))
+            cache['d'] = 'w' * 8  # too big, but kept alone
+            self.assertEqual(list(cache._data), ['d'])
+            with self.assertRaises(KeyError):
+                cache['c']
+            cache['e'] = 'v'
+            cache['f'] = 'v'
+            cache['e'] = 'vvvvv'  # replaced by a heavier value, evicts f
+            self.assertEqual(list(cache._data), ['e'])
+            self.assertEqual(cache.size, 5)
+
+    def test_disabled(self):
+        cache = Cache(maxsize=0)
+        self.assertEqual(cache.memoize('a', lambda: 1), 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_stamp(self):
+        source = [{}]
+        cache = Cache(stamp=lambda: (source[0],))
+        cache.put('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        source[0] = {}  # equal, but not the same object
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.invalidations, 1)
+
+    def test_stamp_replaced_while_computing(self):
+        source = [{}]
+        cache = Cache(stamp=lambda: (source[0],))
+
+        def compute():
+            source[0] = {}  # replaced before the value is cached
+            return 1
+        self.assertEqual(cache.memoize('a', compute), 1)
+        self.assertNotIn('a', cache)
+
+    def test_gin_query_cache(self):
+        cache = GIN.configure_cache(maxsize=8)
+        try:
+            expected = GIN.query('white')
+            self.assertEqual(GIN.query('white'), expected)
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+            # reloading the index invalidates the cache
+            with patch.object(GIN, '_index', dict(GIN.index())):
+                self.assertEqual(GIN.query('white'), expected)
+                self.assertEqual(cache.invalidations, 1)
+            # and so does switching tokenizers
+            GIN.query('white')
+            invalidations = cache.invalidations
+            with patch.object(Tokenizer, '_active', None):
+                Tokenizer.use('fast')
+                self.assertIsNone(cache.get('white'))
+                self.assertEqual(cache.invalidations, invalidations + 1)
+        finally:
+            GIN.configure_cache()
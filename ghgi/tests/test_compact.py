@@ -0,0 +1,77 @@
+from unittest import TestCase
+import io
+import json
+
+from ghgi.compact import CompactIndex, CompactIndexException, write_compact_index
+from ghgi.gin import GIN
+from ghgi.datasets import MASTER_AKA_INDEX, MASTER_TRIGRAM_INDEX, MASTER_GIN_INDEX
+
+
+class TestCompact(TestCase):
+    def build(self, aka_index, trigram_index, gin_index):
+        buffer = io.BytesIO()
+        write_compact_index(aka_index, trigram_index, gin_index, buffer)
+        return CompactIndex(buffer.getvalue())
+
+    def test_round_trip(self):
+        aka_index = {
+            'alpha': ['test', 3],
+            'beta': ['test', 2],
+            'crème fraîche': ['cream', 11],
+            'test': ['test', 2],
+        }
+        trigram_index = {'alp': ['alpha'], 'eta': ['beta'], 'crè': ['crème fraîche']}
+        gin_index = {'alpha': ['alpha'], 'crème': ['crème fraîche'], 'test': ['test']}
+        index = self.build(aka_index, trigram_index, gin_index)
+
+        self.assertEqual(dict(index.aka_index), aka_index)
+        self.assertEqual(dict(index.trigram_index), trigram_index)
+        self.assertEqual(dict(index.gin_index), gin_index)
+        self.assertEqual(index.gin_index.get('missing', []), [])
+        self.assertFalse('missing' in index.aka_index)
+        with self.assertRaises(KeyError):
+            index.aka_index['missing']
+        self.assertEqual(list(index.trigram_index.ids('alp')),
+                         [index.alias_id('alpha')])
+        stem_ids, alias_masks, phrases = GIN.compile_masks(gin_index, store=False)
+        self.assertEqual(set(index.stem_ids), set(stem_ids))
+        self.assertEqual(dict(index.phrases), phrases)
+        self.assertEqual({a: size for a, (_, size) in index.alias_masks.items()},
+                         {a: size for a, (_, size) in alias_masks.items()})
+        self.assertEqual(index.alias_masks['crème fraîche'][0],
+                         index.stem_ids['crème'] | index.stem_ids['fraîch'])
+        self.assertNotIn('beta', index.alias_masks)  # not in the GIN index
+        # ordered by trigram count, and then alias
+        self.assertEqual(list(index.ordered_names),
+                         ['beta', 'test', 'alpha', 'crème fraîche'])
+        self.assertEqual(list(index.ordered_products), ['test', 'test', 'test', 'cream'])
+        self.assertEqual(list(index.ordered_trigrams), [2, 2, 3, 11])
+        self.assertEqual(list(index.ordered_trigram_index['alp']), [2])
+
+    def test_invalid(self):
+        with self.assertRaises(CompactIndexException):
+            CompactIndex(b'not an index at all, not even close')
+        with self.assertRaises(CompactIndexException):
+            CompactIndex(b'')
+
+    def test_shared_memory(self):
+        index = CompactIndex.open()
+        shm = index.share()
+        try:
+            shared = CompactIndex.attach(shm.name)
+            self.assertEqual(len(shared.aka_index), len(index.aka_index))
+            self.assertEqual(shared.gin_index['oil'], index.gin_index['oil'])
+            shared.close()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def test_master_index_current(self):
+        # the shipped compact index must match the json indexes
+        index = CompactIndex.open()
+        with open(MASTER_AKA_INDEX) as f:
+            self.assertEqual(dict(index.aka_index), json.load(f))
+        with open(MASTER_TRIGRAM_INDEX) as f:
+            self.assertEqual(dict(index.trigram_index), json.load(f))
+        with open(MASTER_GIN_INDEX) as f:
+            self.assertEqual(dict(index.gin_index), json.load(f))
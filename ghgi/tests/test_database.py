@@ -0,0 +1,115 @@
+from unittest import TestCase
+import os
+import io
+import json
+import tempfile
+from types import MappingProxyType
+
+from ghgi import database
+from ghgi.database import Database, DatabaseException, write_database, SQLITE, JSON
+from ghgi.trigram import Trigram, build_indexes
+from ghgi.gin import GIN
+from ghgi.graph import ProductGraph
+from ghgi.origin import Origin
+from ghgi.product import Product
+from ghgi.reference import Reference
+
+PRODUCTS = {
+    '_comment': 'hidden',
+    'test': {'names': ['alpha', 'beta', 'theta'], 'super': {'test2': 100}},
+    'test2': {'names': ['alpha2', 'theta2', 'crème fraîche']},
+}
+ORIGINS = {
+    'global': ('global.json', {'test2': [[1], [1, 2, 3, 4]]}),
+    'local': ('local.json', {'super': 'global', 'test': [[1], [5, 6, 7, 8]]}),
+}
+REFERENCES = {'1': {'title': 'a reference'}}
+GIN_INDEX = {'alpha': ['alpha'], 'crème': ['crème fraîche'], 'test': ['test', 'test2']}
+
+
+class TestDatabase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'test.sqlite3')
+        self.aka_index, self.trigram_index = build_indexes(
+            io.StringIO(json.dumps(PRODUCTS)))
+        write_database(self.path, PRODUCTS, ORIGINS, REFERENCES,
+                       self.aka_index, GIN_INDEX)
+        self.database = Database(self.path)
+
+    def tearDown(self):
+        self.database.connection().close()
+        self.directory.cleanup()
+
+    def test_views(self):
+        db = self.database
+        self.assertEqual(list(db.products), ['test', 'test2'])
+        self.assertEqual(db.products['test']['super'], {'test2': 100})
+        self.assertEqual(db.products['test']['name'], 'test')
+        self.assertNotIn('_comment', db.products)
+        self.assertEqual(dict(db.origins['local']), ORIGINS['local'][1])
+        self.assertEqual(db.origin_supers, {'global': None, 'local': 'global'})
+        self.assertEqual(dict(db.references), REFERENCES)
+        self.assertEqual({k: tuple(v) for k, v in db.aka_index.items()},
+                         self.aka_index)
+        self.assertEqual(dict(db.gin_index), GIN_INDEX)
+        self.assertEqual(db.gin_index.get('missing', []), [])
+        with self.assertRaises(KeyError):
+            db.origins['atlantis']
+        self.assertRaises(DatabaseException, Database, self.path + '.missing')
+
+    def test_trigram_match(self):
+        # the FTS5 search matches the json index scan, ties and all
+        terms = ['alpha', 'theta', 'eta', 'crème', 'CREME', 'te', 'none', 'x"y']
+        Trigram._aka_index = self.aka_index
+        Trigram._product_index = self.trigram_index
+        try:
+            expected = [Trigram.match(term) for term in terms]
+            Trigram.load_sqlite(database=self.database)
+            self.assertEqual([Trigram.match(term) for term in terms], expected)
+            self.assertEqual(Trigram.match('alpha')[0], ('test', 'alpha', 1.0))
+        finally:
+            Trigram.load_json()
+
+    def test_lazy_products(self):
+        # the graph comes from the parents table, and products are only read
+        # and resolved once they're used
+        products = {k: v for k, v in PRODUCTS.items() if not k.startswith('_')}
+        expected = ProductGraph(products)
+        graph = self.database.product_graph()
+        self.assertEqual(graph.parents, expected.parents)
+        self.assertEqual(graph.order, expected.order)
+        self.assertEqual(graph.missing, expected.missing)
+
+        Product.load_sqlite(database=self.database)
+        try:
+            resolved = Product.resolved()
+            self.assertEqual(list(resolved), ['test2', 'test'])
+            self.assertEqual(resolved.resolved, {})
+            self.assertEqual(resolved['test'].name, 'test')
+            self.assertEqual(list(resolved.resolved), ['test2', 'test'])
+            with self.assertRaises(KeyError):
+                resolved['missing']
+        finally:
+            Product.load_json()
+
+    def test_use(self):
+        names = ['olive oil', 'white wine vinegar', 'chopped fresh basil']
+        lookups = [Product.lookup({Product.NAMES: [name]}) for name in names]
+        values = Origin.values('usa', 'milk')
+        graph = Product.graph()
+        database.use(SQLITE)
+        try:
+            self.assertIsInstance(Product.db(), database.Table)
+            self.assertIsInstance(GIN.index(), database.Table)
+            self.assertEqual(
+                [Product.lookup({Product.NAMES: [name]}) for name in names], lookups)
+            self.assertEqual(Origin.values('usa', 'milk'), values)
+            self.assertTrue(Origin.valid('usa'))
+            self.assertEqual(Product.graph().order, graph.order)
+            self.assertLess(len(Product.resolved().resolved), len(graph.order))
+        finally:
+            database.use(JSON)
+        self.assertIsInstance(Product.db(), MappingProxyType)
+        self.assertIsInstance(Reference.db(), MappingProxyType)
+        self.assertRaises(ValueError, database.use, 'csv')
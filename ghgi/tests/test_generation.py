@@ -0,0 +1,127 @@
+from unittest import TestCase
+import os
+import tempfile
+import threading
+from types import MappingProxyType
+
+from ghgi import database
+from ghgi.generation import Generation, reload
+from ghgi.snapshot import SnapshotException, write_snapshot
+from ghgi.persistent import PersistentCache, LOOKUP
+from ghgi.product import Product
+from ghgi.origin import Origin
+from ghgi.gin import GIN
+from ghgi.cache import Cache, LRU
+from ghgi.graph import ProductGraph
+
+
+def generation_with(product, data):
+    """ Return a copy of the active generation with `product` set to `data` """
+    stores = dict(Generation.active().stores)
+    db = dict(stores[(Product, '_db')], **{product: dict(data, name=product)})
+    stores[(Product, '_db')] = db
+    stores[(Product, '_graph')] = ProductGraph(db)
+    stores[(Product, '_resolved')] = Product.resolve(db, stores[(Product, '_graph')])
+    stores[(Origin, '_flattened')] = Cache(Origin._flattened.maxsize, LRU, weigh=len)
+    return Generation(stores)
+
+
+class TestGeneration(TestCase):
+    def setUp(self):
+        self.original = Generation.active()
+
+    def tearDown(self):
+        PersistentCache.disable()
+        database.use(database.JSON)
+
+    def test_stores(self):
+        self.assertIs(Generation.active(), self.original)
+        self.assertIs(self.original.stores[(Product, '_db')], Product.db())
+        with self.assertRaisesRegex(ValueError, 'Product._db'):
+            Generation({})
+
+    def test_activate(self):
+        cache = Product.lookup_cache()
+        cache.put(('gold',), ('milk', 'milk', 0.5))
+        generation = generation_with('gold', {'names': ['gold'], 'super': {'milk': 100}})
+        self.assertIs(generation.activate(), generation)
+        self.assertIs(Generation.active(), generation)
+        self.assertIn('gold', Product.db())
+        self.assertEqual(Product.resolved()['gold'].ghg, Product.resolved()['milk'].ghg)
+        # results from the previous generation are dropped
+        self.assertIsNone(cache.get(('gold',)))
+
+    def test_pinned(self):
+        generation = generation_with('gold', {'names': ['gold']})
+        pinned, activated = threading.Event(), threading.Event()
+        seen = []
+
+        def request():
+            with Generation.pinned() as pin:
+                seen.append(pin)
+                pinned.set()
+                activated.wait()
+                seen.append(Product.db())
+                seen.append(Product.resolved())
+                seen.append(Origin.ORIGINS)
+
+        thread = threading.Thread(target=request)
+        thread.start()
+        pinned.wait()
+        generation.activate()
+        activated.set()
+        thread.join()
+
+        # the request read the generation it started with throughout
+        self.assertIs(seen[0], self.original)
+        self.assertIs(seen[1], self.original.stores[(Product, '_db')])
+        self.assertIs(seen[2], self.original.stores[(Product, '_resolved')])
+        self.assertNotIn('gold', seen[1])
+        self.assertIn('gold', Product.db())
+        with Generation.pinned(self.original):
+            self.assertNotIn('gold', Product.db())
+            self.assertNotIn('gold', Product.resolved())
+        self.assertIn('gold', Product.resolved())
+
+    def test_pinned_caches(self):
+        # requests pinned to the replaced generation neither clear nor fill
+        # the query cache of the active one
+        stores = dict(self.original.stores)
+        stores[(GIN, '_index')] = MappingProxyType(dict(GIN.index()))
+        generation = Generation(stores).activate()
+        cache = GIN.configure_cache()
+        for _ in range(5):
+            self.assertEqual(GIN.query('olive oil')[0], 'olive oil')
+            with Generation.pinned(self.original):
+                self.assertEqual(GIN.query('olive oil')[0], 'olive oil')
+        self.assertEqual((cache.hits, cache.misses, cache.invalidations), (4, 6, 0))
+        with Generation.pinned(generation):
+            GIN.query('olive oil')
+        self.assertEqual(cache.hits, 5)
+
+    def test_reload(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'snapshot.pickle')
+            write_snapshot(path)
+            previous = Generation.active()
+            generation = reload(path).result()
+        self.assertIs(Generation.active(), generation)
+        self.assertIsNot(generation, previous)
+        self.assertIs(Product.db(), generation.stores[(Product, '_db')])
+        self.assertEqual(Product.db(), previous.stores[(Product, '_db')])
+
+        with self.assertRaises(SnapshotException):
+            reload(os.path.join(directory, 'missing.pickle')).result()
+        self.assertIs(Generation.active(), generation)
+
+    def test_persistent(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = PersistentCache.enable(os.path.join(directory, 'cache.db'))
+            generation = generation_with('gold', {'names': ['gold']}).activate()
+            with Generation.pinned(self.original):
+                cache.put(LOOKUP, 'old', 1)  # from the replaced generation
+            with Generation.pinned(generation):
+                cache.put(LOOKUP, 'new', 2)
+            self.assertIsNone(cache.get(LOOKUP, 'old'))
+            self.assertEqual(cache.get(LOOKUP, 'new'), 2)
+            PersistentCache.disable()
@@ -1,5 +1,7 @@
 from unittest import TestCase
+from unittest.mock import patch
 from ghgi.gin import GIN
+from ghgi.compact import AliasMasks
 from .fixtures.gin import QUERIES
 
 
@@ -9,3 +11,65 @@ class TestGin(TestCase):
             print(q)
             print(result)
             self.assertEqual(result, GIN.query(q))
+
+    def test_alias_masks(self):
+        # every alias's mask must encode exactly its own stems
+        stem_ids = GIN.stem_ids()
+        for alias, (mask, size) in GIN.alias_masks().items():
+            tokens = GIN.tokenize(alias)
+            self.assertEqual(size, len(tokens))
+            self.assertEqual(mask, GIN.mask(GIN.stem(tokens)))
+            for stem in GIN.stem(tokens):
+                self.assertTrue(stem_ids[stem] & mask)
+        self.assertEqual(GIN.mask(['not-a-real-stem']), 0)
+
+    def test_phrases(self):
+        phrases = GIN.phrases()
+        self.assertEqual(phrases[('oil', 'oliv')], 'olive oil')
+        for stems, alias in phrases.items():
+            self.assertEqual(tuple(sorted(GIN.stem(GIN.lower(GIN.tokenize(alias))))), stems)
+        stats = GIN.phrase_stats()
+        # an alias, in any order and inflection, is matched without tagging
+        with patch.object(GIN, 'pos_tag', side_effect=AssertionError):
+            for term in ['olive oil', 'Oil Olive', 'olive oils']:
+                self.assertEqual(GIN.match(term),
+                                 ('olive oil', GIN.aka_index()['olive oil'], 1.0, 2, 2))
+        self.assertEqual(GIN.phrase_stats()['hits'], stats['hits'] + 3)
+        # anything else is matched as before
+        for q, result in QUERIES:
+            with patch.object(GIN, 'phrase_match', return_value=None):
+                expected = GIN.match(q)
+            self.assertEqual(GIN.frozen(GIN.match(q)), GIN.frozen(expected))
+
+    def test_stems(self):
+        stems = GIN.stems()
+        self.assertEqual(stems['tomatoes'], 'tomato')
+        self.assertEqual(stems['whiting'], 'whiting')  # NO_STEM
+        # the table matches the stemmer, which known words don't need
+        with patch.object(GIN, 'stemmer', side_effect=AssertionError):
+            self.assertEqual(GIN.stem(['Tomatoes', 'whiting', ',']),
+                             ['tomato', 'whiting', ','])
+        self.assertEqual(GIN.build_stems(stems), stems)
+        # unknown words are stemmed once, and remembered
+        memo = GIN.stem_memo()
+        misses = memo.misses
+        self.assertEqual(GIN.stem(['zorbling', 'zorblings', 'zorblings']),
+                         ['zorbl', 'zorbl', 'zorbl'])
+        self.assertEqual(memo.misses, misses + 2)
+
+    def test_compact(self):
+        # the compact index serves the same masks and phrases, in place
+        GIN.load_json()
+        alias_masks, phrases = GIN.alias_masks(), GIN.phrases()
+        GIN.load_compact()
+        try:
+            self.assertIsInstance(GIN.alias_masks(), AliasMasks)
+            self.assertEqual(dict(GIN.phrases()), phrases)
+            self.assertEqual(set(GIN.alias_masks()), set(alias_masks))
+            for alias, (mask, size) in GIN.alias_masks().items():
+                self.assertEqual(size, alias_masks[alias][1])
+                self.assertEqual(mask, GIN.mask(GIN.stem(GIN.tokenize(alias))))
+            self.assertEqual(GIN.mask(['not-a-real-stem']), 0)
+            self.assertEqual(GIN.match('Oil Olive')[0], 'olive oil')
+        finally:
+            GIN.load_json()
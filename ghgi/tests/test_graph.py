@@ -0,0 +1,48 @@
+from unittest import TestCase
+
+from ghgi.graph import ProductGraph, ProductGraphException
+from ghgi.product import Product
+
+
+class TestProductGraph(TestCase):
+    def test_order(self):
+        db = {
+            'juice': {'super': {'fruit': 200}, 'loss': {'fruit': 0.5}},
+            'punch': {'super': {'juice': 50, 'water': 50}},
+            'fruit': {'super': {}},
+            'water': {},
+        }
+        graph = ProductGraph(db)
+        self.assertEqual(len(graph.order), len(db))
+        for name, parents in graph.parents.items():
+            for parent in parents:
+                self.assertLess(graph.order.index(parent), graph.order.index(name))
+        self.assertEqual(graph.roots, ['fruit', 'water'])
+        self.assertEqual(graph.missing, {})
+
+        depths = graph.resolve(lambda name, resolved: 1 + max(
+            [resolved[p] for p in graph.parents[name]], default=0))
+        self.assertEqual(depths, {'fruit': 1, 'water': 1, 'juice': 2, 'punch': 3})
+
+    def test_missing(self):
+        graph = ProductGraph({'juice': {'super': {'fruit': 100}}})
+        self.assertEqual(graph.missing, {'juice': ['fruit']})
+        self.assertEqual(graph.order, ['juice'])
+
+    def test_cycles(self):
+        with self.assertRaises(ProductGraphException) as cm:
+            ProductGraph({
+                'a': {'super': {'b': 100}},
+                'b': {'super': {'c': 100}},
+                'c': {'loss': {'a': 0.5}},
+                'd': {'super': {'a': 100}},
+            })
+        self.assertIn('a -> b -> c -> a', str(cm.exception))
+        with self.assertRaises(ProductGraphException):
+            ProductGraph({'a': {'super': {'a': 100}}})
+
+    def test_products_graph(self):
+        graph = Product.graph()
+        self.assertEqual(set(graph.order), set(Product.db()))
+        self.assertEqual(graph.missing, {})
+        Product.validate_db()
@@ -0,0 +1,56 @@
+from unittest import TestCase, skipIf
+import math
+
+from ghgi.product import Product
+from ghgi.origin import Origin, GHGFlavor
+try:
+    import numpy as np
+    from ghgi.matrix import GHGMatrix
+except ImportError:
+    np = None
+
+
+@skipIf(np is None, 'numpy is not installed')
+class TestMatrix(TestCase):
+    def test_values(self):
+        matrix = GHGMatrix.get()
+        self.assertIs(matrix, GHGMatrix.get())
+        self.assertEqual(matrix.values.shape, (
+            len(Product.db()), len(Origin.ORIGINS), len(GHGFlavor)))
+        for name in Product.db():
+            product = Product.get(name)
+            for origin in Origin.ORIGINS:
+                for flavor in GHGFlavor:
+                    expected = Product.ghg_value(product, origin, flavor)
+                    value = matrix.values[matrix.product_index[name],
+                                          matrix.origin_index[origin], flavor.value]
+                    if expected is None:
+                        self.assertTrue(math.isnan(value))
+                    else:
+                        self.assertAlmostEqual(value, expected)
+
+    def test_impacts(self):
+        matrix = GHGMatrix.get()
+        ids = matrix.product_ids(['milk', 'not a product', 'apples'])
+        self.assertEqual(ids[1], -1)
+        impacts = matrix.impacts(ids, [200, 100, 50])
+        self.assertEqual(impacts.shape, (3, len(Origin.ORIGINS), len(GHGFlavor)))
+        self.assertTrue(np.isnan(impacts[1]).all())
+        for origin in Origin.ORIGINS:
+            for flavor in GHGFlavor:
+                expected = Product.ghg_value(
+                    Product.get('milk'), origin, flavor) * 200
+                self.assertAlmostEqual(
+                    impacts[0, matrix.origin_index[origin], flavor.value], expected)
+
+        median = matrix.impact(ids, [200, 100, 50])
+        self.assertAlmostEqual(median[0], Product.ghg_value(
+            Product.get('milk'), Origin.DEFAULT, GHGFlavor.MEDIAN) * 200)
+        self.assertTrue(np.isnan(median[1]))
+        p90 = matrix.impact(ids, [200, 100, 50], 'usa', GHGFlavor.P_90)
+        self.assertAlmostEqual(p90[2], Product.ghg_value(
+            Product.get('apples'), 'usa', GHGFlavor.P_90) * 50)
+
+    def test_read_only(self):
+        with self.assertRaises(ValueError):
+            GHGMatrix.get().values[0, 0, 0] = 1.0
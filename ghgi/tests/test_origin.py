@@ -1,6 +1,7 @@
 from unittest import TestCase
+from unittest.mock import patch
 
-from ghgi.origin import Origin
+from ghgi.origin import Origin, GHGFlavor, OriginHierarchyException, build_manifest
 from ghgi.reference import Reference
 
 
@@ -45,3 +46,49 @@ class TestOrigin(TestCase):
                 self.assertTrue(all([str(v) in Reference.db()
                                 for v in values[0]]))
                 self.assertEqual(len(values[1]), 4)
+
+    def test_flattened(self):
+        usa = Origin.flattened('usa')
+        self.assertEqual(usa['milk'][1], 'usa')
+        self.assertEqual(Origin.provenance('canada', 'milk'), 'canada')
+        self.assertEqual(Origin.provenance('canada', 'apples'), 'global')
+        self.assertIsNone(Origin.provenance('usa', 'unobtainium'))
+        for product, (entry, source) in usa.items():
+            self.assertIs(Origin._db[source][product], entry)
+            self.assertEqual(Origin.ghg_value(product, 'usa', GHGFlavor.P_90),
+                             entry[1][GHGFlavor.P_90.value])
+        self.assertEqual(Origin.chain('usa'), ['usa', 'north_america', 'global'])
+
+    def test_broken_hierarchy(self):
+        origins = {
+            'a': {'super': 'b', 'milk': [[1], [1, 2, 3, 4]]},
+            'b': {'super': 'a'},
+            'c': {'super': 'atlantis'},
+        }
+        with patch.object(Origin, '_db', origins), \
+                patch.object(Origin, '_flattened', {}), \
+                patch.object(Origin, 'ORIGINS', list(origins)), \
+                patch.object(Origin, 'ORIGIN_PATHS', dict.fromkeys(origins)):
+            with self.assertRaisesRegex(OriginHierarchyException, 'a -> b -> a'):
+                Origin.values('a', 'milk')
+            with self.assertRaisesRegex(OriginHierarchyException, 'atlantis'):
+                Origin.flattened('c')
+            self.assertRaises(OriginHierarchyException, Origin.validate)
+
+    def test_manifest(self):
+        # the generated manifest must be up to date with the origin files
+        self.assertEqual(Origin.manifest(), build_manifest())
+        self.assertEqual(Origin.DEFAULT, 'global')
+
+    def test_cache(self):
+        expected = Origin.values('canada', 'apples')
+        Origin.configure_cache(max_entries=10)
+        try:
+            self.assertEqual(Origin.values('canada', 'apples'), expected)
+            # global (with 60 entries) is evicted as soon as others are loaded
+            self.assertNotIn('global', Origin._db)
+            self.assertEqual(list(Origin._flattened._data), ['canada'])
+            self.assertEqual(Origin.values('usa', 'apples'), expected)
+            self.assertEqual(list(Origin._flattened._data), ['usa'])
+        finally:
+            Origin.configure_cache()
@@ -25,6 +25,22 @@ class TestParser(TestCase):
         for line in AMOUNTS_DATA:
             self.assertEqual(Parser.parse(line[0])[0], line[1])
 
+    def test_parse_many(self):
+        lines = [line[0] for line in AMOUNTS_DATA] + [
+            'Equipment:',
+            '1 cup flour',
+            'For the filling:',
+            '2 eggs',
+        ]
+        expected = []
+        disregard = False
+        for line in lines:
+            result = Parser.parse(line, disregard)
+            disregard = result[1]
+            expected += [result]
+        self.assertEqual(Parser.parse_many(lines), expected)
+        self.assertEqual(Parser.parse_many([]), [])
+
     def test_devulgarize(self):
         for line in VULGAR_DATA:
             self.assertEqual(Parser.devulgarize(line[0]), line[1])
@@ -0,0 +1,93 @@
+import os
+import json
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+from ghgi.parser import Parser
+from ghgi.product import Product
+from ghgi.persistent import PersistentCache, PARSE, LOOKUP
+from ghgi.tokenizer import Tokenizer
+from ghgi.tagger import Tagger, LexiconTagger
+
+
+class TestPersistent(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'cache.db')
+        Product.configure_cache()
+
+    def tearDown(self):
+        PersistentCache.disable()
+        Product.configure_cache()
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        cache = PersistentCache(self.path, batch_size=2)
+        cache.put(PARSE, 'a', {'qty': 1})
+        self.assertEqual(cache.get(PARSE, 'a'), {'qty': 1})  # still pending
+        self.assertIsNone(cache.get(LOOKUP, 'a'))
+        cache.put(PARSE, 'b', None)  # fills the batch
+        self.assertEqual(cache._pending, {})
+        cache.close()
+
+        cache = PersistentCache(self.path)
+        self.assertEqual(cache.get(PARSE, 'a'), {'qty': 1})
+        self.assertIsNone(cache.get(PARSE, 'b', PersistentCache.MISSING))
+        self.assertIs(cache.get(PARSE, 'c', PersistentCache.MISSING),
+                      PersistentCache.MISSING)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+        cache.close()
+
+    def test_versions(self):
+        cache = PersistentCache(self.path)
+        cache.put(PARSE, 'a', 1)
+        cache.close()
+        with patch('ghgi.persistent.version', return_value='other'):
+            other = PersistentCache.enable(self.path)  # prunes the old version
+            self.assertIsNone(other.get(PARSE, 'a'))
+            other.put(PARSE, 'a', 2)
+            PersistentCache.disable()
+        cache = PersistentCache(self.path)
+        self.assertIsNone(cache.get(PARSE, 'a'))
+        cache.close()
+
+    def test_backends(self):
+        # switching the tokenizer, tagger or lexicon rehashes the cache
+        tokenizer, tagger = Tokenizer.active(), Tagger.active()
+        self.addCleanup(setattr, Tokenizer, '_active', tokenizer)
+        self.addCleanup(setattr, Tagger, '_active', tagger)
+        cache = PersistentCache.enable(self.path)
+        cache.put(PARSE, 'a', 1)
+        versions = {cache.version}
+        Tokenizer.use('fast' if tokenizer.name != 'fast' else 'nltk')
+        versions.add(cache.version)
+        with patch.object(LexiconTagger, 'load', return_value={'a': 'DT'}):
+            Tagger.use('lexicon')
+        versions.add(cache.version)
+        with patch.object(LexiconTagger, 'load', return_value={'a': 'NN'}):
+            Tagger.use('lexicon')
+        versions.add(cache.version)
+        self.assertEqual(len(versions), 4)
+        self.assertIsNone(cache.get(PARSE, 'a'))
+
+    def test_parse(self):
+        # cached lines are never tagged
+        cache = PersistentCache.enable(self.path)
+        data = {'qty': 2.0, 'unit': 'cup', 'names': ['milk']}
+        cache.put(PARSE, '2 cups milk', data)
+        with patch.object(Parser, 'tag', side_effect=AssertionError):
+            self.assertEqual(Parser.parse('2 cups milk'), (data, False))
+            self.assertEqual(Parser.parse_many(['2 cups milk']), [(data, False)])
+
+    def test_lookup(self):
+        cache = PersistentCache.enable(self.path)
+        cache.put(LOOKUP, json.dumps(['gold']), ['milk', 'milk', 0.5])
+        product, confidence = Product.lookup({Product.NAMES: ['gold']})
+        self.assertEqual(product[Product.NAME], 'milk')
+        self.assertEqual(confidence, 0.5)
+
+        PersistentCache.disable()
+        Product.configure_cache()
+        cache = PersistentCache.enable(self.path)
+        self.assertEqual(Product.lookup({Product.NAMES: ['gold']})[1], 0.5)
+        self.assertEqual(cache.hits, 1)
@@ -0,0 +1,26 @@
+from unittest import TestCase
+import gc
+from ghgi.pool import ScoringPool
+from ghgi.recipe import score_recipe
+from .fixtures.parser import AMOUNTS_DATA
+
+LINES = [entry[0] for entry in AMOUNTS_DATA]
+
+
+class TestPool(TestCase):
+    def test_score_recipes(self):
+        recipes = [LINES[i:i + 4] for i in range(0, len(LINES), 4)]
+        with ScoringPool(workers=2, chunksize=2) as pool:
+            # the parent's objects are only frozen while the workers fork
+            self.assertEqual(gc.get_freeze_count(), 0)
+            self.assertTrue(gc.isenabled())
+            scores = pool.score_recipes(recipes)
+            ingredients = pool.score_ingredients(LINES[:6])
+        # results come back in order, and match scoring in this process
+        self.assertEqual(len(scores), len(recipes))
+        for lines, score in zip(recipes, scores):
+            expected = score_recipe(lines)
+            self.assertEqual(score.totals, expected.totals)
+            self.assertEqual([i.line for i in score.ingredients], lines)
+        self.assertEqual([i.line for i in ingredients], LINES[:6])
+        self.assertEqual(ingredients[1].impacts, score_recipe(LINES[1:2]).ingredients[0].impacts)
@@ -1,7 +1,13 @@
 from unittest import TestCase
 from unittest.mock import patch
+import json
 
 from ghgi.product import Product, Category, Ingredient
+from ghgi.origin import Origin, GHGFlavor
+from ghgi.cache import Cache, LRU
+from ghgi.reference import Reference
+from ghgi.gin import GIN
+from ghgi.trigram import Trigram
 
 
 class TestProduct(TestCase):
@@ -203,5 +209,121 @@ class TestProduct(TestCase):
                         self.assertEqual(
                             Product.ghg_efficiency_ratio(product), 1.0/7.5/2.0)
 
+    def test_resolved(self):
+        # the materialized table must agree with the recursive computations
+        resolved = Product.resolved()
+        self.assertEqual(set(resolved), set(Product.db()))
+        with patch.object(Product, 'resolved_product', return_value=None):
+            self.check_resolved(resolved)
+
+    def check_resolved(self, resolved):
+        for name in Product.db():
+            product = Product.get(name)
+            record = resolved[name]
+            self.assertEqual(record.sg, Product.sg(product))
+            self.assertEqual(record.g, Product.g(product))
+            self.assertEqual(
+                Product.unbundle(product, 2, Ingredient.BUNCH),
+                (2 * (record.bunch or 6), Ingredient.EA))
+            self.assertEqual(
+                Product.unbundle(product, 2, Ingredient.PKG),
+                (2 * (record.pkg or 540), 'ml'))
+            self.assertEqual(record.categories, Product.food_values(product))
+            for origin in Origin.ORIGINS:
+                for flavor in GHGFlavor:
+                    self.assertEqual(record.ghg_value(origin, flavor),
+                                     Product.ghg_value(product, origin, flavor))
+
+    def test_resolved_lookups(self):
+        # database products are read from the resolved table, without
+        # walking their parents
+        products = [Product.get(name) for name in Product.db()]
+        records = [Product.resolved()[p[Product.NAME]] for p in products]
+        ingredient = {Ingredient.QTYS: [{
+            Ingredient.QTY: 2,
+            Ingredient.UNIT: Ingredient.EA,
+            Ingredient.PER: None,
+            Ingredient.QUALIFIERS: [],
+            Ingredient.PLUS: False
+        }]}
+        with patch.object(Product, 'db', side_effect=AssertionError):
+            for product, record in zip(products, records):
+                self.assertEqual(Product.sg(product), record.sg)
+                self.assertEqual(Product.g(product), record.g)
+                self.assertEqual(
+                    Product.unbundle(product, 2, Ingredient.BUNCH),
+                    (2 * (record.bunch or 6), Ingredient.EA))
+                self.assertEqual(
+                    Product.unbundle(product, 2, Ingredient.PKG),
+                    (2 * (record.pkg or 540), 'ml'))
+                self.assertEqual(
+                    Product.ghg_value(product, None, GHGFlavor.MEDIAN),
+                    record.ghg_value(None, GHGFlavor.MEDIAN))
+                self.assertEqual(
+                    Product.mass(dict(ingredient, product=product)),
+                    2 * record.g)
+
+    def test_resolved_lazy(self):
+        # GHG values are resolved for an origin the first time it's used
+        with patch.object(Origin, '_db', Cache(1000, LRU, weigh=len)), \
+                patch.object(Origin, '_flattened', Cache(1000, LRU, weigh=len)):
+            resolved = Product.resolve(Product.db())
+            self.assertEqual(len(Origin._db), 0)
+            milk = resolved['milk']
+            self.assertIn('usa', milk.ghg)
+            self.assertEqual(len(Origin._db), 0)
+            value = milk.ghg_value('usa', GHGFlavor.MEDIAN)
+            self.assertEqual(list(milk.ghg.tables.tables._data), ['usa'])
+            self.assertIn('usa', Origin._db)
+            self.assertNotIn('canada', Origin._db)
+            self.assertEqual(value, Product.resolved()['milk'].ghg_value(
+                'usa', GHGFlavor.MEDIAN))
+        self.assertNotIn('nowhere', milk.ghg)
+
+    def test_resolved_immutable(self):
+        record = Product.resolved()['milk']
+        with self.assertRaises(AttributeError):
+            record.sg = 2.0
+        with self.assertRaises(TypeError):
+            record.ghg[Origin.DEFAULT] = (0, 0, 0, 0)
+        with self.assertRaises(TypeError):
+            Product.resolved()['milk'] = record
+
+    def test_stores_immutable(self):
+        for store in [Product.db(), Product.fv_db(), Reference.db(),
+                      GIN.index(), GIN.aka_index(), Trigram.product_index(),
+                      Trigram.aka_index()]:
+            with self.assertRaises(TypeError):
+                store['milk'] = None
+
+    def test_impact(self):
+        ingredient = {
+            Ingredient.QTYS: [{Ingredient.QTY: 200, Ingredient.UNIT: 'g'}],
+            Ingredient.PRODUCT: Product.get('milk', 'milk'),
+        }
+        expected = round(Product.ghg_value(
+            Product.get('milk'), Origin.DEFAULT, GHGFlavor.MEDIAN) * 200, 2)
+        self.assertEqual(Product.impact(ingredient), expected)
+        self.assertEqual(ingredient[Product.MASS], 200)
+
+    def test_baselines_artifact(self):
+        # the shipped artifact must be current, and match a live computation
+        artifact = Product.baselines_artifact()
+        self.assertTrue(artifact)
+        self.assertEqual(artifact['baselines'], json.loads(
+            json.dumps(Product.compute_efficiency_baselines())))
+        with patch.object(Product, '_baselines_artifact', {}):
+            with patch.object(Product, '_baselines', artifact['baselines']):
+                for origin in Origin.ORIGINS:
+                    for name in ['milk', 'chicken stock', 'salt', 'apple juice']:
+                        self.assertEqual(
+                            artifact['efficiency_ratios'][origin][name],
+                            Product.ghg_efficiency_ratio(Product.get(name), origin))
+
+    def test_stale_baselines_artifact(self):
+        with patch.object(Product, '_baselines_artifact', None):
+            with patch('ghgi.product.file_digest', return_value='stale'):
+                self.assertEqual(Product.baselines_artifact(), {})
+
     def test_labels(self):
         pass
@@ -0,0 +1,48 @@
+from unittest import TestCase
+from ghgi.parser import Parser
+from ghgi.product import Product
+from ghgi.origin import GHGFlavor, UnknownOriginException
+from ghgi.recipe import Scorer, score_recipe, score_recipes, STAGES
+from .fixtures.parser import AMOUNTS_DATA
+
+RECIPE = [entry[0] for entry in AMOUNTS_DATA[:8]] + [
+    'Equipment:', 'a large skillet', 'For the filling:', '2 cups whole milk',
+] + [entry[0] for entry in AMOUNTS_DATA[:2]]
+
+
+class TestRecipe(TestCase):
+    def test_score_recipe(self):
+        # scores must match the hand-assembled parse/itemize/impact pipeline
+        score = score_recipe(RECIPE)
+        self.assertEqual(len(score.ingredients), len(RECIPE))
+        self.assertEqual(list(score.timings), STAGES)
+
+        disregard_active = False
+        total = 0.0
+        for line, ingredient_score in zip(RECIPE, score.ingredients):
+            ingredient, disregard_active = Parser.parse(line, disregard_active)
+            Product.itemize([ingredient])
+            impact = Product.impact(ingredient)
+            self.assertEqual(ingredient_score.impacts[GHGFlavor.MEDIAN], impact or None)
+            total += impact or 0.0
+        self.assertAlmostEqual(score.total(), total)
+        self.assertIsNone(score.ingredients[9].product)
+
+    def test_duplicates(self):
+        scorer = Scorer(flavors=[GHGFlavor.MEDIAN])
+        first, second = [scorer.score(RECIPE) for _ in range(2)]
+        self.assertEqual(first.totals, second.totals)
+        self.assertEqual(list(first.totals), [GHGFlavor.MEDIAN])
+        # 10 lines are parsed per pass, 8 of them distinct
+        self.assertEqual(scorer.stats['parses'], 8)
+        self.assertEqual(scorer.stats['parse_hits'], 2 + 10)
+
+    def test_disregarded(self):
+        # header lines and the lines they disregard don't need parsing
+        scores = list(score_recipes([['Equipment:', 'a large skillet'], []]))
+        self.assertEqual(len(scores), 2)
+        for score in scores:
+            self.assertEqual(set(score.totals.values()), {0.0})
+            for ingredient in score.ingredients:
+                self.assertEqual(ingredient.ingredient, {})
+        self.assertRaises(UnknownOriginException, score_recipe, [], 'atlantis')
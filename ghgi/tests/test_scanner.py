@@ -0,0 +1,66 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from ghgi.gin import GIN, SCANNER, GIN_ENGINE
+from ghgi.scanner import AliasScanner
+from .fixtures.gin import QUERIES
+
+AKA_INDEX = {
+    'tomato': ['tomatoes', 1],
+    'tomatoes': ['tomatoes', 2],
+    'cherry tomato': ['tomatoes', 3],
+    'sun dried tomato': ['tomatoes', 4],
+    'dried tomato': ['tomatoes', 5],
+    'white': ['eggs', 6],
+    'bay leaf': ['bay leaves', 7],
+    'bay': ['bay leaves', 8],
+}
+
+
+class TestScanner(TestCase):
+    def tearDown(self):
+        GIN.use_engine(GIN_ENGINE)
+
+    def test_scan(self):
+        scanner = AliasScanner(AKA_INDEX, GIN)
+        stems = GIN.stem(GIN.lower(GIN.tokenize('sun dried cherry tomatoes')))
+        # every occurrence, with the first alias of each sequence of stems
+        self.assertEqual(scanner.scan(stems), [
+            (2, 4, 'cherry tomato'), (3, 4, 'tomato')])
+        stems = GIN.stem(GIN.lower(GIN.tokenize('sun dried tomatoes')))
+        self.assertEqual(scanner.scan(stems), [
+            (0, 3, 'sun dried tomato'), (1, 3, 'dried tomato'), (2, 3, 'tomato')])
+        self.assertEqual(scanner.scan(GIN.stem(['tomato', 'sun', 'dried'])),
+                         [(0, 1, 'tomato')])
+
+    def test_match(self):
+        scanner = AliasScanner(AKA_INDEX, GIN)
+        with patch.object(GIN, 'aka_index', return_value=AKA_INDEX), \
+                patch.object(GIN, 'pos_tag', side_effect=lambda tokens: [
+                    (token, 'NN') for token in tokens]):
+            def match(term):
+                return scanner.match(GIN.tokenize(term), GIN)[:3]
+
+            self.assertEqual(match('sun dried tomatoes'),
+                             ('sun dried tomato', ['tomatoes', 4], 1.0))
+            self.assertEqual(match('sun dried tomatoes or cherry tomatoes'),
+                             ('sun dried tomato', ['tomatoes', 4], 1.0))
+            self.assertEqual(match('2 cherry tomatoes, halved')[:2],
+                             ('cherry tomato', ['tomatoes', 3]))
+            # NO_SOLO words don't match alone, and MUST_MATCH words must match
+            self.assertEqual(match('white'), (None, None, 0.0))
+            self.assertEqual(match('white wine'), (None, None, 0.0))
+            self.assertEqual(match('bay leaf')[0], 'bay leaf')
+            self.assertEqual(match('bay and a leaf'), (None, None, 0.0))
+
+    def test_engine(self):
+        with self.assertRaises(ValueError):
+            GIN.use_engine('other')
+        cache = GIN.query_cache()
+        cache.put('cherry tomatoes', ('tomato', ('tomatoes', 11), 0.5, 1, 2))
+        GIN.use_engine(SCANNER)
+        # results of the other engine are dropped
+        self.assertIsNone(cache.get('cherry tomatoes'))
+        self.assertIs(GIN.scanner(), GIN.scanner())
+        for q, result in QUERIES:
+            self.assertEqual(GIN.frozen(GIN.query(q)), GIN.frozen(result))
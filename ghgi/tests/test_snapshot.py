@@ -0,0 +1,65 @@
+from unittest import TestCase
+from unittest.mock import patch
+import os
+import tempfile
+
+import ghgi
+from ghgi import database
+from ghgi.snapshot import SnapshotException, write_snapshot, warm
+from ghgi.product import Product
+from ghgi.origin import Origin, GHGFlavor
+from ghgi.reference import Reference
+from ghgi.gin import GIN
+from ghgi.trigram import Trigram
+
+
+class TestSnapshot(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'snapshot.pickle')
+        write_snapshot(self.path)
+
+    def tearDown(self):
+        database.use(database.JSON)
+        self.directory.cleanup()
+
+    def test_warm(self):
+        resolved = dict(Product.resolved())
+        baselines = Product.efficiency_baselines()
+        alias_masks = GIN.alias_masks()
+        stems = GIN.stems()
+        origin = Origin.load(Origin.DEFAULT)
+        database.use(database.JSON)
+
+        generation = warm(self.path)
+        self.assertEqual(generation.version, ghgi.VERSION)
+        self.assertEqual(dict(Product.resolved()), resolved)
+        self.assertEqual(Product.efficiency_baselines(), baselines)
+        self.assertEqual(GIN.alias_masks(), alias_masks)
+        self.assertEqual(GIN.stems(), stems)
+        self.assertIs(GIN.stems(), generation.stores[(GIN, '_stems')])
+        self.assertEqual(Origin.load(Origin.DEFAULT), origin)
+        self.assertEqual(Product.graph().order, list(resolved))
+        self.assertTrue(Reference.db())
+        self.assertTrue(Trigram.product_index())
+        self.assertEqual(Product.ghg_value(
+            Product.db()['milk'], Origin.DEFAULT, GHGFlavor.MEAN),
+            resolved['milk'].ghg_value(Origin.DEFAULT, GHGFlavor.MEAN))
+
+    def test_stale(self):
+        with patch('ghgi.snapshot.VERSION', 'other'):
+            with self.assertRaises(SnapshotException):
+                warm(self.path)
+        with patch('ghgi.snapshot.FORMAT', 0):
+            with self.assertRaises(SnapshotException):
+                warm(self.path)
+        with patch('ghgi.snapshot.file_digest', return_value='other'):
+            with self.assertRaises(SnapshotException):
+                warm(self.path)
+            warm(self.path, verify=False)
+        with self.assertRaises(SnapshotException):
+            warm(os.path.join(self.directory.name, 'missing.pickle'))
+
+    def test_master(self):
+        # the generated snapshot matches the datasets
+        ghgi.warm()
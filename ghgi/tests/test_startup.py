@@ -0,0 +1,32 @@
+from unittest import TestCase
+import sys
+import subprocess
+from ghgi.benchmark import import_time
+
+# the most `import ghgi.parser` may take, in ms; importing nltk alone takes
+# longer than this
+IMPORT_BUDGET_MS = 250
+
+
+class TestStartup(TestCase):
+    def test_lazy_imports(self):
+        # nltk is only imported once a tokenizer, tagger, or stemmer needs it
+        for module in ['ghgi.parser', 'ghgi.recipe', 'ghgi.pool']:
+            result = subprocess.run(
+                [sys.executable, '-c',
+                 'import sys, {}; print("nltk" in sys.modules)'.format(module)],
+                capture_output=True, text=True, check=True)
+            self.assertEqual(result.stdout.strip(), 'False', module)
+
+    def test_lazy_origins(self):
+        # the origin manifest is only read once an origin is needed
+        result = subprocess.run(
+            [sys.executable, '-c',
+             'import ghgi.parser; from ghgi.origin import Origin; '
+             'print(Origin._registry is None)'],
+            capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), 'True')
+
+    def test_import_budget(self):
+        total_ms = min(import_time()['total_us'] for _ in range(3)) / 1000
+        self.assertLess(total_ms, IMPORT_BUDGET_MS)
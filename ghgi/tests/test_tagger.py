@@ -0,0 +1,71 @@
+from unittest import TestCase
+from unittest.mock import patch
+from ghgi.tagger import Tagger, LexiconTagger, NltkTagger
+
+
+class ConstantTagger(Tagger):
+    """ Tags every token 'NN', counting its calls """
+
+    def __init__(self):
+        self.calls = 0
+
+    def tag(self, tokens):
+        self.calls += 1
+        return [(token, 'NN') for token in tokens]
+
+
+class TestTagger(TestCase):
+    def test_lexicon(self):
+        fallback = ConstantTagger()
+        tagger = LexiconTagger(
+            lexicon={'or': 'CC', '(': '(', '2': 'CD'}, fallback=fallback, memo_size=2)
+        self.assertEqual(tagger.tag(['2', 'or', '(']),
+                         [('2', 'CD'), ('or', 'CC'), ('(', '(')])
+        self.assertEqual(fallback.calls, 0)
+
+        # any unknown token sends the whole list to the fallback, once
+        self.assertEqual(tagger.tag(['2', 'eggs']), [('2', 'NN'), ('eggs', 'NN')])
+        self.assertEqual(tagger.tag(('2', 'eggs')), [('2', 'NN'), ('eggs', 'NN')])
+        self.assertEqual(fallback.calls, 1)
+        self.assertEqual(tagger.tag_sents([['eggs'], ['or']]),
+                         [[('eggs', 'NN')], [('or', 'CC')]])
+        self.assertEqual(fallback.calls, 2)
+
+        # the memo is bounded, evicting the least recently used lists
+        tagger.tag(['salt'])
+        tagger.tag(['2', 'eggs'])
+        self.assertEqual(fallback.calls, 4)
+        self.assertEqual(list(tagger.memo), [('salt',), ('2', 'eggs')])
+
+        self.assertEqual(dict(tagger.stats),
+                         {'calls': 7, 'lexicon': 2, 'memo': 1, 'fallback': 4})
+        self.assertAlmostEqual(tagger.hit_rate(), 3/7)
+
+    def test_memo_is_immutable(self):
+        tagger = LexiconTagger(lexicon={}, fallback=ConstantTagger())
+        tagger.tag(['salt'])[0] = ('salt', 'VB')
+        self.assertEqual(tagger.tag(['salt']), [('salt', 'NN')])
+
+    def test_missing_lexicon(self):
+        # without a generated lexicon, the perceptron's tag dictionary is used
+        perceptron = ConstantTagger()
+        perceptron.tagdict = {'or': 'CC'}
+        with patch.object(LexiconTagger, '_lexicon', None), \
+                patch.object(NltkTagger, '_perceptron', perceptron):
+            self.assertEqual(LexiconTagger.load('missing.json'), {'or': 'CC'})
+
+        # or nothing, if the perceptron isn't installed either
+        with patch.object(LexiconTagger, '_lexicon', None), \
+                patch.object(NltkTagger, 'perceptron', side_effect=LookupError):
+            with self.assertLogs(level='WARNING'):
+                self.assertEqual(LexiconTagger.load('missing.json'), {})
+
+    def test_use(self):
+        active = Tagger.active()
+        try:
+            self.assertIsInstance(Tagger.use('nltk'), NltkTagger)
+            self.assertIsInstance(Tagger.use('lexicon'), LexiconTagger)
+            self.assertIs(Tagger.active(), Tagger._active)
+            self.assertRaises(ValueError, Tagger.use, 'not-a-tagger')
+        finally:
+            Tagger._active = active
@@ -0,0 +1,119 @@
+from unittest import TestCase
+from unittest.mock import patch
+import json
+import random
+import threading
+import time
+
+from ghgi import database
+from ghgi.lazy import load_once
+from ghgi.cache import Cache, LRU, LFU
+from ghgi.product import Product
+from ghgi.origin import Origin
+from ghgi.reference import Reference
+from ghgi.gin import GIN
+from ghgi.trigram import Trigram
+
+THREADS = 16
+
+
+def run_threads(target, threads=THREADS):
+    """ Return the results of calling `target` from `threads` threads at once """
+    barrier = threading.Barrier(threads)
+    results = [None] * threads
+    errors = []
+
+    def run(i):
+        barrier.wait()
+        try:
+            results[i] = target()
+        except Exception as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    if errors:
+        raise errors[0]
+    return results
+
+
+class Store:
+    _data = {}
+
+
+class TestThreads(TestCase):
+    def tearDown(self):
+        database.use(database.JSON)
+
+    def test_load_once(self):
+        calls = []
+
+        def load():
+            calls.append(1)
+            time.sleep(0.01)  # so every thread arrives while it's loading
+            return {'loaded': True}
+
+        results = run_threads(lambda: load_once(Store, '_data', load))
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertIs(Store._data, results[0])
+
+    def test_stores(self):
+        load = json.load
+        loaded = []
+
+        def counted(f, *args, **kwargs):
+            loaded.append(f.name)
+            return load(f, *args, **kwargs)
+
+        def first_request():
+            db = Product.db()
+            # the derived tables are always in place with the database
+            self.assertEqual(list(Product.resolved()), Product.graph().order)
+            self.assertEqual(set(Product.resolved()), set(db))
+            return (db, Product.resolved(), Product.fv_db(),
+                    Product.efficiency_baselines(), Reference.db(),
+                    Origin.flattened(Origin.DEFAULT), GIN.index(),
+                    GIN.alias_masks(), GIN.stem_ids(),
+                    Trigram.product_index(), Trigram.aka_index())
+
+        for _ in range(3):
+            database.use(database.JSON)
+            Product._fvdb = {}
+            Product._baselines = {}
+            Product._baselines_artifact = None
+            loaded.clear()
+            with patch('json.load', side_effect=counted):
+                results = run_threads(first_request)
+            # every file was loaded once, and every thread got the same stores
+            self.assertEqual(len(loaded), len(set(loaded)))
+            for result in results:
+                for store, expected in zip(result, results[0]):
+                    self.assertIs(store, expected)
+            self.assertEqual(Trigram.match('whole milk')[0][0], 'milk')
+
+    def test_cache(self):
+        for policy in [LRU, LFU]:
+            cache = Cache(50, policy, weigh=len)
+
+            def churn():
+                rng = random.Random(threading.get_ident())
+                for _ in range(2000):
+                    key = rng.randrange(100)
+                    if rng.random() < 0.5:
+                        cache.put(key, 'x' * rng.randrange(1, 5))
+                    else:
+                        cache.memoize(key, lambda: 'y')
+                return True
+
+            self.assertTrue(all(run_threads(churn, threads=8)))
+            self.assertEqual(set(cache._data), set(cache._weights))
+            self.assertEqual(cache.size, sum(cache._weights.values()))
+            self.assertLessEqual(cache.size, 50)
+            if policy == LFU:
+                self.assertEqual(
+                    {key for bucket in cache._buckets.values() for key in bucket},
+                    set(cache._data))
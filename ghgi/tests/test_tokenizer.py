@@ -0,0 +1,58 @@
+from unittest import TestCase
+from ghgi.gin import GIN
+from ghgi.parser import Parser
+from ghgi.tokenizer import Tokenizer, NltkTokenizer, FastTokenizer, divergences
+from .fixtures import parser as parser_fixtures
+from .fixtures.gin import QUERIES
+
+CORPORA = ['AMOUNTS_DATA', 'PARENS_DATA', 'REGEX_UNITS_DATA',
+           'SLASH_DATA', 'VULGAR_DATA', 'CLEAN_DATA']
+
+
+def corpus():
+    """ The parser and GIN fixture texts, both raw and as preprocessed by the
+    parser, and every alias in the aka index.
+    """
+    texts = [q for q, _ in QUERIES]
+    for name in CORPORA:
+        for entry in getattr(parser_fixtures, name):
+            texts += [entry[0] if isinstance(entry, tuple) else entry]
+    texts += [t for t in (Parser.preprocess(t)[0] for t in texts) if t]
+    return texts + list(GIN.aka_index())
+
+
+class TestTokenizer(TestCase):
+    def test_parity(self):
+        found = divergences(corpus(), NltkTokenizer(), FastTokenizer())
+        self.assertEqual(found, [], '\n'.join(
+            '{!r}\n  nltk: {}\n  fast: {}'.format(*d) for d in found))
+
+    def test_fast(self):
+        tokenizer = FastTokenizer()
+        self.assertEqual(
+            tokenizer.tokenize('1 (14.5-oz.) can tomatoes, drained.'),
+            ['1', '(', '14.5-oz', '.', ')', 'can', 'tomatoes', ',', 'drained', '.'])
+        self.assertEqual(
+            tokenizer.tokenize('1 1/2 cups confectioners\' sugar, 1,000 g'),
+            ['1', '1/2', 'cups', 'confectioners', "'", 'sugar', ',', '1,000', 'g'])
+        self.assertEqual(
+            tokenizer.tokenize('salmon (5 oz. each) -- "wild"'),
+            ['salmon', '(', '5', 'oz', '.', 'each', ')', '--', '``', 'wild', "''"])
+        # sentences end after abbreviations followed by words that usually
+        # start them, or by a token that ends one itself
+        self.assertEqual(tokenizer.tokenize('U.S. Mix.'), ['U.S', '.', 'Mix', '.'])
+        self.assertEqual(tokenizer.tokenize('St. (14.5-oz.)'),
+                         ['St', '.', '(', '14.5-oz', '.', ')'])
+        self.assertEqual(tokenizer.tokenize('1 lb. St. Louis ribs.'),
+                         ['1', 'lb', '.', 'St.', 'Louis', 'ribs', '.'])
+        self.assertEqual(tokenizer.tokenize('Add 1 c. Sugar.'),
+                         ['Add', '1', 'c.', 'Sugar', '.'])
+
+    def test_use(self):
+        active = Tokenizer.active()
+        try:
+            self.assertIsInstance(Tokenizer.use('fast'), FastTokenizer)
+            self.assertEqual(Parser.tokenize('2 c. flour'), ['2', 'c.', 'flour'])
+            self.assertRaises(ValueError, Tokenizer.use, 'not-a-tokenizer')
+        finally:
+            Tokenizer._active = active
@@ -1,7 +1,13 @@
-from unittest import TestCase
+from unittest import TestCase, skipIf
+from unittest.mock import patch
 import json
 from io import StringIO
-from ghgi.trigram import Trigram, build_indexes
+from ghgi.trigram import Trigram, TrigramIndex, CompactTrigramIndex, build_indexes
+try:
+    import numpy as np
+    from ghgi import sparse
+except ImportError:
+    np = None
 
 class TestTrigram(TestCase):
     def test_trigrams(self):
@@ -73,3 +79,76 @@ class TestTrigram(TestCase):
         self.assertEqual(match[0], ('test', 'alpha', 1.0))
         self.assertEqual(match[1], ('test2', 'alpha2', 0.75))
         self.assertEqual(Trigram.match('none'), [])
+
+    def test_top(self):
+        products = {
+            'test': {'names': ['alpha', 'beta', 'theta', 'zeta']},
+            'test2': {'names': ['alpha2', 'theta2', 'eta']},
+        }
+        aka_index, trigram_product_index = build_indexes(
+            StringIO(json.dumps(products)))
+        Trigram._aka_index = aka_index
+        Trigram._product_index = trigram_product_index
+        Trigram._index = None
+        try:
+            # counting every candidate, and pruning them, find the same matches
+            for scan in [TrigramIndex.SCAN_POSTINGS, 0]:
+                with patch.object(TrigramIndex, 'SCAN_POSTINGS', scan):
+                    # ties are broken by the first shared trigram in the term
+                    self.assertEqual(Trigram.match('theta alpha', k=4), [
+                        ('test', 'theta', 1 / 3), ('test', 'alpha', 1 / 3),
+                        ('test2', 'theta2', 0.3), ('test2', 'alpha2', 0.3)])
+                    # and then by alias
+                    self.assertEqual(Trigram.match('eta', k=3), [
+                        ('test2', 'eta', 1.0), ('test', 'beta', 0.5),
+                        ('test', 'zeta', 0.5)])
+                    self.assertEqual(
+                        [alias for _, alias, _ in Trigram.match('eta', k=10)],
+                        ['eta', 'beta', 'zeta', 'theta', 'theta2'])
+                    self.assertEqual(
+                        Trigram.match('beta zeta', min_score=0.3), [
+                            ('test', 'beta', 0.5), ('test', 'zeta', 0.5),
+                            ('test2', 'eta', 1 / 3)])
+                    self.assertEqual(Trigram.match('beta', k=0), [])
+                    self.assertEqual(Trigram.match('beta', min_score=1.1), [])
+            # the index is recompiled when the indexes are replaced
+            index = Trigram.index()
+            Trigram._aka_index = dict(aka_index)
+            self.assertIsNot(Trigram.index(), index)
+        finally:
+            Trigram.load_json()
+
+    def test_compact(self):
+        # matching in place over the compact index finds the same matches
+        Trigram.load_json()
+        terms = ['olive oil', 'parmesan', 'chicken stock', 'Granny Smith apples',
+                 'ground ground beef', 'zz', '']
+        expected = [Trigram.match(term, k=10) for term in terms]
+        Trigram.load_compact()
+        try:
+            self.assertIsInstance(Trigram.index(), CompactTrigramIndex)
+            for scan in [TrigramIndex.SCAN_POSTINGS, 0]:
+                with patch.object(TrigramIndex, 'SCAN_POSTINGS', scan):
+                    self.assertEqual(
+                        [Trigram.match(term, k=10) for term in terms], expected)
+        finally:
+            Trigram.load_json()
+
+    @skipIf(np is None, 'numpy is not installed')
+    def test_match_many(self):
+        Trigram.load_json()
+        terms = ['whole milk', 'theta alpha', 'eta', 'Granny Smith apples',
+                 'chopped fresh basil', 'nothing like it', 'zz', '',
+                 'ground ground beef']
+        for k, min_score in [(5, 0.0), (1, 0.0), (3, 0.4), (0, 0.0)]:
+            expected = [Trigram.match(term, k, min_score) for term in terms]
+            # with SciPy's product (if installed), NumPy's, and in blocks
+            for sp in {sparse.sp, None}:
+                for block in [sparse.TrigramMatrix.BLOCK, 1]:
+                    with patch.object(sparse, 'sp', sp), \
+                            patch.object(sparse.TrigramMatrix, 'BLOCK', block):
+                        self.assertEqual(
+                            Trigram.match_many(terms, k, min_score), expected)
+        self.assertEqual(Trigram.match_many([]), [])
+        self.assertEqual(Trigram.match_many(['whole milk'])[0][0][0], 'milk')
+        self.assertIs(Trigram.index().matrix(), Trigram.index().matrix())
@@ -0,0 +1,357 @@
+#!/usr/bin/env python
+""" Word tokenizer backends for ingredient text.
+
+`NltkTokenizer` is the reference backend: nltk's `word_tokenize`, which splits
+its input into sentences with the Punkt model and then runs the (improved)
+Treebank word tokenizer's stack of regexes over every sentence.
+
+Ingredient lines are short and rarely contain more than one sentence, so
+`FastTokenizer` produces the same tokens with a single regex scan per line,
+only applying Punkt's sentence boundary rules to lines containing a period,
+question mark, or exclamation mark followed by more text. The few of those
+rules that depend on how a word is used in Punkt's training corpus (e.g.
+whether 'Mix' in 'U.S. Mix' starts a sentence) read nltk's model, which is
+only loaded when a line needs it.
+
+`Parser.tokenize` and `GIN.tokenize` use the active backend, which can be
+selected with `Tokenizer.use` or the GHGI_TOKENIZER environment variable.
+`divergences` reports where two backends disagree over a corpus of text.
+"""
+import os
+import re
+from typing import NamedTuple
+try:
+    from .lazy import cached_classproperty, load_once, assigned
+    from .persistent import PersistentCache
+except:
+    from lazy import cached_classproperty, load_once, assigned
+    from persistent import PersistentCache
+
+DEFAULT_TOKENIZER = 'nltk'
+
+# the abbreviations of nltk's english Punkt model, which don't end sentences
+PUNKT_ABBREVIATIONS = frozenset([
+    'a.a', 'a.c', 'a.d', 'a.g', 'a.h', 'a.m', 'a.m.e', 'a.s', 'a.t', 'adm',
+    'ala', 'ariz', 'aug', 'ave', 'b.f', 'b.v', 'bros', 'c', 'c.i.t',
+    'c.o.m.b', 'c.v', 'calif', 'chg', 'cie', 'co', 'col', 'colo', 'conn',
+    'corp', 'cos', 'ct', 'd', 'd.c', 'd.h', 'd.w', 'dec', 'dr', 'e', 'e.f',
+    'e.h', 'e.l', 'e.m', 'f', 'f.g', 'f.j', 'feb', 'fla', 'fri', 'ft', 'g',
+    'g.d', 'g.f', 'g.k', 'ga', 'gen', 'h', 'h.c', 'h.f', 'h.m', 'i.m.s',
+    'ill', 'inc', 'j.b', 'j.c', 'j.j', 'j.k', 'j.p', 'j.r', 'jan', 'jr',
+    'k', 'kan', 'ky', 'l', 'l.a', 'l.f', 'l.p', 'lt', 'ltd', 'm', 'm.b.a',
+    'm.d.c', 'm.j', 'maj', 'messrs', 'mg', 'mich', 'minn', 'mr', 'mrs',
+    'ms', 'n', 'n.c', 'n.d', 'n.h', 'n.j', 'n.m', 'n.v', 'n.y', 'nev',
+    'nov', 'oct', 'ok', 'okla', 'ore', 'p', 'p.a.m', 'p.m', 'pa', 'ph.d',
+    'prof', 'r', 'r.a', 'r.h', 'r.i', 'r.j', 'r.k', 'r.t', 'rep', 'reps',
+    's', 's.a', 's.a.y', 's.c', 's.g', 's.p.a', 's.s', 'sen', 'sep', 'sept',
+    'sr', 'st', 'sw', 't', 't.j', 'tenn', 'tues', 'u.k', 'u.n', 'u.s',
+    'u.s.a', 'u.s.s.r', 'v', 'va', 'vs', 'vt', 'w', 'w.c', 'w.r', 'w.va',
+    'w.w', 'wash', 'wed', 'wis', 'yr',
+])
+
+# the model's (type, next type) pairs whose period isn't a sentence break
+PUNKT_COLLOCATIONS = frozenset([
+    ('##number##', 'abreast'), ('##number##', 'aes'),
+    ('##number##', 'business'), ('##number##', 'cbot'),
+    ('##number##', 'colgate'), ('##number##', 'commodities'),
+    ('##number##', 'cooper'), ('##number##', 'corrections'),
+    ('##number##', 'credit'), ('##number##', 'dividend'),
+    ('##number##', 'financing'), ('##number##', 'genentech'),
+    ('##number##', 'henley'), ('##number##', 'insider'),
+    ('##number##', 'international'), ('##number##', 'leisure'),
+    ('##number##', 'letters'), ('##number##', 'notable'),
+    ('##number##', 'pay-fone'), ('##number##', 'pegasus'),
+    ('##number##', 'pepper'), ('##number##', 'review'), ('##number##', 'rj'),
+    ('##number##', 'wedgestone'), ('##number##', 'who'),
+    ('##number##', 'zimmer'), ('b', 'edelman'), ('b', 'levine'),
+    ('b', 'smith'), ('b', 'stewart'), ('b', 'wigton'), ('i', 'magnin'),
+    ('i', 'toussie'), ('j', 'aron'), ('j', 'fialka'), ('j', 'walter'),
+    ('o', 'ludcke'),
+])
+
+
+class Tokenizer:
+    """ A word tokenizer backend """
+    name = None
+    BACKENDS = {}
+    _active = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.name:
+            Tokenizer.BACKENDS[cls.name] = cls
+
+    def tokenize(self, text: str) -> list:
+        raise NotImplementedError
+
+    @classmethod
+    def active(cls) -> 'Tokenizer':
+        """ Return the backend used by the parser and GIN index """
+        return load_once(
+            Tokenizer, '_active',
+            lambda: Tokenizer.use(os.environ.get('GHGI_TOKENIZER', DEFAULT_TOKENIZER)),
+            loaded=assigned)
+
+    @classmethod
+    def use(cls, name: str) -> 'Tokenizer':
+        """ Make the backend registered as `name` the active one """
+        if name not in Tokenizer.BACKENDS:
+            raise ValueError('Unknown tokenizer {}, expected one of {}'.format(
+                name, sorted(Tokenizer.BACKENDS)))
+        Tokenizer._active = Tokenizer.BACKENDS[name]()
+        cache = PersistentCache.active()
+        if cache is not None:
+            cache.rehash()
+        return Tokenizer._active
+
+
+class NltkTokenizer(Tokenizer):
+    """ nltk.word_tokenize """
+    name = 'nltk'
+
+    def tokenize(self, text: str) -> list:
+        import nltk  # slow to import, so only when it's first needed
+        return nltk.word_tokenize(text)
+
+
+class FastTokenizer(Tokenizer):
+    """ A single pass regex tokenizer that reproduces nltk.word_tokenize on
+    ingredient text: numbers, fractions, decimals, and hyphenated ranges and
+    units (e.g. `1/2`, `1.5`, `6-ounce`) stay whole, while parentheticals,
+    commas, and the final period are split off.
+    """
+    name = 'fast'
+
+    # (the biggest regexes are only compiled when first used)
+    @cached_classproperty
+    def TOKEN(cls):
+        return re.compile(r'''
+            --                                  # double dash
+          | \.{2,}                              # ellipsis
+          | `+ | [«“‘„»”’] | '' | "             # quotes
+          | [()\[\]{}<>;@\#$%&?!*]              # always split
+          | [,:](?!\d)                          # split unless followed by a digit
+          | (?: [^\s()\[\]{}<>;@\#$%&?!*,:."'`«“‘„»”’-]
+              | [,:](?=\d) | \.(?!\.) | -(?!-) | '(?!')
+            )+
+        ''', re.VERBOSE)
+
+    # Treebank splits the last period of a sentence off its word
+    FINAL_PERIOD = re.compile(r'([^.])(\.)([\])}>"\'»”’ ]*)\s*$')
+
+    # clitics split off the end of words (in Treebank's order of precedence)
+    @cached_classproperty
+    def CLITICS(cls):
+        return [
+            re.compile(r"^(.*[^' ])('[sS]|'[mM]|'[dD]|')$"),
+            re.compile(r"^(.*[^' ])('ll|'LL|'re|'RE|'ve|'VE|n't|N'T)$"),
+        ]
+
+    @cached_classproperty
+    def CONTRACTIONS(cls):
+        return [re.compile(p) for p in [
+            r"(?i)\b(can)(not)\b", r"(?i)\b(d)('ye)\b", r"(?i)\b(gim)(me)\b",
+            r"(?i)\b(gon)(na)\b", r"(?i)\b(got)(ta)\b", r"(?i)\b(lem)(me)\b",
+            r"(?i)\b(more)('n)\b", r"(?i)\b(wan)(na)$", r"(?i)^('t)(is)\b",
+            r"(?i)^('t)(was)\b",
+        ]]
+
+    CONTRACTION = re.compile(r"(?i)cannot|'ye|gimme|gonna|gotta|lemme|more'n|wanna|'tis|'twas")
+
+    # Punkt's candidate sentence ends, and the punctuation or token after them
+    SENTENCE_END = re.compile(
+        r'[.?!](?=(?P<after>[)";}\]*:@\'({\[?!]|\s+(?P<next>\S+)))')
+    LAST_SPACE = re.compile(r'\s\S*\Z')
+    # Punkt's word tokens, which only split punctuation other than periods off
+    PUNKT_TOKEN = re.compile(r'''
+        (?:-{2,}|\.{2,}|(?:\.\s){2,}\.)
+      | (?=[^("`{\[:;&\#*@)}\]\-,])\S+?
+        (?=\s|$|[)";}\]*:@'({\[?!]|-{2,}|\.{2,}|(?:\.\s){2,}\.
+           |,(?=$|\s|[)";}\]*:@'({\[?!]|-{2,}|\.{2,}|(?:\.\s){2,}\.))
+      | \S
+    ''', re.VERBOSE)
+    PUNKT_NUMBER = re.compile(r'^-?[.,]?\d[\d,.-]*\.?$')
+    PUNKT_INITIAL = re.compile(r'[^\W\d]\.$')
+    PUNKT_ELLIPSIS = re.compile(r'\.\.+$')
+    PUNKT_PUNCTUATION = tuple(';:,.!?')
+    REALIGN = re.compile(r'["\')\]}]+?(?:\s+|(?=--)|$)')
+
+    # the orthographic context flags of Punkt's model
+    ORTHO_BEG_UC, ORTHO_MID_UC, ORTHO_UNK_UC = 1 << 1, 1 << 2, 1 << 3
+    ORTHO_BEG_LC, ORTHO_MID_LC, ORTHO_UNK_LC = 1 << 4, 1 << 5, 1 << 6
+    ORTHO_UC = ORTHO_BEG_UC | ORTHO_MID_UC | ORTHO_UNK_UC
+    ORTHO_LC = ORTHO_BEG_LC | ORTHO_MID_LC | ORTHO_UNK_LC
+
+    @cached_classproperty
+    def PUNKT(cls):
+        """ The parameters of nltk's english Punkt model, for the few breaks
+        that depend on how the word after them is used in its training corpus
+        """
+        import nltk  # slow to import, so only when it's first needed
+        return nltk.data.load('tokenizers/punkt/english.pickle')._params
+
+    def tokenize(self, text: str) -> list:
+        tokens = []
+        for sentence in self.sentences(text):
+            tokens += self.words(sentence)
+        return tokens
+
+    def words(self, sentence: str) -> list:
+        """ Tokenize a single sentence, like Treebank """
+        sentence = self.FINAL_PERIOD.sub(r'\1 \2\3', sentence)
+        tokens = []
+        for match in self.TOKEN.finditer(sentence):
+            token = match.group()
+            if token == '"' or token == "''":
+                start = match.start()
+                opening = not start or sentence[start-1] in ' ([{<'
+                tokens += ['``' if opening else "''"]
+            elif "'" in token:
+                tokens += self.clitics(token)
+            else:
+                tokens += [token]
+        if self.CONTRACTION.search(sentence):
+            tokens = [part for token in tokens
+                      for part in self.contractions(token)]
+        return tokens
+
+    def clitics(self, word: str) -> list:
+        quote = []
+        if word[-2:-1] not in ("'", ''):
+            if word[-1] == "'":
+                word, quote = word[:-1], ["'"]
+        for clitic in self.CLITICS:
+            match = clitic.match(word)
+            if match:
+                return [match.group(1), match.group(2)] + quote
+        return [word] + quote
+
+    def contractions(self, word: str) -> list:
+        for contraction in self.CONTRACTIONS:
+            word = contraction.sub(r' \1 \2 ', word)
+        return word.split()
+
+    def sentences(self, text: str) -> list:
+        """ Split `text` where Punkt would split it into sentences """
+        if '.' not in text and '?' not in text and '!' not in text:
+            return [text]
+        breaks = []
+        for match, context in self.contexts(text):
+            if not self.breaks(context):
+                continue
+            if match.group('next'):
+                breaks += [match.start('next')]
+            else:
+                realigned = self.REALIGN.match(text, match.end())
+                breaks += [realigned.end() if realigned else match.end()]
+        sentences = []
+        start = 0
+        for end in breaks:
+            if start < end:
+                sentences += [text[start:end]]
+            start = max(start, end)
+        return sentences + [text[start:]]
+
+    def contexts(self, text: str):
+        """ Yield each candidate sentence end in `text`, with its context: the
+        word before it, and the punctuation or token after it (as Punkt does,
+        skipping ends whose word overlaps the next one's).
+        """
+        previous, start, stop = None, 0, 0
+        for match in self.SENTENCE_END.finditer(text):
+            space = self.LAST_SPACE.search(text, stop, match.start())
+            word = space.start() + 1 if space and space.start() > 0 else start
+            if previous and stop <= word:
+                yield previous, (text[start:stop] + previous.group()
+                                 + previous.group('after'))
+            previous, start, stop = match, word, match.start()
+        if previous:
+            yield previous, (text[start:stop] + previous.group()
+                             + previous.group('after'))
+
+    def breaks(self, context: str) -> bool:
+        """ Whether Punkt finds a sentence break in `context`, i.e. any token
+        but the last one ends a sentence.
+        """
+        tokens = self.PUNKT_TOKEN.findall(context)
+        return any(self.ends(token, following)
+                   for token, following in zip(tokens, tokens[1:]))
+
+    def ends(self, token: str, following: str) -> bool:
+        """ Whether Punkt ends a sentence with `token`, followed by `following`
+        """
+        sentbreak, abbreviation, ellipsis = self.annotate(token)
+        if not token.endswith('.'):
+            return sentbreak
+        typ = self.type(token, True)
+        following_type = self.type(following, self.annotate(following)[0])
+        if (typ, following_type) in PUNKT_COLLOCATIONS:
+            return False
+        initial = self.PUNKT_INITIAL.match(token)
+        upper = following[0].isupper()
+        if (abbreviation or ellipsis) and not initial and upper:
+            # capitalized words that usually start sentences start one
+            context = self.PUNKT.ortho_context[following_type]
+            if ((context & self.ORTHO_LC and not context & self.ORTHO_MID_UC)
+                    or following_type in self.PUNKT.sent_starters):
+                return True
+        if sentbreak and (initial or typ == '##number##'):
+            # but not punctuation, words that are usually lowercase, or (after
+            # an initial) words that are never lowercase
+            if following in self.PUNKT_PUNCTUATION:
+                return False
+            lower = following[0].islower()
+            if upper or lower:
+                context = self.PUNKT.ortho_context[following_type]
+                if lower and (context & self.ORTHO_UC
+                              or not context & self.ORTHO_BEG_LC):
+                    return False
+                if initial and upper and not context & self.ORTHO_LC:
+                    return False
+        return sentbreak
+
+    def annotate(self, token: str) -> tuple:
+        """ Return whether Punkt first takes `token` to end a sentence, to be
+        an abbreviation, and to be an ellipsis, by the token alone.
+        """
+        if token in ('.', '?', '!'):
+            return True, False, False
+        if self.PUNKT_ELLIPSIS.match(token):
+            return False, False, True
+        if not token.endswith('.') or token.endswith('..'):
+            return False, False, False
+        typ = token[:-1].lower()
+        abbreviation = (typ in PUNKT_ABBREVIATIONS
+                        or typ.split('-')[-1] in PUNKT_ABBREVIATIONS)
+        return not abbreviation, abbreviation, False
+
+    def type(self, token: str, strip_period: bool) -> str:
+        """ Punkt's case (and number) normalized type of `token`, without its
+        final period if `strip_period`
+        """
+        typ = self.PUNKT_NUMBER.sub('##number##', token.lower())
+        if strip_period and len(typ) > 1 and typ[-1] == '.':
+            return typ[:-1]
+        return typ
+
+
+class Divergence(NamedTuple):
+    text: str
+    expected: list
+    actual: list
+
+
+def divergences(texts, reference: Tokenizer = None, candidate: Tokenizer = None) -> list:
+    """ Tokenize every text in `texts` with both the `reference` (by default
+    nltk) and `candidate` (by default the fast) backends, and return a
+    Divergence for each text they tokenize differently.
+    """
+    reference = reference or NltkTokenizer()
+    candidate = candidate or FastTokenizer()
+    out = []
+    for text in texts:
+        expected = reference.tokenize(text)
+        actual = candidate.tokenize(text)
+        if expected != actual:
+            out += [Divergence(text, expected, actual)]
+    return out
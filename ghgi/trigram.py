@@ -1,50 +1,124 @@
 #!/usr/bin/env python
 import json
+import heapq
+import bisect
 import collections
-from .datasets import MASTER_TRIGRAM_INDEX, MASTER_AKA_INDEX
+from array import array
+from types import MappingProxyType
+from .datasets import MASTER_TRIGRAM_INDEX, MASTER_AKA_INDEX, MASTER_COMPACT_INDEX
+from .datasets import MASTER_DATABASE
+from .compact import CompactIndex
+from .database import Database
+from .lazy import load_once, assigned, current, LOCK
 
 class Trigram:
     # TODO: make these dicts of lazily loaded sub-indexes keyed by locales
     _product_index = {}
     _aka_index = {}
+    _index = None
+    _database = None
 
     @classmethod
     def drop_indexes(cls):
         cls._product_index = {}
         cls._aka_index = {}
+        cls._index = None
+        cls._database = None
+
+    @classmethod
+    def load_compact(cls, path=MASTER_COMPACT_INDEX, index=None):
+        """ Serve the trigram and aka indexes from a compact binary index (see
+        `ghgi.compact`), memory-mapped from `path` unless an already opened
+        `CompactIndex` is provided, e.g. one attached from shared memory.
+        """
+        if index is None:
+            index = CompactIndex.open(path)
+        cls._product_index = index.trigram_index
+        cls._aka_index = index.aka_index
+        cls._index = CompactTrigramIndex(index)
+        cls._database = None
+
+    @classmethod
+    def load_sqlite(cls, path=MASTER_DATABASE, database=None):
+        """ Match with the FTS5 trigram search of the database at `path` (see
+        `ghgi.database`) unless an already opened `Database` is provided.
+        """
+        if database is None:
+            database = Database.open(path)
+        cls.drop_indexes()
+        cls._aka_index = database.aka_index
+        cls._database = database
+
+    @classmethod
+    def load_json(cls):
+        """ Match with the json indexes again (the default) """
+        cls.drop_indexes()
 
     @classmethod
     def product_index(cls):
-        if not cls._product_index:
+        def load():
             with open(MASTER_TRIGRAM_INDEX) as p:
-                cls._product_index = json.load(p)
-        return cls._product_index
+                return MappingProxyType(json.load(p))
+        return load_once(cls, '_product_index', load)
 
     @classmethod
     def aka_index(cls):
-        if not cls._aka_index:
+        def load():
             with open(MASTER_AKA_INDEX) as p:
-                cls._aka_index = json.load(p)
-        return cls._aka_index
+                return MappingProxyType(json.load(p))
+        return load_once(cls, '_aka_index', load)
+
+    @classmethod
+    def index(cls) -> 'TrigramIndex':
+        """ Return the TrigramIndex of the trigram and aka indexes, compiling
+        it when they're first used (or replaced).
+        """
+        product_index, aka_index = cls.product_index(), cls.aka_index()
+        index = current(cls, '_index')
+        if index is None or not index.compiled_from(product_index, aka_index):
+            with LOCK:
+                index = cls._index
+                if index is None or not index.compiled_from(product_index, aka_index):
+                    index = TrigramIndex(product_index, aka_index)
+                    if product_index is cls._product_index and \
+                            aka_index is cls._aka_index:
+                        cls._index = index
+        return index
 
     @classmethod
-    def match(cls, term):
-        """Return a list of matching products and match percent"""
+    def match(cls, term, k=5, min_score=0.0):
+        """ Return the (product, alias, score) of the (up to) `k` aliases most
+        similar to `term`, with scores of at least `min_score`, best first.
+
+        The score of an alias is the number of the term's trigrams that it
+        has, over the number of trigrams of either; ties are broken by the
+        position of the first such trigram in the term, and then by alias.
+        """
         termgram = cls.trigrams(term)
-        trigram_matches = collections.defaultdict(int)
-        for gram in termgram:
-            matches = cls.product_index().get(gram, [])
-            for match in matches:
-                trigram_matches[match] += 1
-        termgram_len = len(termgram)
-        for match in trigram_matches:
-            match_gram_len = cls.aka_index()[match][1]
-            trigram_matches[match] = trigram_matches[match] / \
-                (match_gram_len + termgram_len - trigram_matches[match])
-        match_list = [(cls.aka_index()[k][0], k, v)
-                      for k, v in trigram_matches.items()]
-        match_list.sort(key=lambda el: el[2], reverse=True)
-        return match_list[:5]
+        if current(cls, '_database') is not None:
+            return cls.search(termgram, k, min_score)
+        return cls.index().top(termgram, k, min_score)
+
+    @classmethod
+    def search(cls, termgram, k=5, min_score=0.0):
+        """ `match` the trigrams `termgram` against the FTS5 alias index """
+        matches = []
+        for alias, product, alias_gram_len, count, first in \
+                current(cls, '_database').trigram_candidates(termgram):
+            pct = count / (alias_gram_len + len(termgram) - count)
+            if pct >= min_score:
+                matches += [((-pct, first, alias), (product, alias, pct))]
+        return [match for _, match in heapq.nsmallest(k, matches)]
+
+    @classmethod
+    def match_many(cls, terms, k=5, min_score=0.0) -> list:
+        """ Return the `match`es of each of `terms`, computed for all of them
+        at once with sparse matrices (see `ghgi.sparse`; requires numpy).
+        """
+        termgrams = [cls.trigrams(term) for term in terms]
+        if current(cls, '_database') is not None:
+            return [cls.search(termgram, k, min_score) for termgram in termgrams]
+        return cls.index().matrix().top(termgrams, k, min_score)
 
     @staticmethod
     def trigrams(term):
@@ -52,12 +126,240 @@ class Trigram:
         term = term.strip().lower()
         if len(term) < 3:
             return [term]
-        i = 0
-        results = []
-        while i + 3 <= len(term):
-            results += [term[i:i+3]]
-            i += 1
-        return results
+        return [term[i:i+3] for i in range(len(term) - 2)]
+
+
+class TrigramIndex:
+    """ The trigram and aka indexes compiled for `Trigram.match`.
+
+    Aliases are numbered in order of their trigram count (and then name), so
+    each trigram's postings, a sorted array of alias ids, is also sorted by
+    alias length, and the aliases of any one length are a range of ids.
+    Matching then only visits the lengths, and the trigrams, that can still
+    produce one of the `k` best scores:
+
+    * the score of an alias of `n` trigrams is bounded by the most of the
+      term's trigrams it could have, so lengths are visited best bound first,
+      and matching stops at the first whose bound is below the k-th score;
+    * an alias that scores at least that needs at least some number of the
+      term's trigrams, so it must have one of the term's rarest trigrams
+      (its prefix), and only the postings of those produce candidates, which
+      are then counted against the remaining trigrams' postings.
+    """
+    SCAN_POSTINGS = 1024  # the most postings to count in full
+    SEED_LENGTHS = 2
+    _matrix = None
+
+    def __init__(self, product_index, aka_index):
+        self.sources = (product_index, aka_index)
+        entries = sorted(((entry[1], alias, entry[0])
+                          for alias, entry in aka_index.items()))
+        self.aliases = [alias for _, alias, _ in entries]
+        self.products = [product for _, _, product in entries]
+        self.lengths = array('i', [length for length, _, _ in entries])
+        ids = {alias: i for i, alias in enumerate(self.aliases)}
+        self.ranks = array('i', [0] * len(entries))  # alphabetical order
+        for rank, alias in enumerate(sorted(self.aliases)):
+            self.ranks[ids[alias]] = rank
+        self.postings = {
+            gram: array('i', sorted(ids[alias] for alias in aliases if alias in ids))
+            for gram, aliases in product_index.items()}
+        self.spans = spans(self.lengths)
+
+    def matrix(self) -> 'TrigramMatrix':
+        """ Return the (lazily built) TrigramMatrix of this index """
+        def load():
+            try:
+                from .sparse import TrigramMatrix
+            except:
+                from sparse import TrigramMatrix
+            return TrigramMatrix(self)
+        return load_once(self, '_matrix', load, loaded=assigned)
+
+    def compiled_from(self, product_index, aka_index) -> bool:
+        return self.sources[0] is product_index and self.sources[1] is aka_index
+
+    def top(self, termgram: list, k=5, min_score=0.0) -> list:
+        """ Return the (product, alias, score) of the `k` best matches of the
+        trigrams `termgram` with scores of at least `min_score` (see
+        `Trigram.match`).
+        """
+        n = len(termgram)
+        weights = {}  # {trigram: occurrences in the term}
+        firsts = {}  # {trigram: position of its first occurrence}
+        postings = {}  # {trigram: its postings}, looked up once
+        for i, gram in enumerate(termgram):
+            if gram in weights:
+                weights[gram] += 1
+            elif gram not in firsts:
+                firsts[gram] = i
+                posting = self.postings.get(gram)
+                if posting is not None:
+                    postings[gram] = posting
+                    weights[gram] = 1
+        if k <= 0 or not weights:
+            return []
+        lengths = self.lengths
+        if sum(len(postings[gram]) for gram in weights) <= self.SCAN_POSTINGS:
+            # few enough candidates to just count them all
+            counts, first = {}, {}
+            for gram in sorted(weights, key=firsts.get):
+                weight, position = weights[gram], firsts[gram]
+                for i in postings[gram]:
+                    if i in counts:
+                        counts[i] += weight
+                    else:
+                        counts[i] = weight
+                        first[i] = position
+            scores = {i: shared / (lengths[i] + n - shared)
+                      for i, shared in counts.items()}
+            # only the candidates that tie with the k-th score or beat it
+            # need their tie breakers
+            best = heapq.nlargest(k, scores.values())
+            limit = max(best[-1], min_score)
+            ranks = self.ranks
+            return self.matches(heapq.nlargest(k, [
+                (score, -first[i], -ranks[i], i)
+                for i, score in scores.items() if score >= limit]))
+        # the rarest trigrams first, for the prefix filter
+        grams = sorted(weights, key=lambda gram: len(postings[gram]))
+        # most[m]: the most of the term's trigrams that m distinct trigrams have
+        most = [0]
+        for weight in sorted(weights.values(), reverse=True):
+            most += [most[-1] + weight]
+
+        def bound(length):
+            shared = most[min(length, len(most) - 1)]
+            return shared / (length + n - shared)
+
+        heap = []  # the best k of (score, -first, -rank, id), worst first
+
+        def threshold():
+            if len(heap) < k:
+                return min_score
+            return max(heap[0][0], min_score)
+
+        def consider(i, count, first):
+            score = count / (lengths[i] + n - count)
+            if score < min_score:
+                return
+            if len(heap) < k:
+                heapq.heappush(heap, (score, -first, -self.ranks[i], i))
+            elif score >= heap[0][0]:
+                entry = (score, -first, -self.ranks[i], i)
+                if entry > heap[0]:
+                    heapq.heapreplace(heap, entry)
+
+        def count(grams, lo, hi, skip_lo=0, skip_hi=0, counts=None, first=None):
+            # add up the weights of `grams` of the aliases in [lo, hi) but not
+            # in [skip_lo, skip_hi), or only those of `counts` if given
+            only = counts is not None
+            if not only:
+                counts, first = {}, {}
+            for gram in grams:
+                posting = postings[gram]
+                weight, position = weights[gram], firsts[gram]
+                start = bisect.bisect_left(posting, lo)
+                end = bisect.bisect_left(posting, hi, start)
+                if only and end - start > 8 * len(counts):
+                    # probe for the candidates rather than scan the postings
+                    for i in counts:
+                        j = bisect.bisect_left(posting, i, start, end)
+                        if j < end and posting[j] == i:
+                            counts[i] += weight
+                            if position < first[i]:
+                                first[i] = position
+                    continue
+                for i in posting[start:end]:
+                    if i in counts:
+                        counts[i] += weight
+                        if position < first[i]:
+                            first[i] = position
+                    elif not only and not skip_lo <= i < skip_hi:
+                        counts[i] = weight
+                        first[i] = position
+            return counts, first
+
+        bounds = sorted(((bound(length), length) for length in self.spans),
+                        reverse=True)
+        # 1. the lengths with the best bounds, where the best matches usually
+        # are, counted in full to set the k-th score
+        seed = [length for _, length in bounds[:self.SEED_LENGTHS]]
+        seed_lo = self.spans[min(seed)][0]
+        seed_hi = self.spans[max(seed)][1]
+        counts, first = count(grams, seed_lo, seed_hi)
+        for i, shared in counts.items():
+            consider(i, shared, first[i])
+
+        # 2. the other lengths whose bounds reach the k-th score, candidates
+        # from the postings of the trigrams that they must share (the prefix)
+        # only, verified in order of their best possible scores, until no
+        # remaining one can reach the k-th score
+        limit = threshold()
+        admissible = [length for best, length in bounds if best >= limit]
+        if not admissible:
+            return self.matches(heap)
+        lo = self.spans[min(admissible)][0]
+        hi = self.spans[max(admissible)][1]
+        if seed_lo <= lo and hi <= seed_hi:
+            return self.matches(heap)
+        # (less a margin, so that no tie with the threshold is lost to rounding)
+        needed = limit * (min(admissible) + n) / (1 + limit) - 1e-9
+        prefix, rest = 0, most[-1]
+        while prefix < len(grams) and rest >= needed:
+            rest -= weights[grams[prefix]]
+            prefix += 1
+        counts, first = count(grams[:prefix], lo, hi, seed_lo, seed_hi)
+        suffix = grams[prefix:]
+        if not suffix:
+            for i, shared in counts.items():
+                consider(i, shared, first[i])
+            return self.matches(heap)
+
+        candidates = []
+        for i, shared in counts.items():
+            length = lengths[i]
+            best = min(shared + rest, most[min(length, len(most) - 1)])
+            candidates += [(best / (length + n - best), i)]
+        candidates.sort(reverse=True)
+        for best, i in candidates:
+            if best < threshold():
+                break
+            shared, position = count(
+                suffix, i, i + 1, counts={i: counts[i]}, first={i: first[i]})
+            consider(i, shared[i], position[i])
+        return self.matches(heap)
+
+    def matches(self, heap) -> list:
+        return [(self.products[i], self.aliases[i], score)
+                for score, _, _, i in sorted(heap, reverse=True)]
+
+
+class CompactTrigramIndex(TrigramIndex):
+    """ A TrigramIndex read in place from a compact index (see
+    `ghgi.compact`), e.g. one attached from shared memory, whose ordered
+    sections number the aliases as TrigramIndex does; only the (few) spans of
+    the trigram counts are built per process.
+    """
+
+    def __init__(self, index):
+        self.sources = (index.trigram_index, index.aka_index)
+        self.aliases = index.ordered_names
+        self.products = index.ordered_products
+        self.lengths = index.ordered_trigrams
+        self.ranks = index.ordered_ids
+        self.postings = index.ordered_trigram_index
+        self.spans = spans(self.lengths)
+
+
+def spans(lengths) -> dict:
+    """ Return the {trigram count: (first id, last id + 1)} of the aliases with
+    the (sorted) trigram counts `lengths`
+    """
+    result = {}
+    for i, length in enumerate(lengths):
+        result[length] = (result.get(length, (i,))[0], i + 1)
+    return result
 
 
 def build_indexes(product_file):
@@ -5,6 +5,9 @@ datadir = Path(__file__).parent / 'ghgi' / 'datasets'
 pkgdir = Path(__file__).parent / 'ghgi'
 files = [str(p.relative_to(pkgdir)) for p in datadir.rglob('*.json')]
 files += [str(p.relative_to(pkgdir)) for p in datadir.rglob('*.py')]
+files += [str(p.relative_to(pkgdir)) for p in datadir.rglob('*.bin')]
+files += [str(p.relative_to(pkgdir)) for p in datadir.rglob('*.sqlite3')]
+files += [str(p.relative_to(pkgdir)) for p in datadir.rglob('*.pickle')]
 
 setup(
     name='ghgi',
@@ -21,5 +24,9 @@ setup(
     test_suite='nose.collector',
     tests_require=['nose', 'inflect', 'nltk'],
     install_requires=['inflect', 'nltk'],
+    extras_require={
+        'matrix': ['numpy'],
+        'sparse': ['numpy', 'scipy'],
+    },
     zip_safe=False
 )